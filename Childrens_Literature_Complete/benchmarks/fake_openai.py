@@ -0,0 +1,359 @@
+"""
+Local stand-in for the OpenAI API, for load tests and offline test runs.
+
+Serves the endpoints the app uses (chat.completions with and without
+streaming, images.generate, models.list) with configurable latency,
+error rate and 429 rate limiting. Chat answers are canned per pipeline
+stage so Model A and Model B run end to end; image URLs point back at this
+server, which returns a small PNG.
+
+    python -m benchmarks.fake_openai --port 8089 --chat-latency lognormal:1.5,0.4
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake flask run
+"""
+import argparse
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+STORY_TEXT = """Amara and the Lantern Festival
+
+Amara was a curious girl who lived near the busy market. Every evening she watched the lanterns glow above the stalls.
+
+One night the biggest lantern would not light. Amara asked the lantern maker kind questions and listened carefully to every answer.
+
+Together they found a tiny hole in the paper. Amara fixed it with a patch of bright red paper, and the lantern glowed again.
+
+Everyone cheered, and Amara smiled because being curious and kind had helped her friends.
+
+The End."""
+
+CULTURAL_ANALYSIS = {
+    "cultural_themes": ["community", "festivals"],
+    "authentic_details": ["market stalls", "paper lanterns"],
+    "trait_expression": ["asks questions", "helps others"],
+    "age_appropriate": ["short sentences", "warm tone"],
+}
+
+STORY_PLAN = {
+    "title": "Amara and the Lantern Festival",
+    "plot_beats": [
+        "Curious Amara watches the lanterns at the market.",
+        "The biggest lantern will not light and Amara kindly helps.",
+        "Amara's curiosity fixes the lantern and everyone celebrates.",
+    ],
+    "moral": "Curiosity and kindness help us solve problems.",
+}
+
+CHARACTER_PROFILE = {
+    "name": "Amara",
+    "age_description": "a 5-7 year old child",
+    "visual_identity": {
+        "skin_tone": "warm brown skin",
+        "hair_description": "black curly hair",
+        "hairstyle": "two puffs tied with yellow ribbons",
+        "eye_description": "large dark brown eyes",
+        "facial_features": "round face with a wide smile",
+        "body_proportions": "small child proportions",
+        "clothing_description": "orange dress with white dots",
+        "clothing_colors": "orange and white",
+    },
+    "personality_traits": ["curious", "kind"],
+    "art_style": "soft watercolor children's book illustration",
+}
+
+SCENE_PLAN = [
+    {
+        "scene_id": i + 1,
+        "short_title": beat[:30],
+        "full_scene_description": beat,
+        "emotional_tone": tone,
+        "page_role": role,
+    }
+    for i, (beat, tone, role) in enumerate(zip(
+        STORY_PLAN["plot_beats"],
+        ["curious", "worried", "proud"],
+        ["opening", "climax", "resolution"],
+    ))
+]
+
+PREWRITE = {
+    "cultural_analysis": CULTURAL_ANALYSIS,
+    "story_plan": STORY_PLAN,
+    "character_profile": CHARACTER_PROFILE,
+}
+
+# First marker found in the prompt decides the canned answer; anything else
+# (story, validation, scene summary, Model A) gets the story text.
+STAGE_RESPONSES = [
+    ('"story_plan": {', json.dumps(PREWRITE)),
+    ("experienced children's book illustrator", json.dumps(SCENE_PLAN)),
+    ("story PLAN", json.dumps(STORY_PLAN)),
+    ('"visual_identity"', json.dumps(CHARACTER_PROFILE)),
+    ('"cultural_themes"', json.dumps(CULTURAL_ANALYSIS)),
+]
+
+
+def canned_reply(prompt):
+    for marker, reply in STAGE_RESPONSES:
+        if marker in prompt:
+            return reply
+    return STORY_TEXT
+
+
+def parse_latency(spec):
+    """
+    Latency distribution from a spec string, returned as a sampler:
+      fixed:0.5            always 0.5 s
+      uniform:0.2,1.0      uniform between 0.2 and 1.0 s
+      lognormal:1.5,0.4    log-normal with a 1.5 s median and sigma 0.4
+    """
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    values = [float(v) for v in args.split(",")]
+
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (250, 200, 120)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeOpenAIConfig:
+    """
+    chat_latency / image_latency: latency specs (see parse_latency)
+    first_token_fraction: share of the chat latency spent before the first
+                          streamed token
+    error_rate: share of requests answered with a 500
+    rate_limit_rate: share of requests answered with a 429
+    """
+
+    def __init__(self, chat_latency="fixed:0", image_latency="fixed:0",
+                 first_token_fraction=0.2, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, seed=None):
+        self.chat_latency = parse_latency(chat_latency)
+        self.image_latency = parse_latency(image_latency)
+        self.first_token_fraction = first_token_fraction
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _count(self, name):
+        with self.server.lock:
+            self.server.counts[name] = self.server.counts.get(name, 0) + 1
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _injected_failure(self):
+        """Answer with a 429 or 500 if the dice say so; True if we did."""
+        roll = self.config.random.random()
+        if roll < self.config.rate_limit_rate:
+            self._count("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                headers={"Retry-After": str(self.config.retry_after)},
+            )
+            return True
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self._count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.startswith("/v1/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4.1", "object": "model"}]})
+        elif self.path.startswith("/fake-images/"):
+            body = self.server.png
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path.startswith("/v1/chat/completions"):
+            self._count("chat")
+            if not self._injected_failure():
+                self._chat(payload)
+        elif self.path.startswith("/v1/images/generations"):
+            self._count("images")
+            if not self._injected_failure():
+                time.sleep(self.config.image_latency())
+                url = f"{self.server.root_url}/fake-images/{uuid.uuid4().hex}.png"
+                self._send_json(200, {"created": int(time.time()), "data": [{"url": url, "revised_prompt": None}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def _chat(self, payload):
+        prompt = "".join(
+            m.get("content") or "" for m in payload.get("messages", []) if isinstance(m.get("content"), str)
+        )
+        reply = canned_reply(prompt)
+        usage = {
+            "prompt_tokens": max(1, len(prompt) // 4),
+            "completion_tokens": max(1, len(reply) // 4),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        latency = self.config.chat_latency()
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4.1"),
+        }
+
+        if not payload.get("stream"):
+            time.sleep(latency)
+            self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }]))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        pieces = [word + " " for word in reply.split(" ")]
+        time.sleep(latency * self.config.first_token_fraction)
+        per_piece = latency * (1 - self.config.first_token_fraction) / len(pieces)
+        for piece in pieces:
+            self._sse(dict(base, object="chat.completion.chunk", choices=[{
+                "index": 0, "delta": {"content": piece}, "finish_reason": None,
+            }]))
+            time.sleep(per_piece)
+        self._sse(dict(base, object="chat.completion.chunk", choices=[{
+            "index": 0, "delta": {}, "finish_reason": "stop",
+        }]))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self._sse(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _sse(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+
+class FakeOpenAIServer:
+    """
+    Threaded fake OpenAI server; use as a context manager or start()/stop().
+    base_url is what OPENAI_BASE_URL should be set to.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or FakeOpenAIConfig()
+        self.httpd.lock = threading.Lock()
+        self.httpd.counts = {}
+        self.httpd.png = _png_bytes()
+        self.httpd.root_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"{self.httpd.root_url}/v1"
+
+    @property
+    def counts(self):
+        with self.httpd.lock:
+            return dict(self.httpd.counts)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--chat-latency", default="fixed:0", help="e.g. lognormal:1.5,0.4")
+    parser.add_argument("--image-latency", default="fixed:0", help="e.g. uniform:5,12")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args):
+    return FakeOpenAIConfig(
+        chat_latency=args.chat_latency,
+        image_latency=args.image_latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"Fake OpenAI listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
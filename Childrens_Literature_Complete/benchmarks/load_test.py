@@ -0,0 +1,257 @@
+"""
+Load test for story generation against the fake OpenAI server.
+
+Drives the Flask app (create_app) in-process with N concurrent clients and
+reports throughput plus p50/p95/p99 latency per endpoint and per pipeline
+stage (from the /metrics store), so concurrency settings can be compared
+before they are rolled out.
+
+    python -m benchmarks.load_test --concurrency 8 --requests 32 \\
+        --model mixed --endpoint jobs --chat-latency lognormal:1.5,0.4 \\
+        --image-latency uniform:4,8 --rate-limit-rate 0.05
+
+Pass --openai-base-url to point at another server instead of starting the
+built-in fake. App settings (STORY_JOB_WORKERS, OPENAI_MAX_CONCURRENCY, ...)
+are read from the environment as usual.
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from benchmarks.fake_openai import FakeOpenAIServer, add_config_arguments, config_from_args
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(round(q * len(ordered), 9)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies):
+    summary = {"count": len(latencies)}
+    for q in QUANTILES:
+        summary[f"p{int(q * 100)}"] = percentile(latencies, q)
+    return summary
+
+
+def stage_report(before, after):
+    """Per-stage latency quantiles and counters between two metrics snapshots."""
+    from website.services.shared.metrics import estimate_quantile
+
+    report = {}
+    for key, entry in after.items():
+        previous = before.get(key, {})
+        buckets = [
+            count - (previous.get("buckets") or [0] * len(entry["buckets"]))[i]
+            for i, count in enumerate(entry["buckets"])
+        ]
+        counters = {
+            name: value - previous.get(name, 0)
+            for name, value in entry.items()
+            if name not in ("buckets", "latency_seconds_sum")
+        }
+        if not sum(buckets) and not any(counters.values()):
+            continue
+
+        stage = {"count": sum(buckets)}
+        for q in QUANTILES:
+            stage[f"p{int(q * 100)}"] = estimate_quantile(q, buckets) if sum(buckets) else None
+        stage.update(counters)
+        report["/".join(key)] = stage
+    return report
+
+
+def seed_prompts(app, count, model="mixed"):
+    """
+    Create one user + prompt per request. Users are picked so that
+    choose_model_for_user sends them to the requested model.
+    """
+    from website import db
+    from website.models.database import User, Prompt
+    from website.services.jobs.generation import choose_model_for_user
+
+    seeded = []
+    with app.app_context():
+        while len(seeded) < count:
+            user = User(first_name="Load", last_name="Test", consent=True, date=date.today())
+            db.session.add(user)
+            db.session.commit()
+            if model != "mixed" and choose_model_for_user(user.id) != model:
+                continue
+
+            prompt = Prompt(
+                user_id=user.id,
+                age_range="5-7",
+                character_name="Amara",
+                character_type="human",
+                character_gender="female",
+                character_traits="curious, kind",
+                location="market",
+                theme="adventure",
+                character_cultural_background="Nigeria",
+            )
+            db.session.add(prompt)
+            db.session.commit()
+            prompt_text = (
+                f"This story is for children aged {prompt.age_range}. "
+                f"The main character is named {prompt.character_name}. ({prompt.id})"
+            )
+            seeded.append((user.id, prompt.id, prompt_text))
+    return seeded
+
+
+def request_api(client, user_id, prompt_id, prompt_text, poll_interval):
+    started = time.perf_counter()
+    response = client.get("/generate_story_api", query_string={
+        "prompt": prompt_text, "user_id": user_id, "prompt_id": prompt_id,
+    })
+    ok = response.status_code == 200 and response.get_json().get("success")
+    return ok, {"generate_story_api": time.perf_counter() - started}
+
+
+def request_job(client, user_id, prompt_id, prompt_text, poll_interval):
+    """Submit a job and poll it; times to first story text and to completion."""
+    started = time.perf_counter()
+    response = client.post("/generate_story_jobs", json={
+        "prompt": prompt_text, "user_id": user_id, "prompt_id": prompt_id,
+    })
+    timings = {"generate_story_jobs (submit)": time.perf_counter() - started}
+    job_id = response.get_json()["job_id"]
+
+    while True:
+        data = client.get(f"/generate_story_jobs/{job_id}").get_json()
+        if data.get("story") and "generate_story_jobs (story)" not in timings:
+            timings["generate_story_jobs (story)"] = time.perf_counter() - started
+        if data["status"] in ("done", "failed"):
+            timings["generate_story_jobs (complete)"] = time.perf_counter() - started
+            return data["status"] == "done", timings
+        time.sleep(poll_interval)
+
+
+ENDPOINTS = {"api": request_api, "jobs": request_job}
+
+
+def run_load_test(app, concurrency=4, requests=16, endpoint="api", model="mixed", poll_interval=0.05):
+    """
+    Run `requests` story generations through the app, `concurrency` at a
+    time, and return the report dict (see print_report).
+    """
+    from website.services.shared import metrics
+
+    send = ENDPOINTS[endpoint]
+    prompts = seed_prompts(app, requests, model=model)
+    before = metrics.snapshot()
+
+    def one(prompt):
+        user_id, prompt_id, prompt_text = prompt
+        try:
+            return send(app.test_client(), user_id, prompt_id, prompt_text, poll_interval)
+        except Exception as e:
+            print("Request failed:", e)
+            return False, {}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-test") as executor:
+        results = list(executor.map(one, prompts))
+    elapsed = time.perf_counter() - started
+
+    latencies = {}
+    for _, timings in results:
+        for name, seconds in timings.items():
+            latencies.setdefault(name, []).append(seconds)
+
+    succeeded = sum(1 for ok, _ in results if ok)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": succeeded,
+        "failed": requests - succeeded,
+        "elapsed_seconds": elapsed,
+        "stories_per_minute": succeeded * 60 / elapsed if elapsed else 0.0,
+        "endpoints": {name: summarize(values) for name, values in latencies.items()},
+        "stages": stage_report(before, metrics.snapshot()),
+    }
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_report(report):
+    print(
+        f"\n{report['succeeded']}/{report['requests']} stories in {report['elapsed_seconds']:.1f}s "
+        f"at concurrency {report['concurrency']} "
+        f"({report['stories_per_minute']:.1f} stories/min)"
+    )
+
+    print(f"\n{'endpoint':<34}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, row in sorted(report["endpoints"].items()):
+        print(f"{name:<34}{row['count']:>7}{_seconds(row['p50']):>9}{_seconds(row['p95']):>9}{_seconds(row['p99']):>9}")
+
+    print(f"\n{'stage':<24}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}{'retries':>9}{'tokens':>9}")
+    for name, row in sorted(report["stages"].items()):
+        tokens = int(row.get("prompt_tokens", 0) + row.get("completion_tokens", 0))
+        print(
+            f"{name:<24}{row['count']:>7}{_seconds(row['p50']):>9}{_seconds(row['p95']):>9}"
+            f"{_seconds(row['p99']):>9}{int(row.get('errors', 0)):>8}{int(row.get('retries', 0)):>9}{tokens:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test story generation")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="api")
+    parser.add_argument("--model", choices=["a", "b", "mixed"], default="mixed")
+    parser.add_argument("--openai-base-url", help="Use this server instead of the built-in fake")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    fake = None
+    if args.openai_base_url:
+        os.environ["OPENAI_BASE_URL"] = args.openai_base_url
+    else:
+        fake = FakeOpenAIServer(config_from_args(args)).start()
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+
+    # Settings are read at import time, so the scratch data dir has to be in
+    # place before the app is imported
+    data_dir = tempfile.mkdtemp(prefix="story-load-test-")
+    os.environ.setdefault("DATA_DIR", data_dir)
+
+    from website import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(data_dir, 'load_test.db')}"})
+    try:
+        report = run_load_test(
+            app,
+            concurrency=args.concurrency,
+            requests=args.requests,
+            endpoint=args.endpoint,
+            model=args.model,
+        )
+    finally:
+        if fake:
+            print("Fake OpenAI requests:", fake.counts)
+            fake.stop()
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Profile run_model_a / run_model_b deterministically from a cassette.
+
+Record a trace once (against OpenAI, or the fake server for a smoke test):
+
+    python -m benchmarks.replay_profile --model b --record --cassette traces/model_b.json
+
+then replay it as often as needed, offline. With --timing the recorded
+OpenAI latencies are reproduced; without it the run measures pure pipeline
+overhead (prompt building, parsing, threading, image bookkeeping):
+
+    python -m benchmarks.replay_profile --model b --cassette traces/model_b.json \\
+        --iterations 20 --profile model_b.pstats
+
+Record one cassette per --pipeline-mode (multi, fast) to A/B the two Model B
+pre-write paths on the same footing.
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import tempfile
+import time
+
+from benchmarks.load_test import percentile
+
+MODEL_B_INPUT = {
+    "user_input": {
+        "prompt_text": "A story about a curious girl at the lantern festival",
+        "character_name": "Amara",
+        "age_range": "5-7",
+        "character_type": "human",
+        "traits": ["curious", "kind"],
+        "traits_text": "curious, kind",
+        "location": "market",
+        "theme": "adventure",
+        "character_gender": "female",
+    },
+    "user_metadata": {"first_name": "Load"},
+    "cluster_context": {"cultural_background": "Nigeria", "specific_traditions": "lanterns"},
+}
+
+MODEL_A_INPUT = {
+    "user_input": {"prompt_text": "This story is for children aged 5-7. The main character is named Amara."},
+    "user_metadata": {},
+    "cluster_context": {},
+}
+
+
+def run_once(model, pipeline_mode=None):
+    from website.services.model_a.model_a import run_model_a
+    from website.services.model_b.model_b import run_model_b
+
+    if model == "a":
+        return run_model_a(**MODEL_A_INPUT)
+    return run_model_b(**MODEL_B_INPUT, pipeline_mode=pipeline_mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay a pipeline run from a cassette")
+    parser.add_argument("--model", choices=["a", "b"], default="b")
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--record", action="store_true", help="Call OpenAI and record the cassette")
+    parser.add_argument("--timing", action="store_true", help="Replay with the recorded latencies")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--profile", help="Write cProfile stats of the replay runs to this file")
+    parser.add_argument("--pipeline-mode", choices=["multi", "fast"], help="Model B pipeline mode")
+    args = parser.parse_args()
+
+    # Keep images and metrics of the benchmark out of the real data dir
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="story-replay-"))
+
+    from website.services.shared.cassette import use_cassette
+
+    if args.record:
+        if os.path.exists(args.cassette):
+            os.remove(args.cassette)
+        use_cassette(args.cassette, mode="record")
+        started = time.perf_counter()
+        run_once(args.model, args.pipeline_mode)
+        print(f"Recorded model {args.model.upper()} run in {time.perf_counter() - started:.2f}s to {args.cassette}")
+        return
+
+    use_cassette(args.cassette, mode="replay", timing=args.timing)
+    profiler = cProfile.Profile() if args.profile else None
+    durations = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        run_once(args.model, args.pipeline_mode)
+        if profiler:
+            profiler.disable()
+        durations.append(time.perf_counter() - started)
+
+    print(
+        f"\nModel {args.model.upper()} replay x{args.iterations}: "
+        f"p50 {percentile(durations, 0.5):.3f}s  p95 {percentile(durations, 0.95):.3f}s  "
+        f"min {min(durations):.3f}s"
+    )
+    if profiler:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(args.profile).sort_stats("cumulative").print_stats(15)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+# Gunicorn settings: `gunicorn app:app` picks this file up automatically.
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    # A client created in the master process must not be shared across forks
+    from website.services.shared.openai_gateway import reset_client
+    reset_client()
+
+
+def post_worker_init(worker):
+    from website.services.shared.openai_gateway import warm_up
+    warm_up()
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from website import create_app, db
+from website.services.shared import image_store, metrics, openai_gateway, rate_limiter
+from website.services.shared.sqlite_store import SQLiteStore
+
+
+@pytest.fixture
+def app():
+    """The Flask app on an in-memory database, inside an app context."""
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def metrics_store(tmp_path, monkeypatch):
+    """Keep pipeline metrics out of DATA_DIR while tests run."""
+    store = SQLiteStore(str(tmp_path / "metrics.db"), metrics.SCHEMA)
+    monkeypatch.setattr(metrics, "_store", store)
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_store(tmp_path, monkeypatch):
+    """Fresh rate limiter buckets and concurrency limits for every test."""
+    buckets = rate_limiter.TokenBuckets(str(tmp_path / "rate_limit.db"))
+    monkeypatch.setattr(rate_limiter, "_buckets", buckets)
+    monkeypatch.setattr(rate_limiter, "_concurrency", {})
+    return buckets
+
+
+@pytest.fixture(scope="session")
+def fake_openai_server():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def offline_openai(request, tmp_path, monkeypatch):
+    """
+    Without a real OPENAI_API_KEY every test talks to the local fake OpenAI
+    server (benchmarks/fake_openai.py) instead of failing on the missing key.
+    """
+    if os.getenv("OPENAI_API_KEY"):
+        yield None
+        return
+
+    server = request.getfixturevalue("fake_openai_server")
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setattr(image_store, "IMAGE_STORE_DIR", str(tmp_path / "images"))
+    openai_gateway.reset_client()
+    yield server
+    openai_gateway.reset_client()
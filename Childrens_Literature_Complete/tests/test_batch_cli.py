@@ -0,0 +1,44 @@
+import json
+
+from website.cli import batch_generate, load_batch_state
+from website.models.database import Story, StoryImage
+
+
+def test_batch_generate_runs_rows_and_resumes(app, tmp_path):
+    prompts = tmp_path / "prompts.csv"
+    prompts.write_text(
+        "id,age_range,character_name,character_traits,theme,character_cultural_background,model\n"
+        "r1,4-6,Amara,\"curious, kind\",adventure,Nigeria,a\n"
+        "r2,7-9,Leo,brave,friendship,Brazil,b\n"
+        "r3,4-6,Mei,kind,kindness,China,a\n"
+    )
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(batch_generate, [str(prompts), "--workers", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert "3 rows: 3 to generate" in result.output
+    assert "Generated 3 stories (0 failed)" in result.output
+    state = load_batch_state(f"{prompts}.state.jsonl")
+    assert {entry["status"] for entry in state.values()} == {"done"}
+    assert state["r2"]["model_used"] == "b"
+    assert Story.query.count() == 3
+    assert StoryImage.query.count() == 9
+
+    # A second run only picks up rows that are not done yet
+    with open(prompts, "a") as f:
+        f.write("r4,7-9,Sam,curious,adventure,India,a\n")
+    result = runner.invoke(batch_generate, [str(prompts), "--workers", "2"])
+
+    assert "4 rows: 1 to generate, 3 already done" in result.output
+    assert Story.query.count() == 4
+
+
+def test_batch_generate_reads_jsonl(app, tmp_path):
+    prompts = tmp_path / "prompts.jsonl"
+    prompts.write_text(json.dumps({"age_range": "4-6", "character_name": "Ada", "theme": "space"}) + "\n")
+
+    result = app.test_cli_runner().invoke(batch_generate, [str(prompts), "--model", "a"])
+
+    assert result.exit_code == 0, result.output
+    assert Story.query.one().model_used == "a"
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from website.services.shared import cassette
+from website.services.shared.cassette import CassetteMiss, use_cassette
+from website.services.shared.llm import call_gpt, generate_image
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    yield str(tmp_path / "trace.json")
+    use_cassette(mode="off")
+
+
+def test_record_then_replay_without_openai(cassette_path, fake_openai_server):
+    use_cassette(cassette_path, mode="record")
+    streamed = []
+    recorded = (
+        call_gpt("Write a story PLAN", stage="story_plan"),
+        call_gpt("Write the story", on_token=streamed.append),
+        generate_image("A lantern"),
+    )
+    calls_made = fake_openai_server.counts
+
+    use_cassette(cassette_path, mode="replay")
+    replayed_tokens = []
+    replayed = (
+        call_gpt("Write a story PLAN", stage="story_plan"),
+        call_gpt("Write the story", on_token=replayed_tokens.append),
+        generate_image("A lantern"),
+    )
+
+    assert replayed[:2] == recorded[:2]
+    assert replayed_tokens == streamed
+    assert replayed[2].startswith(fake_openai_server.base_url.rsplit("/v1", 1)[0])
+    assert fake_openai_server.counts == calls_made
+
+    with open(cassette_path) as f:
+        data = json.load(f)
+    assert data["version"] == cassette.CASSETTE_VERSION
+    assert [i["kind"] for i in data["interactions"]] == ["chat", "chat_stream", "image"]
+    assert all(i["latency"] >= 0 for i in data["interactions"])
+
+
+def test_replay_miss_and_version_check(cassette_path):
+    with open(cassette_path, "w") as f:
+        json.dump({"version": cassette.CASSETTE_VERSION, "interactions": []}, f)
+    use_cassette(cassette_path, mode="replay")
+    with pytest.raises(CassetteMiss):
+        call_gpt("never recorded")
+
+    with open(cassette_path, "w") as f:
+        json.dump({"version": 999, "interactions": []}, f)
+    with pytest.raises(ValueError):
+        use_cassette(cassette_path, mode="replay")
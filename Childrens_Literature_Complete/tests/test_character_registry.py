@@ -0,0 +1,91 @@
+from datetime import date
+
+from website import db
+from website.models.database import User, Prompt, Story, CharacterIdentity
+from website.services.jobs import character_registry, generation
+from website.services.jobs.generation import build_prompt_text, generate_story_for_prompt
+from website.services.model_b.character_profile import create_fallback_profile
+
+
+def add_prompt(user_id, traits="curious, kind"):
+    prompt = Prompt(
+        user_id=user_id, age_range="4-6", character_name="Amara", character_type="human",
+        character_gender="female", character_traits=traits, location="market",
+    )
+    db.session.add(prompt)
+    db.session.commit()
+    return prompt
+
+
+def test_identity_key_ignores_case_spacing_and_trait_order():
+    key = character_registry.identity_key(
+        {"character_name": "Amara ", "character_type": "Human", "traits": ["kind", "Curious"]}
+    )
+    assert key == character_registry.identity_key(
+        {"character_name": "amara", "character_type": "human", "traits": "curious; kind"}
+    )
+    assert key != character_registry.identity_key({"character_name": "Amara", "traits": ["brave"]})
+
+
+def test_second_story_reuses_the_stored_character(app, fake_openai_server, monkeypatch):
+    db.session.add_all([
+        User(first_name="A", last_name="One", consent=True, date=date(2026, 1, 6)),
+        User(first_name="B", last_name="Two", consent=True, date=date(2026, 1, 6)),
+    ])
+    db.session.commit()
+    user_id = 2  # even ids go to Model B
+    reused = []
+    run_model_b = generation.run_model_b
+
+    def recording_run_model_b(**kwargs):
+        result = run_model_b(**kwargs)
+        reused.append(result["metadata"]["character_reused"])
+        return result
+    monkeypatch.setattr(generation, "run_model_b", recording_run_model_b)
+
+    def generate(prompt):
+        before = fake_openai_server.counts.get("chat", 0)
+        result = generate_story_for_prompt(user_id, prompt.id, build_prompt_text(prompt))
+        assert result["model_used"] == "b"
+        return Story.query.get(result["story_id"]), fake_openai_server.counts["chat"] - before
+
+    first, first_calls = generate(add_prompt(user_id))
+    second, second_calls = generate(add_prompt(user_id, traits="Kind,curious"))
+
+    identity = CharacterIdentity.query.one()
+    assert identity.times_reused == 1
+    assert second_calls == first_calls - 1
+    assert identity.locked_canonical_description in first.character_profile
+    assert identity.locked_canonical_description in second.character_profile
+    assert reused == [False, True]
+
+    # New traits are a new character
+    generate(add_prompt(user_id, traits="brave"))
+    assert CharacterIdentity.query.count() == 2
+
+
+def test_fallback_profiles_are_not_stored(app):
+    db.session.add(User(first_name="A", last_name="B", consent=True, date=date(2026, 1, 6)))
+    db.session.commit()
+    user_input = {"character_name": "Leo", "traits": ["brave"]}
+    profile = create_fallback_profile("Leo", "7-9", "human", "male", ["brave"])
+
+    assert character_registry.save_character_identity(1, user_input, profile) is None
+    assert character_registry.find_character_identity(1, user_input) is None
+
+
+def test_other_age_range_gets_its_own_design(app):
+    db.session.add(User(first_name="A", last_name="B", consent=True, date=date(2026, 1, 6)))
+    db.session.commit()
+    young = {"character_name": "Amara", "traits": ["kind"], "age_range": "4-6"}
+    older = {**young, "age_range": "10-12"}
+    profile = {
+        "visual_identity": {"body_proportions": "small, round face"},
+        "locked_canonical_description": "Amara, a 4-6 year old girl with braids",
+    }
+
+    assert character_registry.save_character_identity(1, young, profile) is not None
+    assert character_registry.find_character_identity(1, older) is None
+    reused = character_registry.find_character_identity(1, young)
+    assert reused["age_description"] == "a 4-6 year old child"
+    assert reused["locked_canonical_description"] == profile["locked_canonical_description"]
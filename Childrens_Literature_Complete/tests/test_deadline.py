@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import APITimeoutError, InternalServerError
+
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from website.services.shared import deadline as deadline_module
+from website.services.shared import metrics, openai_gateway
+from website.services.shared.deadline import DeadlineExceeded, deadline, in_current_context, remaining
+from website.services.shared.llm import call_gpt
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A fake OpenAI server per test, with the config the test sets."""
+    with FakeOpenAIServer(FakeOpenAIConfig(seed=1)) as server:
+        monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setattr(deadline_module, "OPENAI_RETRY_WAIT", 0.01)
+        monkeypatch.setattr(deadline_module, "OPENAI_RETRY_MAX_WAIT", 0.05)
+        openai_gateway.reset_client()
+        yield server
+        openai_gateway.reset_client()
+
+
+def test_nested_deadlines_only_shorten():
+    assert remaining() is None
+    with deadline(10):
+        with deadline(60):
+            assert remaining() <= 10
+        with deadline(1):
+            assert remaining() <= 1
+    assert remaining() is None
+
+
+def test_thread_pool_work_sees_the_deadline():
+    with deadline(30), ThreadPoolExecutor(max_workers=2) as executor:
+        plain = executor.submit(remaining).result()
+        bound = list(executor.map(in_current_context(lambda _: remaining()), range(3)))
+    assert plain is None
+    assert all(0 < left <= 30 for left in bound)
+
+
+def test_retryable_errors_are_retried_then_raised(server):
+    server.httpd.config.error_rate = 1.0
+
+    with metrics.stage_timer("b", "story"), pytest.raises(InternalServerError):
+        call_gpt("Hello")
+
+    assert server.counts["errors"] == deadline_module.OPENAI_MAX_ATTEMPTS
+    assert metrics.snapshot()[("b", "story")]["retries"] == deadline_module.OPENAI_MAX_ATTEMPTS - 1
+
+
+def test_call_gets_the_remaining_budget_as_timeout(server):
+    server.httpd.config.chat_latency = lambda: 5
+
+    started = time.perf_counter()
+    with deadline(2), pytest.raises(APITimeoutError):
+        call_gpt("Hello")
+    assert time.perf_counter() - started < 3.5
+
+
+def test_spent_deadline_fails_fast_without_a_request(server):
+    with deadline(0.5):
+        time.sleep(0.5)
+        with pytest.raises(DeadlineExceeded):
+            call_gpt("Hello")
+    assert "chat" not in server.counts
+
+
+def test_slot_wait_is_bounded_by_the_deadline(server, monkeypatch):
+    monkeypatch.setattr(openai_gateway, "_slots", threading.BoundedSemaphore(1))
+    openai_gateway._slots.acquire()
+    try:
+        started = time.perf_counter()
+        with deadline(1.5), pytest.raises(DeadlineExceeded):
+            call_gpt("Hello")
+        assert time.perf_counter() - started < 2.5
+    finally:
+        openai_gateway._slots.release()
@@ -0,0 +1,69 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from website.services.shared import image_store
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "IMAGE_STORE_DIR", str(tmp_path / "images"))
+    return tmp_path / "images"
+
+
+def png_bytes(size=(1024, 1024), color=(200, 120, 40)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_store_creates_resized_derivatives(store_dir):
+    digest = image_store.store_image_bytes(png_bytes())
+
+    assert image_store.is_valid_digest(digest)
+    assert image_store.store_image_bytes(png_bytes()) == digest
+    with Image.open(image_store.derivative_path(digest, 300, "jpg")) as img:
+        assert img.size == (512, 512)
+        assert img.format == "JPEG"
+    assert image_store.derivative_path("0" * 64) is None
+    assert image_store.derivative_path("../../etc/passwd") is None
+
+
+def test_concurrent_stores_of_the_same_image(store_dir):
+    data = png_bytes(color=(10, 20, 30))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        digests = set(executor.map(image_store.store_image_bytes, [data] * 8))
+
+    digest, = digests
+    files = sorted(p.name for p in (store_dir / digest[:2] / digest).iterdir())
+    assert files == sorted(["original"] + [
+        f"{width}.{fmt}" for width in image_store.IMAGE_WIDTHS for fmt in image_store.IMAGE_FORMATS
+    ])
+
+
+def test_bytes_that_are_not_an_image_are_not_stored(store_dir):
+    with pytest.raises(Exception):
+        image_store.store_image_bytes(b"<html>expired</html>")
+    assert not store_dir.exists()
+
+
+def test_persist_passes_through_static_urls(store_dir):
+    assert image_store.persist_remote_image("/static/fallback_image.png") == "/static/fallback_image.png"
+
+
+def test_images_route_serves_with_cache_headers(app, store_dir):
+    digest = image_store.store_image_bytes(png_bytes())
+    client = app.test_client()
+
+    response = client.get(f"/images/{digest}?w=256")
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp"
+    assert "immutable" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+
+    again = client.get(f"/images/{digest}?w=256", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+    assert client.get(f"/images/{'f' * 64}").status_code == 404
@@ -0,0 +1,209 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from website import db
+from website.models.database import User, Prompt, Story, StoryImage, GenerationJob
+from website.services.jobs import generation
+
+
+@pytest.fixture
+def app(app, monkeypatch):
+    app.pipeline_calls = 0
+    app.release_pipeline = threading.Event()
+    app.release_pipeline.set()
+
+    def fake_run_model_a(user_input, user_metadata=None, cluster_context=None,
+                         on_token=None, on_story=None, on_image=None):
+        app.pipeline_calls += 1
+        if on_token:
+            on_token("A Fake Story")
+        app.release_pipeline.wait(5)
+        return {
+            "story_text": "A Fake Story\n\nOnce upon a time.\n\nThe End.",
+            "images": ["/img/1.png", "/img/2.png", "/img/3.png"],
+            "character_profile": {},
+            "cultural_profile": {}
+        }
+
+    monkeypatch.setattr(generation, "run_model_a", fake_run_model_a)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def sample_data(app):
+    user = User(first_name="Alice", last_name="Smith", consent=True, date=date(2026, 1, 6))
+    db.session.add(user)
+    db.session.commit()
+    prompt = Prompt(user_id=user.id, age_range="7-9", character_name="Charlie")
+    db.session.add(prompt)
+    db.session.commit()
+    return user.id, prompt.id
+
+
+def get_status(client, job_id):
+    # The fixture's app context (and its session) spans every test request,
+    # so drop cached rows to see what the worker thread wrote
+    db.session.expire_all()
+    return client.get(f"/generate_story_jobs/{job_id}").get_json()
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = get_status(client, job_id)
+        if data["status"] not in ("queued", "running"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+def test_job_submit_returns_immediately_and_completes(client, sample_data):
+    user_id, prompt_id = sample_data
+    response = client.post("/generate_story_jobs", data={
+        "prompt": "A story",
+        "user_id": user_id,
+        "prompt_id": prompt_id,
+    })
+
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+
+    data = wait_for_job(client, job_id)
+    assert data["status"] == "done"
+    assert GenerationJob.query.get(job_id).partial_text == "A Fake Story"
+    assert data["model_used"] == "a"
+    assert data["story"].startswith("A Fake Story")
+    assert data["images"] == ["/img/1.png", "/img/2.png", "/img/3.png"]
+
+    story = Story.query.get(data["story_id"])
+    assert story.prompt_id == prompt_id
+    assert {img.phase for img in StoryImage.query.filter_by(story_id=story.id)} == {
+        "beginning", "middle", "end"
+    }
+
+
+def test_job_status_unknown_job(client):
+    response = client.get("/generate_story_jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def test_generation_is_single_flight_and_idempotent_per_prompt(app, client, sample_data):
+    user_id, prompt_id = sample_data
+    app.release_pipeline.clear()
+    form = {"prompt": "A story", "user_id": user_id, "prompt_id": prompt_id}
+
+    first = client.post("/generate_story_jobs", data=form).get_json()["job_id"]
+    second = client.post("/generate_story_jobs", data=form).get_json()["job_id"]
+    assert first == second
+
+    app.release_pipeline.set()
+    assert wait_for_job(client, first)["status"] == "done"
+
+    third = client.post("/generate_story_jobs", data=form).get_json()
+    assert third["job_id"] == first
+    assert third["status"] == "done"
+
+    response = client.get("/generate_story_api", query_string=form).get_json()
+    assert response["success"] is True
+    assert response["story"].startswith("A Fake Story")
+
+    assert app.pipeline_calls == 1
+    assert Story.query.filter_by(prompt_id=prompt_id).count() == 1
+
+
+def test_prompt_can_be_retried_after_both_models_fail(app, client, sample_data, monkeypatch):
+    user_id, prompt_id = sample_data
+    form = {"prompt": "A story", "user_id": user_id, "prompt_id": prompt_id}
+    working_model_a = generation.run_model_a
+
+    def broken_model(*args, **kwargs):
+        raise RuntimeError("OpenAI is down")
+
+    monkeypatch.setattr(generation, "run_model_a", broken_model)
+    monkeypatch.setattr(generation, "run_model_b", broken_model)
+    first = client.post("/generate_story_jobs", data=form).get_json()["job_id"]
+    failed = wait_for_job(client, first)
+    assert failed["status"] == "failed"
+    assert failed["error"] == "OpenAI is down"
+    assert Story.query.filter_by(prompt_id=prompt_id).count() == 0
+    assert GenerationJob.query.get(first).active_prompt_id is None
+
+    monkeypatch.setattr(generation, "run_model_a", working_model_a)
+    second = client.post("/generate_story_jobs", data=form).get_json()["job_id"]
+    assert second != first
+    data = wait_for_job(client, second)
+    assert data["status"] == "done"
+    assert data["story"].startswith("A Fake Story")
+
+
+def test_story_is_published_before_images(app, client, sample_data, monkeypatch):
+    user_id, prompt_id = sample_data
+    images_released = threading.Event()
+
+    def fake_run_model_a(user_input, user_metadata=None, cluster_context=None,
+                         on_token=None, on_story=None, on_image=None):
+        on_story("A Fake Story\n\nThe End.")
+        on_image(1, "/img/2.png")
+        images_released.wait(5)
+        on_image(0, "/img/1.png")
+        return {
+            "story_text": "A Fake Story\n\nThe End.",
+            "images": ["/img/1.png", "/img/2.png", None],
+        }
+
+    monkeypatch.setattr(generation, "run_model_a", fake_run_model_a)
+    job_id = client.post("/generate_story_jobs", data={
+        "prompt": "A story", "user_id": user_id, "prompt_id": prompt_id,
+    }).get_json()["job_id"]
+
+    deadline = time.time() + 5
+    while True:
+        data = get_status(client, job_id)
+        if data.get("images") and data["images"][1]:
+            break
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    assert data["status"] == "running"
+    assert data["story"].startswith("A Fake Story")
+    db.session.expire_all()
+    status = client.get(f"/stories/{data['story_id']}/images").get_json()
+    assert status == {"story_id": data["story_id"], "images": [None, "/img/2.png", None], "complete": False}
+
+    images_released.set()
+    data = wait_for_job(client, job_id)
+    assert data["status"] == "done"
+    assert data["images"] == ["/img/1.png", "/img/2.png", generation.FALLBACK_IMAGE]
+    db.session.expire_all()
+    assert client.get(f"/stories/{data['story_id']}/images").get_json()["complete"] is True
+
+
+def test_stale_job_gets_fallback_images_for_its_published_story(client, sample_data):
+    user_id, prompt_id = sample_data
+    story = Story(title="Half done", content="Half done\n\nThe End.", user_id=user_id,
+                  prompt_id=prompt_id, model_used="a")
+    db.session.add(story)
+    db.session.flush()
+    db.session.add(StoryImage(story_id=story.id, image_url="/img/1.png", phase="beginning"))
+    job = GenerationJob(id="stale", user_id=user_id, prompt_id=prompt_id, status="running",
+                        active_prompt_id=prompt_id, story_id=story.id,
+                        started_at=datetime.utcnow() - timedelta(hours=1))
+    db.session.add(job)
+    db.session.commit()
+
+    data = client.get(f"/stories/{story.id}/images").get_json()
+    assert data["complete"] is True
+    assert data["images"] == ["/img/1.png", generation.FALLBACK_IMAGE, generation.FALLBACK_IMAGE]
+
+    status = get_status(client, "stale")
+    assert status["status"] == "done"
+    assert status["images"] == data["images"]
+    assert GenerationJob.query.get("stale").active_prompt_id is None
+
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from website.services.shared import llm, llm_cache
+from website.services.shared.llm_cache import ResponseCache, cache_key
+
+
+def test_hit_miss_and_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=10, ttl=60)
+    key = cache_key("gpt-4.1", "hello", 0.3, 500)
+
+    assert cache.get(key, stage="story_plan") is None
+    cache.put(key, '{"title": "x"}', stage="story_plan")
+    assert cache.get(key, stage="story_plan") == '{"title": "x"}'
+
+    cache.ttl = -1
+    assert cache.get(key, stage="story_plan") is None
+
+    stats = cache.stats()["stages"]["story_plan"]
+    assert stats == {"hits": 1, "misses": 2}
+
+
+def test_lru_eviction_and_json_only_stages(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=2, ttl=60)
+    for i in range(3):
+        cache.put(f"k{i}", f'"v{i}"')
+        cache.store.execute("UPDATE responses SET last_access = ? WHERE key = ?", (i, f"k{i}"))
+    cache.evict()
+
+    assert cache.get("k0") is None
+    assert cache.get("k2") == '"v2"'
+
+    cache.put("bad", "not json", stage="cultural_analysis")
+    assert cache.get("bad", stage="cultural_analysis") is None
+
+
+def test_call_gpt_uses_cache_for_enabled_stages(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content='{"ok": true}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(llm, "create_chat_completion", fake_completion)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "_cache", ResponseCache(str(tmp_path / "cache.db")))
+
+    for _ in range(3):
+        assert llm.call_gpt("plan please", temperature=0.4, stage="story_plan") == '{"ok": true}'
+    assert len(calls) == 1
+
+    llm.call_gpt("write it", stage="story")
+    llm.call_gpt("write it", stage="story")
+    assert len(calls) == 3
+
+
+def test_unusable_cache_counts_as_a_miss(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content='{"ok": true}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    # The cache's directory can't be created: it is a file
+    (tmp_path / "not-a-dir").write_text("")
+    monkeypatch.setattr(llm, "create_chat_completion", fake_completion)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "_cache", ResponseCache(str(tmp_path / "not-a-dir" / "cache.db")))
+
+    for _ in range(2):
+        assert llm.call_gpt("plan please", stage="story_plan") == '{"ok": true}'
+    assert len(calls) == 2
+    assert llm_cache.cache_stats()["error"]
@@ -0,0 +1,41 @@
+import requests
+
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer, parse_latency
+from benchmarks.load_test import percentile, run_load_test
+from website import create_app
+
+
+def test_fake_server_injects_rate_limits():
+    config = FakeOpenAIConfig(rate_limit_rate=1.0, retry_after=3)
+    with FakeOpenAIServer(config) as server:
+        response = requests.post(f"{server.base_url}/chat/completions", json={"messages": []})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert server.counts == {"chat": 1, "rate_limited": 1}
+
+
+def test_latency_specs():
+    assert parse_latency("fixed:0.5")() == 0.5
+    assert parse_latency("0.25")() == 0.25
+    assert 0.2 <= parse_latency("uniform:0.2,0.3")() <= 0.3
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) is None
+
+
+def test_load_test_reports_endpoints_and_stages(fake_openai_server, tmp_path):
+    # A file database: an in-memory one shares a single connection between the job threads
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'load.db'}"})
+
+    report = run_load_test(app, concurrency=2, requests=4, endpoint="jobs", model="mixed")
+
+    assert report["succeeded"] == 4
+    assert report["endpoints"]["generate_story_jobs (complete)"]["count"] == 4
+    assert report["stages"]["a/story"]["count"] == 2
+    assert report["stages"]["b/story"]["count"] == 2
+    assert report["stages"]["b/story"]["completion_tokens"] > 0
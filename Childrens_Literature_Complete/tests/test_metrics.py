@@ -0,0 +1,59 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from website.services.shared import metrics, openai_gateway
+from website.services.shared.metrics import stage_timer, estimate_quantile
+
+
+def test_stage_timer_records_latency_tokens_and_errors():
+    with stage_timer("b", "story_plan"):
+        metrics.record_usage(SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+
+    with pytest.raises(ValueError):
+        with stage_timer("b", "story_plan"):
+            raise ValueError("boom")
+
+    entry = metrics.snapshot()[("b", "story_plan")]
+    assert sum(entry["buckets"]) == 2
+    assert entry["prompt_tokens"] == 120
+    assert entry["completion_tokens"] == 30
+    assert entry["errors"] == 1
+
+
+def test_gateway_errors_are_counted_once(monkeypatch):
+    def failing_create(**kwargs):
+        raise RuntimeError("rate limited")
+
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=failing_create))
+    )
+    monkeypatch.setattr(openai_gateway, "get_openai_client", lambda: client)
+
+    with pytest.raises(RuntimeError):
+        with stage_timer("a", "story"):
+            openai_gateway.create_chat_completion(model="gpt-4.1", messages=[])
+
+    assert metrics.snapshot()[("a", "story")]["errors"] == 1
+
+
+def test_estimate_quantile_interpolates_within_bucket():
+    buckets = [0] * (len(metrics.LATENCY_BUCKETS) + 1)
+    buckets[metrics.bucket_index(0.75)] = 10  # (0.5, 1] bucket
+    assert estimate_quantile(0.5, buckets) == pytest.approx(0.75)
+    assert math.isnan(estimate_quantile(0.5, [0] * len(buckets)))
+
+
+def test_metrics_endpoint_renders_prometheus_text(app):
+    with stage_timer("b", "image"):
+        pass
+
+    response = app.test_client().get("/metrics")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'story_stage_latency_seconds_count{model="b",stage="image"} 1' in body
+    assert 'story_stage_latency_p95_seconds{model="b",stage="image"}' in body
+    assert "# TYPE story_stage_errors_total counter" in body
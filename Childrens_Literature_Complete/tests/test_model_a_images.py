@@ -0,0 +1,48 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from website.services.model_a import image_generation
+
+
+class FakeImages:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def generate(self, model, prompt, size):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.1)
+        with self.lock:
+            self.active -= 1
+        if "middle" in prompt:
+            raise RuntimeError("rate limited")
+        beat = prompt.rsplit(": ", 1)[1]
+        return SimpleNamespace(data=[SimpleNamespace(url=f"https://img/{beat}")])
+
+
+def test_parallel_beats_keep_order_fallback_and_timings(monkeypatch):
+    images = FakeImages()
+    monkeypatch.setattr(image_generation, "create_image", images.generate)
+    monkeypatch.setattr(image_generation, "persist_remote_image", lambda url: url)
+
+    timings = []
+    urls = image_generation.generate_images_a(["start", "middle", "end"], parallel=True, timings=timings)
+
+    assert urls == ["https://img/start", image_generation.FALLBACK_IMAGE, "https://img/end"]
+    assert images.peak == 3
+    assert len(timings) == 3 and all(t >= 0.09 for t in timings)
+
+
+def test_sequential_mode(monkeypatch):
+    images = FakeImages()
+    monkeypatch.setattr(image_generation, "create_image", images.generate)
+    monkeypatch.setattr(image_generation, "persist_remote_image", lambda url: url)
+
+    urls = image_generation.generate_images_a(["a", "b", "c"], parallel=False)
+
+    assert urls == ["https://img/a", "https://img/b", "https://img/c"]
+    assert images.peak == 1
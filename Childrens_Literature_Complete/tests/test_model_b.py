@@ -7,18 +7,24 @@ from website.services.model_b.cultural_profile import build_cultural_profile
 from website.services.model_b.story_plan import generate_story_plan
 from website.services.model_b.story_generation import generate_story
 from website.services.model_b.validation import validate_story
-from website.services.model_b.image_generation import generate_images
+from website.services.model_b.image_generation import generate_images_from_story
 
 # --- Fake inputs for testing ---
-fake_user_input = "A story about a brave little girl"
+fake_user_input = {
+    "prompt_text": "A story about a brave little girl",
+    "character_name": "Maya",
+    "age_range": "5-7",
+    "traits": ["brave", "kind"],
+    "theme": "courage",
+}
 fake_user_metadata = {"age_group": "5-7", "region": "UK"}
-fake_cluster_context = {"theme": "courage"}
+fake_cluster_context = {"theme": "courage", "region": "UK"}
 
 # --- Stage 1: Cultural profile ---
 def test_cultural_profile():
     profile = build_cultural_profile(fake_user_metadata, fake_cluster_context)
     assert isinstance(profile, dict)
-    assert "region" in profile
+    assert profile["cultural_inputs"]["region"] == "UK"
 
 # --- Stage 2: Story plan ---
 def test_story_plan():
@@ -48,5 +54,6 @@ def test_story_validation():
 def test_image_generation():
     profile = build_cultural_profile(fake_user_metadata, fake_cluster_context)
     plan = generate_story_plan(fake_user_input, profile)
-    images = generate_images(plan, profile)
+    story_text = generate_story(plan, profile)
+    images = generate_images_from_story(story_text, {})
     assert isinstance(images, list) or isinstance(images, dict)
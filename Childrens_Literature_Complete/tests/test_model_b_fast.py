@@ -0,0 +1,51 @@
+import json
+
+from website.services.model_b import fast_prewrite
+from website.services.model_b.model_b import run_model_b
+
+
+def model_b_inputs():
+    return {
+        "user_input": {
+            "prompt_text": "A story about a curious girl",
+            "character_name": "Amara",
+            "age_range": "4-6",
+            "traits": ["curious", "kind"],
+            "location": "market",
+            "theme": "adventure",
+        },
+        "user_metadata": {},
+        "cluster_context": {"cultural_background": "Nigeria"},
+    }
+
+
+def test_fast_mode_makes_two_fewer_calls(fake_openai_server):
+    before = fake_openai_server.counts.get("chat", 0)
+    multi = run_model_b(**model_b_inputs(), pipeline_mode="multi")
+    multi_calls = fake_openai_server.counts["chat"] - before
+
+    before = fake_openai_server.counts["chat"]
+    fast = run_model_b(**model_b_inputs(), pipeline_mode="fast")
+    fast_calls = fake_openai_server.counts["chat"] - before
+
+    assert fast["metadata"]["pipeline_mode"] == "fast"
+    assert multi["metadata"]["pipeline_mode"] == "multi"
+    assert fast_calls == multi_calls - 2
+    assert fast["story_plan"] == multi["story_plan"]
+    assert fast["character_profile"]["locked_canonical_description"].startswith("Amara, a 4-6 year old")
+    assert fast["cultural_profile"]["cultural_analysis"]["cultural_themes"]
+    assert "prewrite" in fast["metadata"]["stage_timings"]
+
+
+def test_fast_prewrite_falls_back_per_part(monkeypatch):
+    partial = {"story_plan": {"title": "Only two beats", "plot_beats": ["a", "b"]},
+               "cultural_analysis": {"cultural_themes": ["sharing"]}}
+    monkeypatch.setattr(fast_prewrite, "call_gpt", lambda *a, **kw: json.dumps(partial))
+
+    user_input = {"character_name": "Leo", "age_descriptor": "7-9", "theme": "space"}
+    bundle = fast_prewrite.generate_prewrite_bundle(user_input, {}, ["brave"])
+
+    assert bundle["cultural_analysis"] == {"cultural_themes": ["sharing"]}
+    assert len(bundle["story_plan"]["plot_beats"]) == 3
+    assert bundle["story_plan"]["title"] == "Leo's Space Adventure"
+    assert bundle["character_profile"]["personality_traits"] == ["brave"]
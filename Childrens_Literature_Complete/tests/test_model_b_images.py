@@ -0,0 +1,57 @@
+import threading
+import time
+
+from website.services.model_b import image_generation
+
+SCENES = [
+    {"scene_id": i, "full_scene_description": f"scene {i}", "emotional_tone": "happy", "page_role": "opening"}
+    for i in range(1, 4)
+]
+
+
+def test_scenes_are_illustrated_concurrently_in_order(monkeypatch):
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_generate_image(prompt):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.1)
+        with lock:
+            active["now"] -= 1
+        if "scene 2" in prompt:
+            raise RuntimeError("image API down")
+        return "url-" + prompt.split("SCENE TO ILLUSTRATE:\n")[1].split("\n")[0]
+
+    monkeypatch.setattr(image_generation, "plan_illustrations_from_story", lambda story_text: SCENES)
+    monkeypatch.setattr(image_generation, "summarize_scene_for_illustration", lambda desc: desc)
+    monkeypatch.setattr(image_generation, "generate_image", fake_generate_image)
+
+    images = image_generation.generate_images_from_story("story", {"name": "Maya"}, max_workers=3)
+
+    assert images == ["url-scene 1", image_generation.FALLBACK_IMAGE, "url-scene 3"]
+    assert active["peak"] == 3
+
+
+def test_concurrency_limit_is_respected(monkeypatch):
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_generate_image(prompt):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        return "url"
+
+    monkeypatch.setattr(image_generation, "plan_illustrations_from_story", lambda story_text: SCENES)
+    monkeypatch.setattr(image_generation, "summarize_scene_for_illustration", lambda desc: desc)
+    monkeypatch.setattr(image_generation, "generate_image", fake_generate_image)
+
+    images = image_generation.generate_images_from_story("story", {}, max_workers=1)
+
+    assert images == ["url"] * 3
+    assert active["peak"] == 1
@@ -0,0 +1,79 @@
+import os
+import time
+from datetime import date
+
+import pytest
+
+from website import db
+from website.models.database import User, Story, StoryImage
+from website.services.export import pdf_export
+
+CONTENT = "Amara and the Lanterns\n\nAmara woke up early.\n\nShe went to the market. 🏮\n\nShe lit a lantern.\n\nThe End."
+
+
+@pytest.fixture
+def client(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_export, "PDF_EXPORT_DIR", str(tmp_path / "pdf"))
+    return app.test_client()
+
+
+def add_story():
+    user = User(first_name="A", last_name="B", consent=True, date=date(2026, 1, 6))
+    db.session.add(user)
+    db.session.flush()
+    story = Story(title="Amara and the Lanterns", content=CONTENT, user_id=user.id, model_used="b")
+    db.session.add(story)
+    db.session.flush()
+    db.session.add_all([
+        StoryImage(story_id=story.id, image_url="/static/fallback_image.png", phase="beginning"),
+        StoryImage(story_id=story.id, image_url="/images/" + "0" * 64, phase="middle"),
+    ])
+    db.session.commit()
+    return story
+
+
+def download(client, story_id, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = client.get(f"/stories/{story_id}/pdf")
+        if response.status_code != 202:
+            return response
+        assert response.headers["Retry-After"] == "2"
+        time.sleep(0.1)
+    raise AssertionError("PDF was never rendered")
+
+
+def test_split_story_parts_drops_title():
+    assert pdf_export.split_story_parts(CONTENT, "Amara and the Lanterns") == [
+        "Amara woke up early.",
+        "She went to the market. 🏮",
+        "She lit a lantern.\n\nThe End.",
+    ]
+
+
+def test_pdf_is_rendered_in_background_then_served_from_cache(client, monkeypatch):
+    story = add_story()
+
+    assert client.get(f"/stories/{story.id}/pdf").status_code == 202
+    response = download(client, story.id)
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert response.data.startswith(b"%PDF")
+    first_file = os.listdir(pdf_export.PDF_EXPORT_DIR)
+    assert len(first_file) == 1
+
+    def no_render(*args):
+        raise AssertionError("cached PDF was rendered again")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pdf_export, "render_story_pdf", no_render)
+        assert client.get(f"/stories/{story.id}/pdf").status_code == 200
+
+    # New content, new file; the old one is cleaned up
+    story.content = CONTENT.replace("early", "late")
+    db.session.commit()
+    assert download(client, story.id).status_code == 200
+    files = os.listdir(pdf_export.PDF_EXPORT_DIR)
+    assert len(files) == 1 and files != first_file
+
+    assert client.get("/stories/999/pdf").status_code == 404
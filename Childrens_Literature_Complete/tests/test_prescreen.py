@@ -0,0 +1,86 @@
+from website.services.model_b import validation
+from website.services.model_b.prescreen import prescreen_story
+from website.services.shared import metrics
+
+PROFILE = {
+    "story_context": {
+        "character_name": "Amara",
+        "traits": ["curious", "kind"],
+        "age_descriptor": "4-6",
+    }
+}
+
+GOOD_STORY = (
+    "Amara loved the market. She was curious about every stall.\n\n"
+    "She helped a kind old man carry his baskets. They laughed together.\n\n"
+    "The End."
+)
+
+MARKET_STORY = (
+    "Amara and the Market Day\n\n"
+    "Amara woke up early. The sun was warm and the birds were singing. "
+    "Today was market day, and Amara was curious about everything.\n\n"
+    "She held her grandmother's hand. They walked down the dusty road to the market. "
+    "There were baskets of mangoes and piles of bright cloth. A man was playing a drum.\n\n"
+    "Amara saw a little boy who was crying. He had lost his mother. "
+    "Amara was kind. She gave him a sweet mango and held his hand. "
+    "Together they looked for his mother by the fruit stalls.\n\n"
+    "Soon they heard a voice. \"Kofi! Kofi!\" It was his mother! "
+    "Kofi ran to her and gave her a big hug. His mother smiled at Amara and said thank you.\n\n"
+    "On the way home, Amara hummed a happy song. Grandmother said, \"You were very kind today.\" "
+    "Amara smiled. Helping someone made her heart feel warm and full.\n\n"
+    "The End."
+)
+
+
+def test_clean_story_passes():
+    result = prescreen_story(GOOD_STORY, PROFILE)
+    assert result == {"passed": True, "flags": [], "seconds": result["seconds"]}
+
+
+def test_realistic_story_passes_for_young_readers():
+    # Over 100 words, so the standardised TTR is checked too
+    for age in ("4-6", "7-9"):
+        profile = {"story_context": {**PROFILE["story_context"], "age_descriptor": age}}
+        assert prescreen_story(MARKET_STORY, profile)["flags"] == []
+
+
+def test_flags_lexicon_length_and_missing_parts():
+    story = (
+        "Leo found a gun near the primitive village. "
+        + "He walked and walked and walked along the very long and winding road past the river "
+          "and the hills and the trees until the sun went down behind the mountains. " * 3
+    )
+    flags = prescreen_story(story, PROFILE)["flags"]
+    checks = [flag.split(":")[0] for flag in flags]
+
+    assert "age_appropriateness" in checks
+    assert "sensitivity" in checks
+    assert "sentence_length" in checks
+    assert "character" in checks
+    assert "traits" in checks
+    assert "ending" in checks
+    assert not prescreen_story("Hello from the seashell shop, Amara said kindly. The End.", PROFILE)["flags"]
+
+
+def test_validate_story_only_calls_llm_when_flagged(monkeypatch):
+    prompts = []
+
+    def fake_call_gpt(prompt, **kwargs):
+        prompts.append(prompt)
+        return GOOD_STORY
+
+    monkeypatch.setattr(validation, "call_gpt", fake_call_gpt)
+
+    assert validation.validate_story(GOOD_STORY, PROFILE) == GOOD_STORY
+    assert prompts == []
+
+    assert validation.validate_story(GOOD_STORY.replace("The End.", ""), PROFILE) == GOOD_STORY
+    assert len(prompts) == 1
+    assert "ending: does not end with 'The End.'" in prompts[0]
+
+    counters = metrics.snapshot()[("b", "prescreen")]
+    assert counters["prescreen_passed"] == 1
+    assert counters["prescreen_flagged"] == 1
+    assert counters["prescreen_flag_ending"] == 1
+    assert sum(counters["buckets"]) == 2
@@ -0,0 +1,73 @@
+from website.services.model_b import story_generation
+from website.services.model_b.model_b import (
+    CulturalIntelligenceEngine,
+    stage_cultural_profile,
+    stage_story_cultural_profile,
+)
+from website.services.model_b.prompt_context import build_prompt_context, estimate_tokens
+from website.services.shared import metrics
+
+USER_INPUT = {
+    "character_name": "Amara",
+    "age_descriptor": "4-6",
+    "character_gender": "female",
+    "location": "market",
+    "theme": "adventure",
+}
+CHARACTER_PROFILE = {
+    "name": "Amara",
+    "age_description": "a 4-6 year old child",
+    "visual_identity": {"skin_tone": "deep brown skin", "hairstyle": "two puffs"},
+    "personality_traits": ["Curious", "kind", "brave"],
+    "art_style": "soft watercolor children's book illustration",
+}
+
+
+def story_profile():
+    cultural_profile = stage_cultural_profile(
+        user_input=USER_INPUT,
+        user_metadata={"cultural_background": "Nigerian", "region": "Lagos"},
+        cluster_context={"cultural_background": "Nigerian", "specific_traditions": "lanterns"},
+        traits=["curious", "kind"],
+        cultural_analysis=CulturalIntelligenceEngine.fallback_analysis(),
+    )
+    return stage_story_cultural_profile(cultural_profile, CHARACTER_PROFILE)
+
+
+def test_context_keeps_stage_fields_once():
+    profile = story_profile()
+    context = build_prompt_context(profile, "story")
+
+    assert context.splitlines()[:4] == [
+        "- Main character: Amara",
+        "- Age guidance: 4-6",
+        "- Gender: female",
+        "- Traits: curious, kind, brave",
+    ]
+    assert "- Cultural background: Nigerian\n- Traditions: lanterns\n- Region: Lagos" in context
+    assert context.count("Nigerian") == 1
+    assert "watercolor" not in context and "two puffs" not in context
+    assert "Show authentic cultural elements" not in context  # static principles
+    assert estimate_tokens(context) < estimate_tokens(str(profile)) / 2
+
+    # Stable: key order of the input doesn't change the text
+    reordered = dict(reversed(list(profile.items())))
+    assert build_prompt_context(reordered, "story") == context
+
+    validation_context = build_prompt_context(profile, "validation")
+    assert "Authentic details" not in validation_context
+    assert "Language and tone: simple language, positive messages" in validation_context
+
+
+def test_story_prompt_uses_compact_context(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(story_generation, "call_gpt", lambda prompt, **kwargs: prompts.append(prompt) or "The End.")
+    profile = story_profile()
+
+    story_generation.generate_story({"title": "Lanterns"}, profile)
+
+    assert "- Traditions: lanterns" in prompts[0]
+    assert "'story_context'" not in prompts[0]
+    counters = metrics.snapshot()[("b", "story")]
+    assert counters["context_tokens_raw"] == estimate_tokens(str(profile))
+    assert counters["context_tokens_compact"] == estimate_tokens(build_prompt_context(profile, "story"))
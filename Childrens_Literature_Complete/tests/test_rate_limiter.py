@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from openai import RateLimitError
+
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from website.services.shared import deadline as deadline_module
+from website.services.shared import metrics, openai_gateway, rate_limiter
+from website.services.shared.deadline import DeadlineExceeded, deadline
+from website.services.shared.llm import call_gpt
+
+
+def test_buckets_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "limits.db")
+    worker_1 = rate_limiter.TokenBuckets(path)
+    worker_2 = rate_limiter.TokenBuckets(path)
+    capacities = {"chat_requests": 60, "chat_tokens": 600}
+
+    assert worker_1.take({"chat_requests": 1, "chat_tokens": 500}, capacities) == 0
+    # Only ~100 tokens left for the other worker: wait for the refill (10/s)
+    wait = worker_2.take({"chat_requests": 1, "chat_tokens": 200}, capacities)
+    assert 9 < wait <= 10
+    # Nothing was taken from any bucket by the refused request
+    assert worker_1.take({"chat_requests": 1, "chat_tokens": 100}, capacities) == 0
+
+    worker_2.block(["chat_requests"], 5)
+    assert 4 < worker_1.take({"chat_requests": 1, "chat_tokens": 1}, capacities) <= 5
+
+
+def test_aimd_concurrency():
+    limit = rate_limiter.AdaptiveConcurrency(initial=4, maximum=8, latency_target=1)
+    for _ in range(4):
+        assert limit.acquire(timeout=0)
+    assert not limit.acquire(timeout=0)
+
+    for _ in range(4):
+        limit.release(latency=0.1)
+    assert limit.limit > 4.9
+
+    assert limit.acquire(timeout=0)
+    limit.release(latency=0.1, rate_limited=True)
+    assert limit.limit < 2.6
+
+    assert limit.acquire(timeout=0)
+    before = limit.limit
+    limit.release(latency=5)
+    assert limit.limit == pytest.approx(before * 0.9)
+
+
+def test_waits_are_counted_and_bounded_by_the_deadline(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "IMAGE_RPM", 60)
+
+    with metrics.stage_timer("b", "image"):
+        for _ in range(60):
+            rate_limiter.acquire("image").release(usage=None)
+        rate_limiter.acquire("image").release(usage=None)
+
+        with deadline(0.5), pytest.raises(DeadlineExceeded):
+            rate_limiter.acquire("image")
+
+    counters = metrics.snapshot()[("b", "image")]
+    assert counters["throttle_waits"] == 1
+    assert 0.5 < counters["throttle_wait_seconds"] < 2
+
+
+def test_429s_block_the_endpoint_and_shrink_concurrency(monkeypatch):
+    config = FakeOpenAIConfig(rate_limit_rate=1.0, retry_after=0.2, seed=1)
+    with FakeOpenAIServer(config) as server:
+        monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setattr(deadline_module, "OPENAI_RETRY_WAIT", 0.01)
+        monkeypatch.setattr(deadline_module, "OPENAI_RETRY_MAX_WAIT", 0.05)
+        openai_gateway.reset_client()
+
+        started = time.perf_counter()
+        with metrics.stage_timer("b", "story"), pytest.raises(RateLimitError):
+            call_gpt("Hello")
+        openai_gateway.reset_client()
+
+    # Every retry waited out the Retry-After the previous 429 set
+    assert time.perf_counter() - started >= 0.4
+    assert server.counts["rate_limited"] == deadline_module.OPENAI_MAX_ATTEMPTS
+    assert metrics.snapshot()[("b", "story")]["rate_limited"] == deadline_module.OPENAI_MAX_ATTEMPTS
+    chat = rate_limiter.get_concurrency("chat")
+    assert chat.limit == 1 and chat.in_flight == 0
+
+
+def test_token_estimate_is_settled_against_usage(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "CHAT_TPM", 10000)
+    buckets = rate_limiter.get_buckets()
+
+    call_gpt("Hello", max_tokens=2000)
+
+    level, = buckets.store.execute("SELECT level FROM buckets WHERE name = 'chat_tokens'").fetchone()
+    # The fake server reports far fewer tokens than the 2001 estimated
+    assert level > 10000 - 200
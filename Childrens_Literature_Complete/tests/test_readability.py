@@ -0,0 +1,76 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from website import db
+from website.cli import readability_report
+from website.models.database import User, Prompt, Story
+from website.services.model_b.readability import (
+    analyze_story,
+    count_syllables,
+    preset_for_age_range,
+    score_texts,
+)
+
+SIMPLE = "Sam has a red hat.\nHe likes the hat.\nThe End."
+HARD = (
+    "Notwithstanding considerable meteorological uncertainty, the extraordinarily "
+    "enthusiastic expedition participants systematically investigated the "
+    "unexplored territories surrounding the magnificent mountains. "
+) * 3
+
+
+def test_presets_follow_age_range():
+    assert preset_for_age_range("4-6") == "Early Reader (4–6)"
+    assert preset_for_age_range("7-9") == "Developing Reader (6–8)"
+    assert preset_for_age_range("10-12") == "Confident Reader (8–10)"
+    assert [count_syllables(w) for w in ("cat", "table", "loved", "wanted")] == [1, 2, 1, 2]
+
+
+def test_analyze_story_metrics():
+    result = analyze_story(SIMPLE, "4-6")
+
+    assert result["sentence_lengths"] == [5, 4, 2]
+    assert result["tokens"] == 11
+    assert result["ttr"] == pytest.approx(9 / 11)
+    assert result["passed"] is True
+
+
+def test_batch_matches_single_scoring_and_flags_hard_text():
+    scores = score_texts([SIMPLE, HARD, ""], ["4-6", "4-6", "7-9"], length_preset="Short (3–5 min)")
+
+    assert scores["tokens"].tolist() == [11, analyze_story(HARD)["tokens"], 0]
+    assert scores["grade_level"][0] == pytest.approx(analyze_story(SIMPLE, "4-6")["grade_level"])
+    checks = [flag.split(":")[0] for flag in scores["flags"][1]]
+    assert "sentence_length" in checks and "grade_level" in checks
+    assert np.all(~scores["passed"])  # every story is outside the Short length preset
+
+
+def test_vocabulary_gate_uses_standardised_ttr_limits():
+    repetitive = "Sam ran to the big red ball. The ball was fun. Sam ran and ran. " * 10
+    # 120 different two-letter "words": every word of each chunk is new
+    varied = " ".join(a + b for a in "abcde" for b in "abcdefghijklmnopqrstuvwx") + "."
+
+    assert analyze_story(repetitive, "4-6")["passed"] is True
+    flags = analyze_story(varied, "4-6")["flags"]
+    assert any(flag.startswith("vocabulary:") and "limit 0.75" in flag for flag in flags)
+
+
+def test_readability_report_scores_story_table(app, tmp_path):
+    user = User(first_name="A", last_name="B", consent=True, date=date(2026, 1, 6))
+    db.session.add(user)
+    db.session.flush()
+    prompt = Prompt(user_id=user.id, age_range="4-6")
+    db.session.add(prompt)
+    db.session.flush()
+    for text in (SIMPLE, HARD):
+        db.session.add(Story(title="t", content=text, user_id=user.id, prompt_id=prompt.id, model_used="b"))
+    db.session.commit()
+
+    out = tmp_path / "scores.csv"
+    result = app.test_cli_runner().invoke(readability_report, ["--out", str(out)])
+
+    assert result.exit_code == 0, result.output
+    assert "Early Reader" in result.output
+    assert out.read_text().count("\n") == 3
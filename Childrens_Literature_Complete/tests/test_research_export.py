@@ -0,0 +1,110 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+
+import pytest
+
+from website import db
+from website.cli import research_export as research_export_command
+from website.models.database import User, Prompt, Story, StoryImage
+from website.services.export import research_export
+
+
+@pytest.fixture
+def app(app):
+    """The shared app with one user, one prompt and five stories."""
+    user = User(first_name="Ada", last_name="Lovelace", consent=True, date=date(2026, 1, 6))
+    db.session.add(user)
+    db.session.flush()
+    prompt = Prompt(user_id=user.id, age_range="4-6", theme="space")
+    db.session.add(prompt)
+    db.session.flush()
+    for day in range(1, 6):
+        story = Story(
+            title=f"Story {day}", content="x" * day * 10, user_id=user.id, prompt_id=prompt.id,
+            model_used="b" if day % 2 else "a", character_profile='{"name": "Leo"}',
+            created_at=datetime(2026, 2, day, 12),
+        )
+        db.session.add(story)
+        db.session.flush()
+        db.session.add(StoryImage(story_id=story.id, image_url=f"/img/{day}.png", phase="middle"))
+    db.session.commit()
+    return app
+
+
+def test_chunks_are_keyset_paged_and_filtered(app):
+    chunks = list(research_export.iter_export_chunks(chunk_size=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    rows = [row for chunk in chunks for row in chunk]
+    assert [row["story_id"] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[2]["content_chars"] == 30
+    assert rows[2]["image_middle"] == "/img/3.png" and rows[2]["image_beginning"] is None
+    assert rows[0]["age_range"] == "4-6"
+    assert "content" not in rows[0] and "first_name" not in rows[0]
+
+    filtered = [
+        row for chunk in research_export.iter_export_chunks(
+            date_from=date(2026, 2, 2), date_to=date(2026, 2, 4), model_used="b", include_profiles=True
+        )
+        for row in chunk
+    ]
+    assert [row["story_id"] for row in filtered] == [3]
+    assert filtered[0]["character_profile"] == '{"name": "Leo"}'
+
+
+def test_route_needs_token_and_streams_csv(app, monkeypatch):
+    client = app.test_client()
+    assert client.get("/research_export").status_code == 404
+
+    monkeypatch.setattr(research_export, "RESEARCH_EXPORT_TOKEN", "secret")
+    assert client.get("/research_export?token=wrong").status_code == 404
+    assert client.get("/research_export?token=secret&from=Feb").status_code == 400
+
+    response = client.get("/research_export?model=a&content=1", headers={"X-Export-Token": "secret"})
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["story_id"] for row in rows] == ["2", "4"]
+    assert rows[0]["content"] == "x" * 20
+
+
+def test_failed_parquet_export_cleans_up(app, monkeypatch):
+    paths = []
+
+    def broken_write_parquet(chunks, columns, path):
+        paths.append(path)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(research_export, "RESEARCH_EXPORT_TOKEN", "secret")
+    monkeypatch.setattr(research_export, "parquet_available", lambda: True)
+    monkeypatch.setattr(research_export, "write_parquet", broken_write_parquet)
+
+    response = app.test_client().get("/research_export?token=secret&format=parquet")
+
+    assert response.status_code == 500
+    assert response.get_json()["success"] is False
+    assert not os.path.exists(paths[0])
+
+
+def test_cli_writes_csv(app, tmp_path):
+    out = tmp_path / "study.csv"
+    result = app.test_cli_runner().invoke(
+        research_export_command, [str(out), "--from", "2026-02-03", "--chunk-size", "2"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Exported 3 stories in 2 chunks" in result.output
+    assert len(list(csv.DictReader(out.open()))) == 3
+
+
+def test_cli_writes_parquet(app, tmp_path):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    out = tmp_path / "study.parquet"
+
+    result = app.test_cli_runner().invoke(research_export_command, [str(out), "--chunk-size", "2"])
+
+    assert result.exit_code == 0, result.output
+    frame = pd.read_parquet(out)
+    assert frame["story_id"].tolist() == [1, 2, 3, 4, 5]
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+from website.services.model_b.model_b import build_model_b_graph
+from website.services.model_b.stage_graph import Stage, StageGraph, StageGraphError
+
+
+def slow(value, delay=0.2):
+    time.sleep(delay)
+    return value
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph([
+        Stage("profile", lambda seed: seed + "-profile", ["seed"]),
+        Stage("plan", lambda profile: slow(profile + "-plan"), ["profile"]),
+        Stage("character", lambda profile: slow(profile + "-character"), ["profile"]),
+        Stage("story", lambda plan, character: f"{plan}|{character}", ["plan", "character"]),
+    ])
+
+    started = time.perf_counter()
+    values = graph.run({"seed": "x"})
+    elapsed = time.perf_counter() - started
+
+    assert values["story"] == "x-profile-plan|x-profile-character"
+    assert elapsed < 0.35
+    assert set(graph.timings) == {"profile", "plan", "character", "story"}
+    assert graph.timings["plan"] >= 0.19
+
+
+def test_stage_failure_names_the_stage():
+    def boom(seed):
+        raise RuntimeError("no luck")
+
+    graph = StageGraph([Stage("bad", boom, ["seed"])])
+
+    with pytest.raises(StageGraphError) as info:
+        graph.run({"seed": 1})
+    assert info.value.stage_name == "bad"
+
+
+def test_missing_input_is_reported():
+    graph = StageGraph([Stage("story", lambda plan: plan, ["plan"])])
+
+    with pytest.raises(ValueError, match="plan"):
+        graph.run({})
+
+
+def test_model_b_graph_character_does_not_wait_for_plan():
+    stages = build_model_b_graph().stages
+    assert "story_plan" not in stages["character_profile"].inputs
+    assert "character_profile" not in stages["story_plan"].inputs
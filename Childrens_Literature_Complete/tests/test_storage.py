@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import inspect, text
+
+from website import create_app, db
+from website.models.database import User, Story
+from website.models.migrations import upgrade_database
+from website.models.storage import engine_options
+from website.services.jobs.generation import save_story
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'stories.db'}"})
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_file_database_uses_wal_and_pool_settings(file_app):
+    with db.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 30000
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+
+    assert db.engine.pool.size() == file_app.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_size"]
+    assert engine_options("sqlite:///:memory:") == {}
+
+
+def test_foreign_key_indexes_are_added_to_existing_databases(file_app):
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_story_prompt_id"))
+
+    upgrade_database(db.engine)
+
+    indexed = {
+        (table, tuple(index["column_names"]))
+        for table in ("prompt", "story", "story_image")
+        for index in inspect(db.engine).get_indexes(table)
+    }
+    assert {
+        ("prompt", ("user_id",)),
+        ("story", ("user_id",)),
+        ("story", ("prompt_id",)),
+        ("story_image", ("story_id",)),
+    } <= indexed
+
+
+def test_save_story_writes_story_and_images_atomically(file_app):
+    user = User(first_name="A", last_name="B", consent=True, date=date(2026, 1, 6))
+    db.session.add(user)
+    db.session.commit()
+
+    story_id = save_story(user.id, None, "Title\n\nThe End.", ["/1.png", "/2.png", "/3.png"], "a")
+    assert len(Story.query.get(story_id).images) == 3
+
+    # image_url is NOT NULL: the failing image must take the story with it
+    with pytest.raises(Exception):
+        save_story(user.id, None, "Broken\n\nThe End.", ["/1.png", None], "a")
+    assert Story.query.count() == 1
@@ -0,0 +1,90 @@
+import json
+from types import SimpleNamespace
+
+from website.services.jobs.streaming import stream_job_events
+from website.services.shared import llm
+
+
+def parse_events(messages):
+    events = []
+    for message in messages:
+        if message.startswith(":"):
+            continue
+        event_line, data_line = message.strip().split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_sse_forwards_new_text_then_result():
+    snapshots = iter([
+        SimpleNamespace(status="running", partial_text=None),
+        SimpleNamespace(status="running", partial_text="Once upon"),
+        SimpleNamespace(status="running", partial_text="Once upon a time"),
+        SimpleNamespace(status="running", partial_text="Model A"),
+        SimpleNamespace(status="done", partial_text="Model A story"),
+    ])
+
+    messages = stream_job_events(
+        "job1",
+        load_job=lambda job_id: next(snapshots),
+        job_payload=lambda job: {"status": job.status, "story": "final"},
+        sleep=lambda seconds: None,
+    )
+
+    assert parse_events(messages) == [
+        ("token", {"text": "Once upon"}),
+        ("token", {"text": " a time"}),
+        ("reset", {}),
+        ("token", {"text": "Model A"}),
+        ("token", {"text": " story"}),
+        ("done", {"status": "done", "story": "final"}),
+    ]
+
+
+def test_sse_reports_failed_job():
+    messages = stream_job_events(
+        "job1",
+        load_job=lambda job_id: SimpleNamespace(status="failed", partial_text=""),
+        job_payload=lambda job: {"status": job.status, "error": "boom"},
+        sleep=lambda seconds: None,
+    )
+    assert parse_events(messages) == [("error", {"status": "failed", "error": "boom"})]
+
+
+def test_sse_hands_over_to_polling_once_story_is_saved():
+    snapshots = iter([
+        SimpleNamespace(status="running", partial_text="Once"),
+        SimpleNamespace(status="running", partial_text="Once upon a time"),
+    ])
+    payloads = iter([
+        {"status": "running"},
+        {"status": "running", "story_id": 7, "images": ["/img/1.png", None, None]},
+    ])
+
+    messages = stream_job_events(
+        "job1",
+        load_job=lambda job_id: next(snapshots),
+        job_payload=lambda job: next(payloads),
+        sleep=lambda seconds: None,
+    )
+
+    assert [event for event, _ in parse_events(messages)] == ["token", "token", "story", "image", "poll"]
+
+
+def test_sse_response_is_capped():
+    messages = stream_job_events(
+        "job1",
+        load_job=lambda job_id: SimpleNamespace(status="running", partial_text=""),
+        job_payload=lambda job: {"status": job.status},
+        sleep=lambda seconds: None,
+        max_seconds=2,
+    )
+    assert parse_events(messages) == [("poll", {"status": "running"})]
+
+
+def test_call_gpt_streams_tokens(monkeypatch):
+    monkeypatch.setattr(llm, "stream_chat_completion", lambda **kwargs: iter(["The ", "End."]))
+    received = []
+
+    assert llm.call_gpt("write", stage="story", on_token=received.append) == "The End."
+    assert received == ["The ", "End."]
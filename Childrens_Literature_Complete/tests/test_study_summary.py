@@ -0,0 +1,95 @@
+from datetime import date
+
+from website import db
+from website.cli import rebuild_study_summary_command
+from website.models.database import User, Prompt, StudySummary
+from website.services.jobs import generation
+from website.services.jobs.generation import generate_story_for_prompt, save_story
+from website.services.jobs.study_summary import rebuild_study_summary, study_summary
+
+
+def add_prompt(age_range, theme):
+    user = User(first_name="A", last_name="B", consent=True, date=date(2026, 1, 6))
+    db.session.add(user)
+    db.session.flush()
+    prompt = Prompt(user_id=user.id, age_range=age_range, theme=theme)
+    db.session.add(prompt)
+    db.session.commit()
+    return user.id, prompt.id
+
+
+def save_study_stories():
+    user_a, prompt_a = add_prompt("4-6", "space")       # odd id: arm a
+    user_b, prompt_b = add_prompt("7-9", "space")       # even id: arm b
+    save_story(user_a, prompt_a, "one two three four", [], "a")
+    save_story(user_b, prompt_b, "one two", [], "b")
+    save_story(user_b, prompt_b, "one two three four five six", [], "a")   # Model B fell back
+    save_story(user_b, None, "one two three four", [], "b")
+
+
+def test_saving_stories_updates_the_aggregates(app):
+    save_study_stories()
+
+    summary = study_summary()
+    assert summary["arms"] == [
+        {"arm": "a", "stories": 1, "fell_back": 0, "fallback_rate": 0.0},
+        {"arm": "b", "stories": 3, "fell_back": 1, "fallback_rate": 33.3},
+    ]
+    assert summary["models"] == [
+        {"model_used": "a", "stories": 2, "avg_words": 5.0, "avg_chars": 22.5},
+        {"model_used": "b", "stories": 2, "avg_words": 3.0, "avg_chars": 12.5},
+    ]
+    assert summary["theme"][0] == {"bucket": "space", "a": 2, "b": 1, "avg_words_a": 5.0, "avg_words_b": 2.0}
+    assert {bucket["bucket"] for bucket in summary["age_range"]} == {"4-6", "7-9", "unknown"}
+
+
+def test_nothing_to_save_is_not_counted(app):
+    assert save_story(None, None, "one two", [], "a") is None
+    assert study_summary()["arms"] == []
+
+
+def test_rebuild_matches_incremental_totals(app):
+    save_study_stories()
+    incremental = study_summary()
+
+    StudySummary.query.delete()
+    db.session.commit()
+    result = app.test_cli_runner().invoke(rebuild_study_summary_command)
+
+    assert result.exit_code == 0, result.output
+    assert "Summarized 4 stories" in result.output
+    assert study_summary() == incremental
+
+
+def test_arm_is_the_requested_model_not_user_parity(app, monkeypatch):
+    user_a, prompt_a = add_prompt("4-6", "space")   # odd id, parity says arm a
+
+    def broken_model_b(**kwargs):
+        raise RuntimeError("Model B failed")
+
+    def model_a(**kwargs):
+        return {"story_text": "Title\n\nOne two three.\n\nThe End.", "images": ["/img/1.png"] * 3}
+
+    monkeypatch.setattr(generation, "run_model_b", broken_model_b)
+    monkeypatch.setattr(generation, "run_model_a", model_a)
+    # A batch run forcing Model B for this user, which then falls back to A
+    result = generate_story_for_prompt(user_a, prompt_a, "A story", model_choice="b")
+
+    assert result["model_used"] == "a"
+    assert study_summary()["arms"] == [{"arm": "b", "stories": 1, "fell_back": 1, "fallback_rate": 100.0}]
+
+    StudySummary.query.delete()
+    db.session.commit()
+    rebuild_study_summary()
+    assert study_summary()["arms"][0]["arm"] == "b"
+
+
+def test_dashboard_reads_the_aggregates(app):
+    client = app.test_client()
+    assert b"No stories yet" in client.get("/dashboard").data
+
+    save_study_stories()
+    page = client.get("/dashboard")
+    assert page.status_code == 200
+    assert b"33.3%" in page.data
+    assert client.get("/dashboard?format=json").get_json()["arms"][1]["fell_back"] == 1
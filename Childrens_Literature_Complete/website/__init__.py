@@ -11,18 +11,37 @@ def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'a_secret_key'
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_NAME}'
+    if config:
+        app.config.update(config)
+
+    from .models.storage import engine_options, configure_sqlite
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite(db.engine)
 
     from .routes import routes
     app.register_blueprint(routes, url_prefix='/')
 
-    from .models.database import User, Prompt, Story
+    from .cli import batch_generate, readability_report, rebuild_study_summary_command, research_export
+    app.cli.add_command(batch_generate)
+    app.cli.add_command(readability_report)
+    app.cli.add_command(research_export)
+    app.cli.add_command(rebuild_study_summary_command)
+
+    from .models.database import User, Prompt, Story, GenerationJob
     create_database(app)
 
     return app
 
 def create_database(app):
-    if not os.path.exists(DB_NAME):  # just check current folder
-        with app.app_context():
-            db.create_all()
+    # create_all only adds missing tables, so it is safe on an existing
+    # database and picks up tables added after the first deploy
+    from .models.migrations import upgrade_database
+
+    existed = os.path.exists(DB_NAME)
+    with app.app_context():
+        db.create_all()
+        upgrade_database(db.engine)
+    if not existed:
         print("Database created!")
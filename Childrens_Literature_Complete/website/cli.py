@@ -0,0 +1,317 @@
+"""
+Command-line tools, registered on the Flask app:
+
+    flask --app app batch-generate prompts.csv --workers 8
+    flask --app app readability-report --out readability.csv
+    flask --app app research-export study.csv --from 2026-01-01 --model b
+    flask --app app rebuild-study-summary
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from website import db
+from website.models.database import User, Prompt, Story
+from website.services.export.research_export import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    export_columns,
+    iter_csv,
+    iter_export_chunks,
+    parquet_available,
+    write_parquet,
+)
+from website.services.jobs.generation import build_prompt_text, generate_story_for_prompt
+from website.services.jobs.study_summary import rebuild_study_summary
+from website.services.model_b.readability import score_story_table
+from website.services.model_b.story_presets import STORY_LENGTH_PRESETS
+
+PROMPT_FIELDS = (
+    "age_range",
+    "character_name",
+    "character_type",
+    "character_gender",
+    "character_traits",
+    "location",
+    "theme",
+    "character_cultural_background",
+    "specific_traditions",
+)
+
+
+def read_prompt_rows(path):
+    """Rows of a CSV or JSONL prompt file as dicts, each with a stable row key."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    for number, row in enumerate(rows, start=1):
+        row = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()}
+        row["row_key"] = str(row.get("id") or number)
+        yield row
+
+
+def load_batch_state(path):
+    """row_key -> latest state entry from an append-only JSONL state file."""
+    state = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    state[entry["row_key"]] = entry
+    return state
+
+
+def append_batch_state(path, entry):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def create_prompt_from_row(row):
+    """Create the User and Prompt rows for one input row; returns the Prompt."""
+    user = User(
+        first_name=row.get("first_name") or "Batch",
+        last_name=row.get("last_name") or f"Row {row['row_key']}",
+        consent=True,
+        date=date.today(),
+    )
+    db.session.add(user)
+    db.session.flush()
+
+    fields = {name: row.get(name) or None for name in PROMPT_FIELDS}
+    fields["age_range"] = fields["age_range"] or "4-6"
+    fields["character_gender"] = fields["character_gender"] or "unspecified"
+    prompt = Prompt(user_id=user.id, **fields)
+    db.session.add(prompt)
+    db.session.commit()
+    return prompt
+
+
+# App of a batch worker process (ProcessPoolExecutor initializer)
+_worker_app = None
+
+
+def run_batch_item(user_id, prompt_id, prompt_text, model_choice=None, app=None):
+    """
+    Generate and save one story; runs in a pool thread (app given) or in a
+    worker process (its own app, see _init_worker_process).
+    """
+    app = app or _worker_app
+    started = time.perf_counter()
+    with app.app_context():
+        result = generate_story_for_prompt(user_id, prompt_id, prompt_text, model_choice=model_choice)
+    return result["story_id"], result["model_used"], time.perf_counter() - started
+
+
+def _init_worker_process(config):
+    global _worker_app
+    from website import create_app
+    from website.services.shared.openai_gateway import reset_client
+
+    reset_client()
+    _worker_app = create_app(config)
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+@click.command("batch-generate")
+@click.argument("prompts_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", default=4, show_default=True, help="Stories generated at once.")
+@click.option("--processes", is_flag=True, help="Use worker processes instead of threads.")
+@click.option("--model", "model_choice", type=click.Choice(["a", "b"]),
+              help="Force a model (default: a per-row 'model' column, else by user id).")
+@click.option("--state", "state_path", type=click.Path(dir_okay=False),
+              help="Resume file (default: <prompts_file>.state.jsonl).")
+@click.option("--retry-failed", is_flag=True, help="Run rows that failed last time again.")
+@with_appcontext
+def batch_generate(prompts_file, workers, processes, model_choice, state_path, retry_failed):
+    """
+    Generate one story per row of a CSV or JSONL prompt file.
+
+    Columns match the create_story form (age_range, character_name,
+    character_type, character_gender, character_traits, location, theme,
+    character_cultural_background, specific_traditions) plus optional id,
+    first_name, last_name and model. Progress is appended to a state file,
+    so an interrupted run picks up where it stopped.
+    """
+    state_path = state_path or f"{prompts_file}.state.jsonl"
+    state = load_batch_state(state_path)
+    rows = list(read_prompt_rows(prompts_file))
+
+    todo = []
+    skipped = 0
+    for row in rows:
+        entry = state.get(row["row_key"], {})
+        if entry.get("status") == "done" or (entry.get("status") == "failed" and not retry_failed):
+            skipped += 1
+            continue
+
+        prompt = Prompt.query.get(entry["prompt_id"]) if entry.get("prompt_id") else None
+        if prompt is None:
+            prompt = create_prompt_from_row(row)
+            append_batch_state(state_path, {
+                "row_key": row["row_key"], "status": "pending", "prompt_id": prompt.id,
+            })
+        else:
+            # Crashed after the story was saved but before the state was written
+            story = Story.query.filter_by(prompt_id=prompt.id).order_by(Story.id.desc()).first()
+            if story:
+                append_batch_state(state_path, {
+                    "row_key": row["row_key"], "status": "done",
+                    "prompt_id": prompt.id, "story_id": story.id, "model_used": story.model_used,
+                })
+                skipped += 1
+                continue
+
+        model = model_choice or (row.get("model") or "").lower() or None
+        todo.append((row["row_key"], prompt.user_id, prompt.id, build_prompt_text(prompt), model))
+
+    click.echo(f"{len(rows)} rows: {len(todo)} to generate, {skipped} already done or failed")
+    if not todo:
+        return
+
+    if processes:
+        config = {"SQLALCHEMY_DATABASE_URI": current_app.config["SQLALCHEMY_DATABASE_URI"]}
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_process, initargs=(config,))
+        app = None
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-story")
+        app = current_app._get_current_object()
+
+    started = time.perf_counter()
+    durations = []
+    failed = 0
+    with executor:
+        futures = {
+            executor.submit(run_batch_item, user_id, prompt_id, prompt_text, model, app): (row_key, prompt_id)
+            for row_key, user_id, prompt_id, prompt_text, model in todo
+        }
+        for finished, future in enumerate(as_completed(futures), start=1):
+            row_key, prompt_id = futures[future]
+            entry = {"row_key": row_key, "prompt_id": prompt_id}
+            try:
+                story_id, model_used, seconds = future.result()
+                if not story_id:
+                    raise RuntimeError("No story was saved")
+                durations.append(seconds)
+                entry.update(status="done", story_id=story_id, model_used=model_used, seconds=round(seconds, 2))
+                outcome = f"story {story_id} ({model_used}, {seconds:.1f}s)"
+            except Exception as e:
+                failed += 1
+                entry.update(status="failed", error=str(e))
+                outcome = f"FAILED: {e}"
+            append_batch_state(state_path, entry)
+
+            elapsed = time.perf_counter() - started
+            rate = (finished - failed) * 60 / elapsed if elapsed else 0.0
+            remaining = (len(todo) - finished) * elapsed / finished
+            click.echo(
+                f"[{finished}/{len(todo)}] row {row_key} -> {outcome} | "
+                f"{rate:.1f} stories/min, ~{remaining / 60:.0f} min left"
+            )
+
+    elapsed = time.perf_counter() - started
+    done = len(todo) - failed
+    click.echo(
+        f"\nGenerated {done} stories ({failed} failed) in {elapsed / 60:.1f} min with {workers} "
+        f"{'processes' if processes else 'threads'}: {done * 60 / elapsed:.1f} stories/min, "
+        f"p50 {_percentile(durations, 0.5):.1f}s, p95 {_percentile(durations, 0.95):.1f}s per story"
+    )
+
+
+@click.command("readability-report")
+@click.option("--out", "out_path", type=click.Path(dir_okay=False), help="Write the per-story scores as CSV.")
+@click.option("--length-preset", type=click.Choice(sorted(STORY_LENGTH_PRESETS)),
+              help="Also check story length against this preset.")
+@with_appcontext
+def readability_report(out_path, length_preset):
+    """Score every saved story against the reading level for its age range."""
+    frame = score_story_table(length_preset=length_preset)
+    if frame.empty:
+        click.echo("No stories yet")
+        return
+
+    summary = frame.groupby(["preset", "model_used"]).agg(
+        stories=("story_id", "count"),
+        passed=("passed", "mean"),
+        mean_sentence_length=("mean_sentence_length", "mean"),
+        grade_level=("grade_level", "mean"),
+        ttr=("ttr", "mean"),
+        tokens=("tokens", "mean"),
+    )
+    click.echo(summary.round(2).to_string())
+    if out_path:
+        frame.to_csv(out_path, index=False)
+        click.echo(f"Wrote {len(frame)} rows to {out_path}")
+
+
+@click.command("research-export")
+@click.argument("out_path", type=click.Path(dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(EXPORT_FORMATS),
+              help="Default: from the file extension (.parquet), else csv.")
+@click.option("--from", "date_from", type=click.DateTime(["%Y-%m-%d"]), help="First story date (inclusive).")
+@click.option("--to", "date_to", type=click.DateTime(["%Y-%m-%d"]), help="Last story date (inclusive).")
+@click.option("--model", "model_used", type=click.Choice(["a", "b"]), help="Only stories from this model.")
+@click.option("--content", "include_content", is_flag=True, help="Include the story text.")
+@click.option("--profiles", "include_profiles", is_flag=True,
+              help="Include the cultural_profile / character_profile JSON.")
+@click.option("--chunk-size", default=EXPORT_CHUNK_SIZE, show_default=True, help="Stories read per query.")
+@with_appcontext
+def research_export(out_path, fmt, date_from, date_to, model_used, include_content, include_profiles, chunk_size):
+    """Export stories joined with their user, prompt and images for analysis."""
+    fmt = fmt or ("parquet" if out_path.endswith(".parquet") else "csv")
+    if fmt == "parquet" and not parquet_available():
+        raise click.UsageError("Parquet export needs pyarrow (pip install pyarrow); use CSV instead")
+
+    columns = export_columns(include_content, include_profiles)
+    counted = []
+
+    def counting(chunks):
+        for chunk in chunks:
+            counted.append(len(chunk))
+            yield chunk
+
+    chunks = counting(iter_export_chunks(
+        date_from=date_from.date() if date_from else None,
+        date_to=date_to.date() if date_to else None,
+        model_used=model_used,
+        include_content=include_content,
+        include_profiles=include_profiles,
+        chunk_size=chunk_size,
+    ))
+    started = time.perf_counter()
+    if fmt == "parquet":
+        write_parquet(chunks, columns, out_path)
+    else:
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            for text in iter_csv(chunks, columns):
+                f.write(text)
+
+    click.echo(
+        f"Exported {sum(counted)} stories in {len(counted)} chunks to {out_path} "
+        f"({time.perf_counter() - started:.1f}s)"
+    )
+
+
+@click.command("rebuild-study-summary")
+@with_appcontext
+def rebuild_study_summary_command():
+    """Recompute the A/B study dashboard aggregates from the saved stories."""
+    started = time.perf_counter()
+    count = rebuild_study_summary()
+    click.echo(f"Summarized {count} stories ({time.perf_counter() - started:.1f}s)")
@@ -22,7 +22,7 @@ class Prompt(db.Model):
     theme = db.Column(db.String(150))
     specific_traditions = db.Column(db.Text, nullable=True)
     character_cultural_background = db.Column(db.String(150), nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     stories = db.relationship('Story', backref='prompt', lazy=True)
 
@@ -31,17 +31,68 @@ class Story(db.Model):
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     model_used = db.Column(db.String(1), default='a')  # 'a' or 'b'
+    study_arm = db.Column(db.String(1), nullable=True)  # model requested; differs from model_used after a fallback
     cultural_profile = db.Column(db.Text, nullable=True)  # NULL for Model A
     character_profile = db.Column(db.Text, nullable=True)  # NULL for Model A
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    prompt_id = db.Column(db.Integer, db.ForeignKey('prompt.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    prompt_id = db.Column(db.Integer, db.ForeignKey('prompt.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     images = db.relationship("StoryImage", backref="story", lazy=True)
 
 class StoryImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    story_id = db.Column(db.Integer, db.ForeignKey("story.id"), nullable=False)
+    story_id = db.Column(db.Integer, db.ForeignKey("story.id"), nullable=False, index=True)
     image_url = db.Column(db.Text, nullable=False)
     phase = db.Column(db.String(20))  # "beginning", "middle", "end"
     phase_description = db.Column(db.Text, nullable=True)  # NULL for Model A
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CharacterIdentity(db.Model):
+    # One locked character design per user and normalized
+    # name / type / gender / traits / age range, reused by later Model B stories
+    __table_args__ = (db.UniqueConstraint('user_id', 'identity_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    identity_key = db.Column(db.String(64), nullable=False)  # sha256 of the normalized attributes
+    character_name = db.Column(db.String(150), nullable=False)
+    character_type = db.Column(db.String(150))
+    character_gender = db.Column(db.String(50))
+    character_traits = db.Column(db.Text)  # normalized, comma separated
+    visual_identity = db.Column(db.Text, nullable=False)  # JSON
+    locked_canonical_description = db.Column(db.Text, nullable=False)
+    art_style = db.Column(db.String(200))
+    times_reused = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StudySummary(db.Model):
+    # A/B study aggregates, updated in the same transaction as each saved
+    # Story (see services/jobs/study_summary.py) so the dashboard never
+    # scans the story table. dimension is "all", "age_range" or "theme".
+    __table_args__ = (db.UniqueConstraint('arm', 'model_used', 'dimension', 'bucket'),)
+    id = db.Column(db.Integer, primary_key=True)
+    arm = db.Column(db.String(1), nullable=False)  # model the user was assigned to
+    model_used = db.Column(db.String(1), nullable=False)  # model that wrote the story
+    dimension = db.Column(db.String(20), nullable=False)
+    bucket = db.Column(db.String(150), nullable=False, default='')
+    stories = db.Column(db.Integer, nullable=False, default=0)
+    words = db.Column(db.Integer, nullable=False, default=0)
+    chars = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GenerationJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    prompt_id = db.Column(db.Integer, db.ForeignKey('prompt.id'), nullable=True)
+    prompt_text = db.Column(db.Text, nullable=True)
+    # Set to prompt_id while the job is queued/running and cleared when it
+    # finishes; the unique constraint allows one in-flight job per prompt
+    active_prompt_id = db.Column(db.Integer, unique=True, index=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    partial_text = db.Column(db.Text, nullable=True)  # story draft while it streams
+    model_used = db.Column(db.String(1), nullable=True)
+    story_id = db.Column(db.Integer, db.ForeignKey('story.id'), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
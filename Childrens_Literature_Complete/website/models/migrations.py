@@ -0,0 +1,46 @@
+"""
+Minimal schema upgrades for existing SQLite databases.
+
+db.create_all() creates missing tables but never alters existing ones, so
+columns and indexes added after a table first shipped are applied here.
+Every statement is idempotent and runs on each boot.
+"""
+from sqlalchemy import inspect, text
+
+# (table, column, DDL type)
+ADDED_COLUMNS = [
+    ("generation_job", "active_prompt_id", "INTEGER"),
+    ("generation_job", "partial_text", "TEXT"),
+    ("story", "study_arm", "VARCHAR(1)"),
+]
+
+# (index name, table, column, unique)
+ADDED_INDEXES = [
+    ("ix_generation_job_active_prompt_id", "generation_job", "active_prompt_id", True),
+    ("ix_prompt_user_id", "prompt", "user_id", False),
+    ("ix_story_user_id", "story", "user_id", False),
+    ("ix_story_prompt_id", "story", "prompt_id", False),
+    ("ix_story_image_story_id", "story_image", "story_id", False),
+]
+
+
+def upgrade_database(engine):
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table, column, ddl_type in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+                print(f"Added column {table}.{column}")
+
+        for name, table, column, unique in ADDED_INDEXES:
+            if table not in tables:
+                continue
+            unique_sql = "UNIQUE " if unique else ""
+            conn.execute(text(
+                f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column})"
+            ))
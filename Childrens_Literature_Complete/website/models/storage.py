@@ -0,0 +1,59 @@
+"""
+SQLite settings for the main database.
+
+Several gunicorn workers and the job threads write to the same SQLite file.
+In the default rollback-journal mode a writer blocks every reader and a
+second writer gets "database is locked" straight away. Every new connection
+therefore switches to WAL (readers never block the writer), waits up to
+SQLITE_BUSY_TIMEOUT_MS for a lock instead of failing, and uses
+synchronous=NORMAL, which is safe with WAL and avoids an fsync per commit.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+# Connection pool per process (job threads + request threads)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def is_sqlite_file(uri):
+    url = make_url(uri)
+    database = url.database or ""
+    return url.get_backend_name() == "sqlite" and database not in ("", ":memory:") \
+        and not database.startswith("file::memory:")
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI."""
+    if not is_sqlite_file(uri):
+        # In-memory SQLite uses a single shared connection (Flask-SQLAlchemy
+        # sets that up); other databases keep SQLAlchemy's defaults
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    }
+
+
+def configure_sqlite(engine):
+    """Set the pragmas on every new connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return
+    file_database = is_sqlite_file(engine.url)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if file_database:
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
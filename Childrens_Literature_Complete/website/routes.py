@@ -1,11 +1,18 @@
-from flask import Blueprint, jsonify, render_template, request, redirect, url_for, flash
+from flask import Blueprint, jsonify, render_template, request, redirect, url_for, flash, current_app
 from datetime import datetime
-import json
-import traceback
-from flask import send_file
-from .models.database import StoryImage, db, User, Prompt, Story
-from website.services.model_a.model_a import run_model_a
-from website.services.model_b.model_b import run_model_b
+import os
+import tempfile
+from flask import send_file, abort, Response, stream_with_context
+from .models.database import db, User, Prompt, Story, GenerationJob
+from website.services.jobs.generation import choose_model_for_user, story_to_dict, build_prompt_text, FALLBACK_IMAGE, ERROR_STORY_TEXT
+from website.services.jobs.queue import submit_generation_job, wait_for_job, job_to_dict, expire_stale_story_job
+from website.services.jobs.streaming import stream_job_events
+from website.services.jobs.study_summary import study_summary
+from website.services.shared.llm_cache import cache_stats
+from website.services.shared.metrics import render_prometheus
+from website.services.shared.image_store import derivative_path, DEFAULT_WIDTH, DEFAULT_FORMAT, IMAGE_FORMATS
+from website.services.export.pdf_export import request_story_pdf
+from website.services.export import research_export
 
 routes = Blueprint('routes', __name__)
 
@@ -119,34 +126,7 @@ def view_story():
     user_id = prompt.user_id
     model_choice = choose_model_for_user(user_id)
 
-    parts = []
-    parts.append(f"This story is for children aged {prompt.age_range}.")
-
-    if prompt.character_name:
-        parts.append(f"The main character is named {prompt.character_name}.")
-
-    if prompt.character_type:
-        parts.append(f"The character is a {prompt.character_type}.")
-
-    if prompt.character_gender:
-        parts.append(f"The character is {prompt.character_gender}.")
-
-    if prompt.character_traits:
-        parts.append(f"Character traits: {prompt.character_traits}.")
-
-    if prompt.location:
-        parts.append(f"Setting: {prompt.location}.")
-
-    if prompt.theme:
-        parts.append(f"Theme: {prompt.theme}.")
-
-    if prompt.character_cultural_background:
-        parts.append(f"Culturally inspired by: {prompt.character_cultural_background}.")
-
-    if prompt.specific_traditions:
-        parts.append(f"Traditions included: {prompt.specific_traditions}.")
-
-    final_prompt = " ".join(parts).strip()
+    final_prompt = build_prompt_text(prompt)
     print("FINAL PROMPT:", final_prompt)
 
     return render_template(
@@ -165,143 +145,214 @@ def generate_story_api():
     prompt_text = request.args.get("prompt")
     user_id = request.args.get("user_id")
     prompt_id = request.args.get("prompt_id")
-    model_choice = choose_model_for_user(user_id)
-    story_text = ""
-    images = []
-    character_profile = {}
-    cultural_profile = {}
-    user = User.query.get(user_id)
-    prompt_obj = Prompt.query.get(prompt_id) if prompt_id else None
 
-    try:
-        # Calling Model B
-        if model_choice == "b" and user and prompt_obj:
-            raw_traits = prompt_obj.character_traits or ""
-            traits_list = [
-                t.strip()
-                for t in raw_traits.replace(";", ",").split(",")
-                if t.strip()
-            ]
-            if not traits_list:
-                traits_list = ["curious", "kind"]
-
-            traits_text = ", ".join(traits_list)
-            user_input_dict = {
-                "prompt_text": prompt_text,
-                "character_name": prompt_obj.character_name or "Child",
-                "age_range": prompt_obj.age_range or "4-6",
-                "character_type": prompt_obj.character_type or "human",
-                "traits": traits_list,
-                "traits_text": traits_text,  
-                "location": prompt_obj.location or "",
-                "theme": prompt_obj.theme or "adventure",
-                "character_gender": prompt_obj.character_gender or "unspecified"
-            }
-            user_metadata = {
-                "first_name": user.first_name,
-            }
-            cluster_context = {
-                "cultural_background": prompt_obj.character_cultural_background or "",
-                "specific_traditions": prompt_obj.specific_traditions or "",
-            }
-            print("USING TRAITS:", traits_list)
-            result = run_model_b(
-                user_input=user_input_dict,
-                user_metadata=user_metadata,
-                cluster_context=cluster_context
-            )
-            story_text = result.get("story_text", "")
-            images = result.get("images", [])
-            character_profile = result.get("character_profile", {})
-            cultural_profile = result.get("cultural_profile", {})
-
-            if not images:
-                raise ValueError("Model B returned no images")
-
-        #  Calling Model A
-        elif model_choice == "a":
-            print("USING MODEL A")
-
-            result = run_model_a(
-                user_input={
-                    "prompt_text": prompt_text
-                },
-                user_metadata={},
-                cluster_context={}
-            )
+    # Same job path as the async endpoints, so a refresh or a second tab
+    # attaches to the running generation instead of starting another one
+    job = submit_generation_job(
+        current_app._get_current_object(),
+        user_id=user_id,
+        prompt_id=prompt_id,
+        prompt_text=prompt_text
+    )
+    job = wait_for_job(job.id)
+    data = job_to_dict(job)
 
-            story_text = result["story_text"]
-            images = result["images"]
-            character_profile = result.get("character_profile", {})
-            cultural_profile = result.get("cultural_profile", {})
+    if data["status"] != "done":
+        return jsonify({
+            "story": ERROR_STORY_TEXT,
+            "images": [FALLBACK_IMAGE] * 3,
+            "model_used": data["model_used"],
+            "success": False
+        })
 
-        else:
-            raise ValueError("Invalid model choice or missing data")
+    return jsonify({
+        "story": data["story"],
+        "images": [url or FALLBACK_IMAGE for url in data["images"]],
+        "model_used": data["model_used"],
+        "success": True
+    })
 
 
-    except Exception as e:
-        print("Primary generation failed:", e)
-        traceback.print_exc()
+# --------- Generation Jobs -------------
+@routes.route("/generate_story_jobs", methods=["POST"])
+def submit_story_job():
+    data = request.get_json(silent=True) or request.form or request.args
+    prompt_text = data.get("prompt")
+    user_id = data.get("user_id")
+    prompt_id = data.get("prompt_id")
 
-        try:
-            print("FALLING BACK TO MODEL A")
+    if not user_id or not User.query.get(user_id):
+        return jsonify({"success": False, "error": "Unknown user"}), 400
 
-            result = run_model_a(
-                user_input={"prompt_text": prompt_text},
-                user_metadata={},
-                cluster_context={}
-            )
+    job = submit_generation_job(
+        current_app._get_current_object(),
+        user_id=user_id,
+        prompt_id=prompt_id,
+        prompt_text=prompt_text
+    )
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@routes.route("/generate_story_jobs/<job_id>")
+def story_job_status(job_id):
+    job = GenerationJob.query.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify(job_to_dict(job))
+
+
+@routes.route("/generate_story_jobs/<job_id>/events")
+def story_job_events(job_id):
+    """Server-Sent Events: story tokens as they are written, then the result."""
+    def load_job(job_id):
+        # End the previous read so each poll sees the worker's latest write
+        db.session.rollback()
+        return GenerationJob.query.get(job_id)
+
+    events = stream_job_events(job_id, load_job, job_to_dict)
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-            story_text = result["story_text"]
-            images = result["images"]
-            character_profile = result.get("character_profile", {})
-            cultural_profile = result.get("cultural_profile", {})
-            model_choice = "a"
-
-        except Exception as e2:
-            print("Fallback also failed:", e2)
-            story_text = "Error generating story. Please try again."
-            images = ["/static/fallback_image.png"] * 3
-
-
-    # Save story
-    title = story_text.splitlines()[0][:200] if story_text else "Untitled Story"
-
-    if story_text and user_id:
-        new_story = Story(
-            title=title,
-            content=story_text,
-            user_id=int(user_id),
-            prompt_id=int(prompt_id) if prompt_id else None,
-            model_used=model_choice,
-            cultural_profile=json.dumps(cultural_profile) if cultural_profile else None,
-            character_profile=json.dumps(character_profile) if character_profile else None
-        )
-        db.session.add(new_story)
-        db.session.commit()
-
-        phases = ["beginning", "middle", "end"]
-        for i, img_url in enumerate(images[:3]):
-            db.session.add(
-                StoryImage(
-                    story_id=new_story.id,
-                    image_url=img_url,
-                    phase=phases[i]
-                )
-            )
-        db.session.commit()
 
+# --------- Story Image Status -------------
+@routes.route("/stories/<int:story_id>/images")
+def story_images(story_id):
+    story = Story.query.get(story_id)
+    if not story:
+        return jsonify({"success": False, "error": "Story not found"}), 404
+    data = story_to_dict(story)
+    if not data["images_complete"] and expire_stale_story_job(story.id):
+        db.session.refresh(story)
+        data = story_to_dict(story)
     return jsonify({
-        "story": story_text,
-        "images": images,
-        "model_used": model_choice,
-        "success": True
+        "story_id": story.id,
+        "images": data["images"],
+        "complete": data["images_complete"],
     })
 
-def choose_model_for_user(user_id: int) -> str:
-    user_id = int(user_id)
-    if user_id % 2 == 0:
-        return "b"
-    return "a"
 
+# --------- Storybook PDF Export -------------
+@routes.route("/stories/<int:story_id>/pdf")
+def story_pdf(story_id):
+    story = Story.query.get(story_id)
+    if not story:
+        return jsonify({"success": False, "error": "Story not found"}), 404
+
+    status, result = request_story_pdf(story)
+    if status == "failed":
+        return jsonify({"success": False, "error": result}), 500
+    if status == "rendering":
+        # Rendered in the background; ask again shortly
+        response = jsonify({"success": True, "status": "rendering"})
+        response.status_code = 202
+        response.headers["Retry-After"] = "2"
+        return response
+
+    return send_file(
+        result,
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=f"story-{story_id}.pdf",
+        etag=os.path.basename(result),
+        conditional=True
+    )
+
+
+# --------- Research Data Export -------------
+@routes.route("/research_export")
+def research_export_download():
+    token = request.headers.get("X-Export-Token") or request.args.get("token")
+    if not research_export.token_allowed(token):
+        abort(404)
 
+    fmt = request.args.get("format", "csv")
+    model_used = request.args.get("model") or None
+    try:
+        date_from, date_to = [
+            datetime.strptime(request.args[key], "%Y-%m-%d").date() if request.args.get(key) else None
+            for key in ("from", "to")
+        ]
+    except ValueError:
+        return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+    if fmt not in research_export.EXPORT_FORMATS or model_used not in (None, "a", "b"):
+        return jsonify({"success": False, "error": "Unknown format or model"}), 400
+    if fmt == "parquet" and not research_export.parquet_available():
+        return jsonify({"success": False, "error": "Parquet export needs pyarrow"}), 400
+
+    include_content = request.args.get("content") == "1"
+    include_profiles = request.args.get("profiles") == "1"
+    columns = research_export.export_columns(include_content, include_profiles)
+    chunks = research_export.iter_export_chunks(
+        date_from=date_from,
+        date_to=date_to,
+        model_used=model_used,
+        include_content=include_content,
+        include_profiles=include_profiles
+    )
+
+    if fmt == "csv":
+        return Response(
+            stream_with_context(research_export.iter_csv(chunks, columns)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=research_export.csv"}
+        )
+
+    # Parquet's footer comes last, so build the file on disk, then send it
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        research_export.write_parquet(chunks, columns, path)
+    except Exception as e:
+        os.remove(path)
+        print("Error writing research export:", e)
+        return jsonify({"success": False, "error": "Could not write the Parquet export"}), 500
+    response = send_file(path, mimetype="application/vnd.apache.parquet",
+                         as_attachment=True, download_name="research_export.parquet")
+    response.call_on_close(lambda: os.remove(path))
+    return response
+
+
+# --------- Study Dashboard -------------
+@routes.route("/dashboard")
+def study_dashboard():
+    # Reads only the StudySummary aggregates, never the story table
+    summary = study_summary()
+    if request.args.get("format") == "json":
+        return jsonify(summary)
+    return render_template("dashboard.html", summary=summary)
+
+
+# --------- LLM Cache Stats -------------
+@routes.route("/llm_cache/stats")
+def llm_cache_stats():
+    return jsonify(cache_stats())
+
+
+# --------- Pipeline Metrics (Prometheus) -------------
+@routes.route("/metrics")
+def pipeline_metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+# --------- Stored Illustrations -------------
+@routes.route("/images/<digest>")
+def stored_image(digest):
+    width = request.args.get("w", DEFAULT_WIDTH, type=int)
+    fmt = request.args.get("fmt", DEFAULT_FORMAT)
+    path = derivative_path(digest, width, fmt)
+    if not path:
+        abort(404)
+
+    # Content-addressed: a digest never changes, so cache for a year
+    response = send_file(
+        path,
+        mimetype=IMAGE_FORMATS[fmt][1],
+        etag=f"{digest}-{os.path.basename(path)}",
+        conditional=True,
+        max_age=31536000
+    )
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -0,0 +1,202 @@
+"""
+Storybook PDF export.
+
+Lays a Story out as a small picture book with fpdf2 and the fonts in
+website/static/fonts: the title, then one page each for the beginning,
+middle and end with its illustration above the text. Rendering runs on a
+background thread pool, never in the web request. Finished files are cached
+under PDF_EXPORT_DIR as story-<id>-<content hash>.pdf, so repeat downloads
+are served straight from disk and a story whose text or images change gets
+a new file.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from fpdf import FPDF
+
+from website.services.jobs.generation import story_to_dict
+from website.services.shared.image_store import IMAGE_DOWNLOAD_TIMEOUT, derivative_path
+from website.services.shared.sqlite_store import DATA_DIR
+
+PDF_EXPORT_DIR = os.getenv("PDF_EXPORT_DIR", os.path.join(DATA_DIR, "pdf"))
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "2"))
+
+STATIC_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "static"))
+FONT_DIR = os.path.join(STATIC_DIR, "fonts")
+FALLBACK_IMAGE_PATH = os.path.join(STATIC_DIR, "fallback_image.png")
+
+# A4 portrait, in mm
+PAGE_WIDTH = 210
+IMAGE_WIDTH = 120
+
+# Emoji and other characters outside the BMP have no glyph in the book fonts
+NON_BMP_RE = re.compile(r"[^\u0000-\uffff]")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# cache path -> Future of a render running in this process
+_renders = {}
+# cache path -> error of the last failed render (reported once, then retried)
+_errors = {}
+_renders_lock = threading.Lock()
+
+
+def get_executor():
+    """Lazily create the process-wide render pool (after gunicorn forks)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PDF_EXPORT_WORKERS,
+                thread_name_prefix="pdf-export"
+            )
+        return _executor
+
+
+def story_export_data(story):
+    """Plain data the renderer needs, so pool threads never touch the ORM."""
+    return {
+        "story_id": story.id,
+        "title": story.title,
+        "content": story.content,
+        "images": story_to_dict(story)["images"],
+    }
+
+
+def content_hash(data):
+    canonical = json.dumps([data["title"], data["content"], data["images"]])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_path(story_id, digest):
+    return os.path.join(PDF_EXPORT_DIR, f"story-{story_id}-{digest}.pdf")
+
+
+def split_story_parts(content, title):
+    """Beginning / middle / end text, split by paragraphs like view_story.html."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", content.strip()) if p.strip()]
+    if paragraphs and paragraphs[0] == title.strip():
+        paragraphs = paragraphs[1:]
+    if len(paragraphs) < 3:
+        return (paragraphs + ["", "", ""])[:3]
+
+    third = len(paragraphs) // 3
+    return [
+        "\n\n".join(paragraphs[:third]),
+        "\n\n".join(paragraphs[third:2 * third]),
+        "\n\n".join(paragraphs[2 * third:]),
+    ]
+
+
+def _image_source(url):
+    """Local file path (or bytes) for an image URL; the fallback image if unavailable."""
+    url = (url or "").split("?", 1)[0]
+    if url.startswith("/images/"):
+        path = derivative_path(url.rsplit("/", 1)[-1], fmt="jpg")
+        if path:
+            return path
+    elif url.startswith("/static/"):
+        path = os.path.normpath(os.path.join(STATIC_DIR, url[len("/static/"):]))
+        if path.startswith(STATIC_DIR + os.sep) and os.path.isfile(path):
+            return path
+    elif url.startswith(("http://", "https://")):
+        try:
+            response = requests.get(url, timeout=IMAGE_DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            return io.BytesIO(response.content)
+        except Exception as e:
+            print("Could not fetch illustration for PDF:", e)
+    return FALLBACK_IMAGE_PATH
+
+
+def _printable(text):
+    return NON_BMP_RE.sub("", text or "")
+
+
+def render_story_pdf(data, path):
+    """Render the story to path (written atomically); returns path."""
+    pdf = FPDF(format="A4")
+    pdf.set_title(_printable(data["title"]))
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_font("Baloo", fname=os.path.join(FONT_DIR, "Baloo2-Regular.ttf"))
+    pdf.add_font("Baloo", style="B", fname=os.path.join(FONT_DIR, "Baloo2-ExtraBold.ttf"))
+
+    parts = split_story_parts(data["content"], data["title"])
+    images = data["images"]
+    for i, text in enumerate(parts):
+        if not text and i > 0:
+            continue
+        pdf.add_page()
+        if i == 0:
+            pdf.set_font("Baloo", "B", 28)
+            pdf.multi_cell(0, 13, _printable(data["title"]), align="C", new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(4)
+
+        x = (PAGE_WIDTH - IMAGE_WIDTH) / 2
+        try:
+            pdf.image(_image_source(images[i] if i < len(images) else None), x=x, w=IMAGE_WIDTH)
+        except Exception as e:
+            print("Unreadable illustration in PDF, using fallback:", e)
+            pdf.image(FALLBACK_IMAGE_PATH, x=x, w=IMAGE_WIDTH)
+        pdf.ln(6)
+
+        pdf.set_font("Baloo", size=15)
+        pdf.multi_cell(0, 8, _printable(text), new_x="LMARGIN", new_y="NEXT")
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pdf.output(tmp_path)
+    os.replace(tmp_path, path)
+
+    # Older versions of this story are never downloaded again
+    prefix = f"story-{data['story_id']}-"
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(".pdf") and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return path
+
+
+def _render_finished(path, future):
+    with _renders_lock:
+        _renders.pop(path, None)
+        error = future.exception()
+        if error is not None:
+            _errors[path] = str(error)
+    if error is not None:
+        print(f"PDF export failed for {path}:", error)
+
+
+def request_story_pdf(story):
+    """
+    Returns ("ready", path) when the PDF for the story's current content is
+    cached, ("failed", error) once after a failed render, and otherwise
+    ("rendering", None) after making sure a render is queued (one per file
+    in this process).
+    """
+    data = story_export_data(story)
+    path = cache_path(story.id, content_hash(data))
+    if os.path.exists(path):
+        return "ready", path
+
+    with _renders_lock:
+        error = _errors.pop(path, None)
+        if error is not None:
+            return "failed", error
+        if path in _renders:
+            return "rendering", None
+        future = get_executor().submit(render_story_pdf, data, path)
+        _renders[path] = future
+    # Outside the lock: the callback runs right here if the render already finished
+    future.add_done_callback(lambda f: _render_finished(path, f))
+    return "rendering", None
@@ -0,0 +1,167 @@
+"""
+Research export of the A/B study data.
+
+One row per Story, joined with its User (id, consent, date; no names) and
+Prompt, plus the URLs of its three illustrations. Rows are read in keyset
+chunks (story.id > last id, EXPORT_CHUNK_SIZE at a time) as plain column tuples,
+so memory stays flat however big the tables get, and are written out chunk
+by chunk as CSV or, with pyarrow installed, as Parquet row groups.
+
+Story content and the JSON profile columns are the bulk of the data and
+only included when asked for. The /research_export route is off unless
+RESEARCH_EXPORT_TOKEN is set, and then needs that token.
+"""
+import csv
+import hmac
+import io
+import os
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func
+
+from website import db
+from website.models.database import User, Prompt, Story, StoryImage
+
+EXPORT_CHUNK_SIZE = int(os.getenv("RESEARCH_EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_FORMATS = ("csv", "parquet")
+RESEARCH_EXPORT_TOKEN = os.getenv("RESEARCH_EXPORT_TOKEN", "")
+
+PHASES = ("beginning", "middle", "end")
+
+# (column name, SQL expression, parquet type)
+BASE_COLUMNS = [
+    ("story_id", Story.id, "int64"),
+    ("story_created_at", Story.created_at, "timestamp"),
+    ("model_used", Story.model_used, "string"),
+    ("study_arm", Story.study_arm, "string"),
+    ("title", Story.title, "string"),
+    ("content_chars", func.length(Story.content), "int64"),
+    ("user_id", Story.user_id, "int64"),
+    ("user_consent", User.consent, "bool"),
+    ("user_date", User.date, "date"),
+    ("prompt_id", Story.prompt_id, "int64"),
+    ("prompt_created_at", Prompt.created_at, "timestamp"),
+    ("age_range", Prompt.age_range, "string"),
+    ("character_name", Prompt.character_name, "string"),
+    ("character_type", Prompt.character_type, "string"),
+    ("character_gender", Prompt.character_gender, "string"),
+    ("character_traits", Prompt.character_traits, "string"),
+    ("location", Prompt.location, "string"),
+    ("theme", Prompt.theme, "string"),
+    ("character_cultural_background", Prompt.character_cultural_background, "string"),
+    ("specific_traditions", Prompt.specific_traditions, "string"),
+]
+CONTENT_COLUMNS = [("content", Story.content, "string")]
+PROFILE_COLUMNS = [
+    ("cultural_profile", Story.cultural_profile, "string"),
+    ("character_profile", Story.character_profile, "string"),
+]
+IMAGE_COLUMNS = [(f"image_{phase}", None, "string") for phase in PHASES]
+
+
+def token_allowed(token):
+    return bool(RESEARCH_EXPORT_TOKEN) and hmac.compare_digest(token or "", RESEARCH_EXPORT_TOKEN)
+
+
+def export_columns(include_content=False, include_profiles=False):
+    columns = list(BASE_COLUMNS)
+    if include_content:
+        columns += CONTENT_COLUMNS
+    if include_profiles:
+        columns += PROFILE_COLUMNS
+    return columns + IMAGE_COLUMNS
+
+
+def _filtered(query, date_from=None, date_to=None, model_used=None):
+    if date_from:
+        query = query.filter(Story.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        # Inclusive end date
+        query = query.filter(Story.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    if model_used:
+        query = query.filter(Story.model_used == model_used)
+    return query
+
+
+def iter_export_chunks(date_from=None, date_to=None, model_used=None, include_content=False,
+                       include_profiles=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields lists of row dicts (keys as in export_columns), at most chunk_size each."""
+    columns = export_columns(include_content, include_profiles)
+    selected = [(name, expr) for name, expr, _ in columns if expr is not None]
+    query = _filtered(
+        db.session.query(*[expr.label(name) for name, expr in selected])
+        .join(User, Story.user_id == User.id)
+        .outerjoin(Prompt, Story.prompt_id == Prompt.id),
+        date_from, date_to, model_used
+    )
+
+    last_id = 0
+    while True:
+        rows = query.filter(Story.id > last_id).order_by(Story.id).limit(chunk_size).all()
+        if not rows:
+            return
+        story_ids = [row.story_id for row in rows]
+        images = {
+            (story_id, phase): url
+            for story_id, phase, url in db.session.query(
+                StoryImage.story_id, StoryImage.phase, StoryImage.image_url
+            ).filter(StoryImage.story_id.in_(story_ids))
+        }
+
+        chunk = []
+        for row in rows:
+            record = row._asdict()
+            for phase in PHASES:
+                record[f"image_{phase}"] = images.get((row.story_id, phase))
+            chunk.append(record)
+        yield chunk
+
+        last_id = story_ids[-1]
+
+
+def iter_csv(chunks, columns):
+    """CSV text, one string per chunk (the first one starts with the header)."""
+    names = [name for name, _, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names)
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_parquet(chunks, columns, path):
+    """Write the chunks as Parquet row groups (needs pyarrow); returns the row count."""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "int64": pa.int64(),
+        "bool": pa.bool_(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+        "date": pa.date32(),
+    }
+    schema = pa.schema([(name, types[kind]) for name, _, kind in columns])
+    names = [name for name, _, _ in columns]
+
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            frame = pd.DataFrame(chunk, columns=names)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
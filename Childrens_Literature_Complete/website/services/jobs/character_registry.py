@@ -0,0 +1,116 @@
+"""
+Per-user registry of locked character designs.
+
+When a user asks for another Model B story about the same hero (same name,
+type, gender, traits and age range), the stored visual identity is reused
+instead of asking the LLM to design the character again. That saves the
+character profile call and keeps the hero looking the same from book to book.
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from website import db
+from website.models.database import CharacterIdentity
+from website.services.shared import metrics
+
+CHARACTER_REUSE_ENABLED = os.getenv("MODEL_B_REUSE_CHARACTERS", "1") == "1"
+
+DEFAULT_ART_STYLE = "soft watercolor children's book illustration"
+DEFAULT_AGE_RANGE = "7-9"
+
+
+def _clean(value):
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def normalize_character(user_input):
+    """The attributes that identify a character, normalized for matching."""
+    traits = user_input.get("traits") or []
+    if isinstance(traits, str):
+        traits = traits.replace(";", ",").split(",")
+    return {
+        "name": _clean(user_input.get("character_name") or "child"),
+        "type": _clean(user_input.get("character_type") or "human"),
+        "gender": _clean(user_input.get("character_gender") or "unspecified"),
+        "traits": sorted({_clean(t) for t in traits if _clean(t)}),
+        # The locked description and body proportions are drawn for one age
+        "age_range": _clean(user_input.get("age_range") or DEFAULT_AGE_RANGE),
+    }
+
+
+def identity_key(user_input):
+    canonical = json.dumps(normalize_character(user_input), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def find_character_identity(user_id, user_input):
+    """
+    The stored character profile for this user and character, in the shape
+    generate_character_profile returns, or None.
+    """
+    if not CHARACTER_REUSE_ENABLED or not user_id:
+        return None
+
+    identity = CharacterIdentity.query.filter_by(
+        user_id=int(user_id), identity_key=identity_key(user_input)
+    ).first()
+    if identity is None:
+        return None
+
+    identity.times_reused += 1
+    identity.last_used_at = datetime.utcnow()
+    db.session.commit()
+    metrics.increment("characters_reused", model="b", stage="character_profile")
+
+    age_range = user_input.get("age_range") or DEFAULT_AGE_RANGE
+    return {
+        "name": user_input.get("character_name") or identity.character_name,
+        "age_description": f"a {age_range} year old child",
+        "visual_identity": json.loads(identity.visual_identity),
+        "locked_canonical_description": identity.locked_canonical_description,
+        "personality_traits": list(user_input.get("traits") or []),
+        "art_style": identity.art_style or DEFAULT_ART_STYLE,
+    }
+
+
+def save_character_identity(user_id, user_input, character_profile):
+    """
+    Remember a newly designed character. Fallback profiles and incomplete
+    designs are not stored. Returns the CharacterIdentity or None.
+    """
+    if not CHARACTER_REUSE_ENABLED or not user_id or not character_profile:
+        return None
+    if character_profile.get("is_fallback"):
+        return None
+    visual_identity = character_profile.get("visual_identity")
+    description = character_profile.get("locked_canonical_description")
+    if not isinstance(visual_identity, dict) or not description:
+        return None
+
+    normalized = normalize_character(user_input)
+    identity = CharacterIdentity(
+        user_id=int(user_id),
+        identity_key=identity_key(user_input),
+        character_name=user_input.get("character_name") or "Child",
+        character_type=normalized["type"],
+        character_gender=normalized["gender"],
+        character_traits=", ".join(normalized["traits"]),
+        visual_identity=json.dumps(visual_identity),
+        locked_canonical_description=description,
+        art_style=character_profile.get("art_style"),
+    )
+    db.session.add(identity)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another story for the same character saved its design first
+        db.session.rollback()
+        return None
+
+    metrics.increment("characters_created", model="b", stage="character_profile")
+    return identity
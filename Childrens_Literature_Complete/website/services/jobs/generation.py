@@ -0,0 +1,389 @@
+import json
+import threading
+import traceback
+
+from website import db
+from website.models.database import User, Prompt, Story, StoryImage
+from website.services.jobs.character_registry import find_character_identity, save_character_identity
+from website.services.jobs.study_summary import record_story
+from website.services.model_a.model_a import run_model_a
+from website.services.model_b.model_b import run_model_b
+from website.services.shared.deadline import MODEL_B_DEADLINE_SECONDS, STORY_DEADLINE_SECONDS, deadline
+
+FALLBACK_IMAGE = "/static/fallback_image.png"
+ERROR_STORY_TEXT = "Error generating story. Please try again."
+PHASES = ["beginning", "middle", "end"]
+
+
+def choose_model_for_user(user_id: int) -> str:
+    user_id = int(user_id)
+    if user_id % 2 == 0:
+        return "b"
+    return "a"
+
+
+def build_model_b_inputs(user, prompt_obj, prompt_text):
+    """
+    Build the (user_input, user_metadata, cluster_context) triple that
+    run_model_b expects from the saved User / Prompt rows.
+    """
+    raw_traits = prompt_obj.character_traits or ""
+    traits_list = [
+        t.strip()
+        for t in raw_traits.replace(";", ",").split(",")
+        if t.strip()
+    ]
+    if not traits_list:
+        traits_list = ["curious", "kind"]
+
+    traits_text = ", ".join(traits_list)
+    user_input = {
+        "prompt_text": prompt_text,
+        "character_name": prompt_obj.character_name or "Child",
+        "age_range": prompt_obj.age_range or "4-6",
+        "character_type": prompt_obj.character_type or "human",
+        "traits": traits_list,
+        "traits_text": traits_text,
+        "location": prompt_obj.location or "",
+        "theme": prompt_obj.theme or "adventure",
+        "character_gender": prompt_obj.character_gender or "unspecified"
+    }
+    user_metadata = {
+        "first_name": user.first_name,
+    }
+    cluster_context = {
+        "cultural_background": prompt_obj.character_cultural_background or "",
+        "specific_traditions": prompt_obj.specific_traditions or "",
+    }
+    return user_input, user_metadata, cluster_context
+
+
+def build_prompt_text(prompt):
+    """The natural-language prompt shown on view_story and sent to the models."""
+    parts = []
+    parts.append(f"This story is for children aged {prompt.age_range}.")
+
+    if prompt.character_name:
+        parts.append(f"The main character is named {prompt.character_name}.")
+
+    if prompt.character_type:
+        parts.append(f"The character is a {prompt.character_type}.")
+
+    if prompt.character_gender:
+        parts.append(f"The character is {prompt.character_gender}.")
+
+    if prompt.character_traits:
+        parts.append(f"Character traits: {prompt.character_traits}.")
+
+    if prompt.location:
+        parts.append(f"Setting: {prompt.location}.")
+
+    if prompt.theme:
+        parts.append(f"Theme: {prompt.theme}.")
+
+    if prompt.character_cultural_background:
+        parts.append(f"Culturally inspired by: {prompt.character_cultural_background}.")
+
+    if prompt.specific_traditions:
+        parts.append(f"Traditions included: {prompt.specific_traditions}.")
+
+    return " ".join(parts).strip()
+
+
+class StoryPublisher:
+    """
+    Progressive delivery: saves the Story as soon as its text is final and
+    each StoryImage as soon as that illustration finishes, so readers don't
+    wait for the slowest image. Callbacks arrive on pipeline worker threads,
+    so every write runs in its own app context.
+    """
+
+    def __init__(self, app, user_id, prompt_id, on_published=None):
+        self.app = app
+        self.user_id = user_id
+        self.prompt_id = prompt_id
+        self.on_published = on_published
+        self.story_id = None
+        self.model_used = None
+        # Set by generate_story_for_prompt to the model that was requested
+        self.arm = None
+        self._lock = threading.Lock()
+
+    def story_callback(self, model_choice):
+        def publish(story_text, character_profile=None, cultural_profile=None):
+            with self.app.app_context():
+                story_id = save_story(
+                    user_id=self.user_id,
+                    prompt_id=self.prompt_id,
+                    story_text=story_text,
+                    images=[],
+                    model_choice=model_choice,
+                    character_profile=character_profile,
+                    cultural_profile=cultural_profile,
+                    arm=self.arm
+                )
+            with self._lock:
+                self.story_id = story_id
+                self.model_used = model_choice
+            print(f"Story {story_id} published, illustrations to follow")
+            if self.on_published and story_id:
+                self.on_published(story_id)
+        return publish
+
+    def image(self, index, url):
+        if self.story_id is None or index >= len(PHASES):
+            return
+        with self.app.app_context():
+            db.session.add(
+                StoryImage(
+                    story_id=self.story_id,
+                    image_url=url or FALLBACK_IMAGE,
+                    phase=PHASES[index]
+                )
+            )
+            db.session.commit()
+
+    def finish(self, images):
+        """Fill in any phase that never got its image."""
+        with self.app.app_context():
+            fill_missing_images(self.story_id, images)
+            db.session.commit()
+
+
+def fill_missing_images(story_id, images=()):
+    """
+    Add a StoryImage for every phase the story doesn't have yet: the given
+    image for that page if there is one, else the fallback. The caller commits.
+    """
+    done = {img.phase for img in StoryImage.query.filter_by(story_id=story_id)}
+    for i, phase in enumerate(PHASES):
+        if phase not in done:
+            url = images[i] if i < len(images) else FALLBACK_IMAGE
+            db.session.add(StoryImage(story_id=story_id, image_url=url or FALLBACK_IMAGE, phase=phase))
+
+
+def generate_story_for_prompt(user_id, prompt_id, prompt_text, stream=None, publisher=None,
+                              model_choice=None):
+    """
+    Run the chosen pipeline (falling back to Model A) and save the result
+    as a Story with its StoryImage rows.
+
+    model_choice: "a" or "b" to override choose_model_for_user (batch runs).
+
+    stream: optional StoryStreamWriter that receives the story text as it
+            is generated.
+    publisher: optional StoryPublisher; when given the story is saved as soon
+               as its text is ready and images are added as they finish.
+
+    All OpenAI calls share a STORY_DEADLINE_SECONDS budget; Model B gets at
+    most MODEL_B_DEADLINE_SECONDS of it so the Model A fallback still has time.
+
+    Returns a dict with story_id, story, images and model_used. When both
+    pipelines fail nothing is saved: story_id is None and error says why.
+    """
+    with deadline(STORY_DEADLINE_SECONDS):
+        return _generate_story_for_prompt(user_id, prompt_id, prompt_text, stream, publisher, model_choice)
+
+
+def _generate_story_for_prompt(user_id, prompt_id, prompt_text, stream, publisher, model_choice):
+    on_token = stream.write if stream else None
+    on_image = publisher.image if publisher else None
+    model_choice = model_choice or choose_model_for_user(user_id)
+    # The study arm is the model asked for, even if Model A has to step in
+    arm = model_choice
+    if publisher:
+        publisher.arm = arm
+    story_text = ""
+    images = []
+    character_profile = {}
+    cultural_profile = {}
+    user = User.query.get(user_id)
+    prompt_obj = Prompt.query.get(prompt_id) if prompt_id else None
+
+    try:
+        # Calling Model B
+        if model_choice == "b" and user and prompt_obj:
+            user_input, user_metadata, cluster_context = build_model_b_inputs(
+                user, prompt_obj, prompt_text
+            )
+            print("USING TRAITS:", user_input["traits"])
+            stored_character = find_character_identity(user_id, user_input)
+            with deadline(MODEL_B_DEADLINE_SECONDS):
+                result = run_model_b(
+                    user_input=user_input,
+                    user_metadata=user_metadata,
+                    cluster_context=cluster_context,
+                    on_token=on_token,
+                    on_story=publisher.story_callback("b") if publisher else None,
+                    on_image=on_image,
+                    character_profile=stored_character
+                )
+            story_text = result.get("story_text", "")
+            images = result.get("images", [])
+            character_profile = result.get("character_profile", {})
+            cultural_profile = result.get("cultural_profile", {})
+            if not stored_character:
+                save_character_identity(user_id, user_input, character_profile)
+
+            if not images and not (publisher and publisher.story_id):
+                raise ValueError("Model B returned no images")
+
+        #  Calling Model A
+        elif model_choice == "a":
+            print("USING MODEL A")
+
+            result = run_model_a(
+                user_input={
+                    "prompt_text": prompt_text
+                },
+                user_metadata={},
+                cluster_context={},
+                on_token=on_token,
+                on_story=publisher.story_callback("a") if publisher else None,
+                on_image=on_image
+            )
+
+            story_text = result["story_text"]
+            images = result["images"]
+            character_profile = result.get("character_profile", {})
+            cultural_profile = result.get("cultural_profile", {})
+
+        else:
+            raise ValueError("Invalid model choice or missing data")
+
+    except Exception as e:
+        print("Primary generation failed:", e)
+        traceback.print_exc()
+
+        if publisher and publisher.story_id:
+            # The story is already in front of the reader; keep it and let
+            # finish() give the missing pages the fallback image
+            story = Story.query.get(publisher.story_id)
+            return _finish_published(publisher, story.content, [])
+
+        try:
+            print("FALLING BACK TO MODEL A")
+            if stream:
+                stream.reset()
+
+            result = run_model_a(
+                user_input={"prompt_text": prompt_text},
+                user_metadata={},
+                cluster_context={},
+                on_token=on_token,
+                on_story=publisher.story_callback("a") if publisher else None,
+                on_image=on_image
+            )
+
+            story_text = result["story_text"]
+            images = result["images"]
+            character_profile = result.get("character_profile", {})
+            cultural_profile = result.get("cultural_profile", {})
+            model_choice = "a"
+
+        except Exception as e2:
+            print("Fallback also failed:", e2)
+            # Nothing is saved, so the prompt can be generated again later
+            return {
+                "story_id": None,
+                "story": ERROR_STORY_TEXT,
+                "images": [FALLBACK_IMAGE] * 3,
+                "model_used": model_choice,
+                "error": str(e2)
+            }
+
+    if publisher and publisher.story_id:
+        return _finish_published(publisher, story_text, images)
+
+    story_id = save_story(
+        user_id=user_id,
+        prompt_id=prompt_id,
+        story_text=story_text,
+        images=images,
+        model_choice=model_choice,
+        character_profile=character_profile,
+        cultural_profile=cultural_profile,
+        arm=arm
+    )
+
+    return {
+        "story_id": story_id,
+        "story": story_text,
+        "images": images,
+        "model_used": model_choice
+    }
+
+
+def _finish_published(publisher, story_text, images):
+    publisher.finish(images)
+    story = Story.query.get(publisher.story_id)
+    return {
+        "story_id": publisher.story_id,
+        "story": story_text,
+        "images": story_to_dict(story)["images"],
+        "model_used": publisher.model_used
+    }
+
+
+def save_story(user_id, prompt_id, story_text, images, model_choice,
+               character_profile=None, cultural_profile=None, arm=None):
+    """
+    Persist a generated story and its (up to three) images.
+    arm: the model that was requested for the A/B study (defaults to
+         choose_model_for_user); model_choice is the one that wrote it.
+    Returns the new Story id, or None when there was nothing to save.
+    """
+    if not story_text or not user_id:
+        return None
+    arm = arm or choose_model_for_user(user_id)
+
+    title = story_text.splitlines()[0][:200] if story_text else "Untitled Story"
+    new_story = Story(
+        title=title,
+        content=story_text,
+        user_id=int(user_id),
+        prompt_id=int(prompt_id) if prompt_id else None,
+        model_used=model_choice,
+        study_arm=arm,
+        cultural_profile=json.dumps(cultural_profile) if cultural_profile else None,
+        character_profile=json.dumps(character_profile) if character_profile else None
+    )
+    # Story, images and study aggregates in one transaction: a reader never
+    # sees a story without its images, and the write lock is taken once
+    try:
+        db.session.add(new_story)
+        db.session.flush()
+
+        prompt_obj = Prompt.query.get(new_story.prompt_id) if new_story.prompt_id else None
+        record_story(arm, model_choice, prompt_obj, story_text)
+
+        for i, img_url in enumerate(images[:3]):
+            db.session.add(
+                StoryImage(
+                    story_id=new_story.id,
+                    image_url=img_url,
+                    phase=PHASES[i]
+                )
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return new_story.id
+
+
+def story_to_dict(story):
+    """
+    JSON shape shared by the generation, job status and image status
+    endpoints. Images that are still being generated are None.
+    """
+    images_by_phase = {img.phase: img.image_url for img in story.images}
+    images = [images_by_phase.get(phase) for phase in PHASES]
+    return {
+        "story_id": story.id,
+        "story": story.content,
+        "images": images,
+        "images_complete": all(images),
+        "model_used": story.model_used,
+    }
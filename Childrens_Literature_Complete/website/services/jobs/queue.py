@@ -0,0 +1,271 @@
+"""
+Background job queue for story generation.
+
+The web request only stores a GenerationJob row and returns its id; a small,
+bounded pool of worker threads runs the (slow) Model A / Model B pipelines and
+records the outcome on the job row. Any gunicorn worker can answer a status
+request because the state lives in the database, and the unique
+active_prompt_id column keeps a prompt from being generated twice at once.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from website import db
+from website.models.database import GenerationJob, Story
+from website.services.jobs.generation import (
+    generate_story_for_prompt, fill_missing_images, story_to_dict, StoryPublisher
+)
+from website.services.jobs.streaming import StoryStreamWriter
+
+JOB_WORKERS = int(os.getenv("STORY_JOB_WORKERS", "4"))
+# Jobs that stay queued/running longer than this belonged to a worker process
+# that died (deploy, OOM...) and are reported as failed.
+JOB_STALE_SECONDS = int(os.getenv("STORY_JOB_STALE_SECONDS", "900"))
+# How long the synchronous /generate_story_api waits for a job
+JOB_WAIT_SECONDS = int(os.getenv("STORY_JOB_WAIT_SECONDS", "600"))
+JOB_POLL_SECONDS = 1.0
+# Stream story tokens into the job row for the SSE endpoint
+STREAM_STORIES = os.getenv("STORY_STREAMING", "1") == "1"
+# Save the story as soon as its text is ready and add images as they finish
+PROGRESSIVE_DELIVERY = os.getenv("STORY_PROGRESSIVE", "1") == "1"
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# job id -> Future for jobs running in this process
+_futures = {}
+_futures_lock = threading.Lock()
+
+
+def get_executor():
+    """Lazily create the process-wide worker pool (after gunicorn forks)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=JOB_WORKERS,
+                thread_name_prefix="story-job"
+            )
+        return _executor
+
+
+def _expire_if_stale(job):
+    """
+    Mark a queued/running job whose worker is gone as failed. If its story
+    was already published, the pages still waiting for an illustration get
+    the fallback image and the job counts as done.
+    """
+    if job.status not in ACTIVE_STATUSES:
+        return False
+    started = job.started_at or job.created_at
+    if started and datetime.utcnow() - started > timedelta(seconds=JOB_STALE_SECONDS):
+        if job.story_id:
+            fill_missing_images(job.story_id)
+            job.status = "done"
+            job.error = "Job timed out before all illustrations were ready"
+        else:
+            job.status = "failed"
+            job.error = "Job timed out"
+        job.active_prompt_id = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    return False
+
+
+def find_active_job(prompt_id):
+    job = GenerationJob.query.filter_by(active_prompt_id=int(prompt_id)).first()
+    if job and _expire_if_stale(job):
+        return None
+    return job
+
+
+def expire_stale_story_job(story_id):
+    """Expire the story's job if its worker died while the images were running."""
+    job = GenerationJob.query.filter(
+        GenerationJob.story_id == story_id, GenerationJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    return bool(job) and _expire_if_stale(job)
+
+
+def find_existing_story(prompt_id):
+    if not prompt_id:
+        return None
+    return (
+        Story.query.filter_by(prompt_id=int(prompt_id))
+        .order_by(Story.id.desc())
+        .first()
+    )
+
+
+def submit_generation_job(app, user_id, prompt_id, prompt_text):
+    """
+    Return the job that produces the story for this prompt.
+
+    Generation is idempotent per prompt_id: a prompt that already has a Story
+    gets a finished job pointing at it, and a prompt with a job in flight
+    (in any worker process) gets that job back instead of a second pipeline.
+    Otherwise a queued job row is stored and handed to the worker pool.
+    """
+    if prompt_id:
+        story = find_existing_story(prompt_id)
+        if story:
+            job = GenerationJob.query.filter_by(story_id=story.id).first()
+            if job is None:
+                job = _new_job(user_id, prompt_id, prompt_text, status="done")
+                job.story_id = story.id
+                job.model_used = story.model_used
+                job.finished_at = datetime.utcnow()
+                db.session.add(job)
+                db.session.commit()
+            return job
+
+        job = find_active_job(prompt_id)
+        if job:
+            return job
+
+    job = _new_job(user_id, prompt_id, prompt_text, status="queued")
+    job.active_prompt_id = job.prompt_id
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another thread/worker claimed this prompt between our check and insert
+        db.session.rollback()
+        job = find_active_job(prompt_id)
+        if job:
+            return job
+        return submit_generation_job(app, user_id, prompt_id, prompt_text)
+
+    future = get_executor().submit(run_generation_job, app, job.id)
+    with _futures_lock:
+        _futures[job.id] = future
+    future.add_done_callback(lambda _: _forget_future(job.id))
+    return job
+
+
+def _new_job(user_id, prompt_id, prompt_text, status):
+    return GenerationJob(
+        id=uuid.uuid4().hex,
+        user_id=int(user_id),
+        prompt_id=int(prompt_id) if prompt_id else None,
+        prompt_text=prompt_text,
+        status=status
+    )
+
+
+def _forget_future(job_id):
+    with _futures_lock:
+        _futures.pop(job_id, None)
+
+
+def wait_for_job(job_id, timeout=JOB_WAIT_SECONDS):
+    """
+    Block until the job is finished (or timeout) and return the fresh row.
+    Jobs running in this process are awaited directly; jobs owned by another
+    gunicorn worker are polled in the database.
+    """
+    with _futures_lock:
+        future = _futures.get(job_id)
+    if future is not None:
+        futures_wait([future], timeout=timeout)
+    else:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # End the read transaction so the next query sees other writers
+            db.session.rollback()
+            job = GenerationJob.query.get(job_id)
+            if job is None or job.status not in ACTIVE_STATUSES or _expire_if_stale(job):
+                break
+            time.sleep(JOB_POLL_SECONDS)
+
+    db.session.rollback()
+    return GenerationJob.query.get(job_id)
+
+
+def run_generation_job(app, job_id):
+    """Worker entry point: runs one job inside its own app context."""
+    with app.app_context():
+        job = GenerationJob.query.get(job_id)
+        if job is None:
+            print("Job not found:", job_id)
+            return
+
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            existing = find_existing_story(job.prompt_id)
+            if existing:
+                result = {"story_id": existing.id, "model_used": existing.model_used}
+            else:
+                stream = StoryStreamWriter(db.engine, job_id) if STREAM_STORIES else None
+                publisher = None
+                if PROGRESSIVE_DELIVERY:
+                    publisher = StoryPublisher(
+                        app, job.user_id, job.prompt_id,
+                        on_published=lambda story_id: _attach_story(app, job_id, story_id)
+                    )
+                result = generate_story_for_prompt(
+                    user_id=job.user_id,
+                    prompt_id=job.prompt_id,
+                    prompt_text=job.prompt_text,
+                    stream=stream,
+                    publisher=publisher
+                )
+            job.story_id = result["story_id"]
+            job.model_used = result["model_used"]
+            job.status = "done" if result["story_id"] else "failed"
+            if not result["story_id"]:
+                job.error = result.get("error") or "No story was generated"
+        except Exception as e:
+            print("Generation job failed:", job_id, e)
+            traceback.print_exc()
+            db.session.rollback()
+            job = GenerationJob.query.get(job_id)
+            job.status = "failed"
+            job.error = str(e)
+
+        job.active_prompt_id = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        db.session.remove()
+
+
+def _attach_story(app, job_id, story_id):
+    """Record the published story on the job while images are still running."""
+    with app.app_context():
+        job = GenerationJob.query.get(job_id)
+        job.story_id = story_id
+        db.session.commit()
+
+
+def job_to_dict(job):
+    """
+    Status payload for the polling endpoint. With progressive delivery the
+    story is included as soon as it is saved, while status is still running.
+    """
+    _expire_if_stale(job)
+
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "model_used": job.model_used,
+        "error": job.error,
+    }
+    if job.story_id and job.status in ("running", "done"):
+        story = Story.query.get(job.story_id)
+        if story:
+            data.update(story_to_dict(story))
+            data["success"] = job.status == "done"
+    return data
@@ -0,0 +1,126 @@
+"""
+Token streaming for generation jobs.
+
+The pipelines call StoryStreamWriter.write for every streamed delta (from
+worker threads without an app context), and the writer periodically copies
+the draft into GenerationJob.partial_text. The SSE endpoint in any gunicorn
+worker tails that column and forwards new text to the browser.
+
+Each SSE response holds a gunicorn thread, so it only covers the story text:
+it ends with a "poll" event once the story is saved or after
+SSE_MAX_SECONDS, and the page polls the cheap status endpoints from there.
+"""
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+# Minimum seconds between two partial_text writes for one job
+FLUSH_INTERVAL = 0.25
+# How often the SSE endpoint checks the job row
+SSE_POLL_SECONDS = 0.25
+# Comment line sent when nothing changed, keeps proxies from timing out
+SSE_KEEPALIVE_SECONDS = 15
+# Longest time one SSE response may hold a worker thread
+SSE_MAX_SECONDS = float(os.getenv("STORY_SSE_MAX_SECONDS", "30"))
+
+
+class StoryStreamWriter:
+    def __init__(self, engine, job_id):
+        self.engine = engine
+        self.job_id = job_id
+        self._parts = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def write(self, delta):
+        with self._lock:
+            self._parts.append(delta)
+            due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def reset(self):
+        """Start over, e.g. when Model B fails and Model A takes over."""
+        with self._lock:
+            self._parts = []
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            draft = "".join(self._parts)
+            self._last_flush = time.monotonic()
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("UPDATE generation_job SET partial_text = :draft WHERE id = :id"),
+                {"draft": draft, "id": self.job_id}
+            )
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_job_events(job_id, load_job, job_payload, sleep=time.sleep, max_seconds=None):
+    """
+    Generator of SSE messages for one job.
+
+    load_job(job_id) returns a fresh GenerationJob (or None);
+    job_payload(job) builds the final JSON payload.
+    Emits "token" events with new draft text, "reset" when the draft starts
+    over, "story" once the finished text is saved, "image" for illustrations
+    that are already in, then a single "done" or "error" event, or "poll"
+    when the client should continue by polling (story saved but images
+    pending, or max_seconds, default SSE_MAX_SECONDS, reached).
+    """
+    if max_seconds is None:
+        max_seconds = SSE_MAX_SECONDS
+    sent = ""
+    story_sent = False
+    images_sent = set()
+    idle = 0.0
+    waited = 0.0
+    while True:
+        job = load_job(job_id)
+        if job is None:
+            yield sse_event("error", {"error": "Job not found"})
+            return
+
+        draft = job.partial_text or ""
+        if draft != sent:
+            if not draft.startswith(sent):
+                yield sse_event("reset", {})
+                sent = ""
+            yield sse_event("token", {"text": draft[len(sent):]})
+            sent = draft
+            idle = 0.0
+
+        payload = job_payload(job)
+        if payload.get("story_id") and not story_sent:
+            yield sse_event("story", payload)
+            story_sent = True
+            idle = 0.0
+        for index, url in enumerate(payload.get("images") or []):
+            if url and index not in images_sent:
+                yield sse_event("image", {"index": index, "url": url})
+                images_sent.add(index)
+                idle = 0.0
+
+        if payload["status"] == "done":
+            yield sse_event("done", payload)
+            return
+        if payload["status"] not in ("queued", "running"):
+            yield sse_event("error", payload)
+            return
+        if story_sent or waited >= max_seconds:
+            yield sse_event("poll", {"status": payload["status"]})
+            return
+
+        if idle >= SSE_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            idle = 0.0
+        sleep(SSE_POLL_SECONDS)
+        idle += SSE_POLL_SECONDS
+        waited += SSE_POLL_SECONDS
@@ -0,0 +1,136 @@
+"""
+Incrementally maintained A/B study aggregates.
+
+Every saved Story adds 1 to its StudySummary rows (overall, by age range and
+by theme), keyed by the arm (the model requested, Story.study_arm) and the
+model that actually wrote it, so a story from a Model B user that fell back to
+Model A shows up as arm "b" / model_used "a". The dashboard reads only these
+rows. rebuild_study_summary() recomputes them from the Story table once,
+for databases that already had stories.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert
+
+from website import db
+from website.models.database import Prompt, Story, StudySummary
+
+DIMENSIONS = ("age_range", "theme")
+UNKNOWN_BUCKET = "unknown"
+
+
+def _bucket(value):
+    value = (value or "").strip()
+    return value[:150] if value else UNKNOWN_BUCKET
+
+
+def summary_keys(arm, model_used, prompt):
+    """The (arm, model_used, dimension, bucket) rows a story counts towards."""
+    keys = [(arm, model_used, "all", "")]
+    for dimension in DIMENSIONS:
+        keys.append((arm, model_used, dimension, _bucket(getattr(prompt, dimension, None))))
+    return keys
+
+
+def record_story(arm, model_used, prompt, story_text):
+    """Add one story to the aggregates; runs inside the caller's transaction."""
+    words = len(story_text.split())
+    chars = len(story_text)
+    now = datetime.utcnow()
+    for key_arm, key_model, dimension, bucket in summary_keys(arm, model_used or "a", prompt):
+        statement = insert(StudySummary).values(
+            arm=key_arm, model_used=key_model, dimension=dimension, bucket=bucket,
+            stories=1, words=words, chars=chars, updated_at=now,
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=["arm", "model_used", "dimension", "bucket"],
+            set_={
+                "stories": StudySummary.stories + 1,
+                "words": StudySummary.words + words,
+                "chars": StudySummary.chars + chars,
+                "updated_at": now,
+            },
+        ))
+
+
+def rebuild_study_summary(chunk_size=1000):
+    """Recompute every aggregate from the Story table; returns the story count."""
+    from website.services.jobs.generation import choose_model_for_user
+
+    totals = defaultdict(lambda: [0, 0, 0])
+    count = 0
+    rows = (
+        db.session.query(Story.user_id, Story.study_arm, Story.model_used, Story.content,
+                         Prompt.age_range, Prompt.theme)
+        .outerjoin(Prompt, Story.prompt_id == Prompt.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for row in rows:
+        count += 1
+        # Stories saved before study_arm existed: the arm from user-id parity
+        arm = row.study_arm or choose_model_for_user(row.user_id)
+        for key in summary_keys(arm, row.model_used or "a", row):
+            total = totals[key]
+            total[0] += 1
+            total[1] += len(row.content.split())
+            total[2] += len(row.content)
+
+    StudySummary.query.delete()
+    now = datetime.utcnow()
+    db.session.add_all([
+        StudySummary(arm=arm, model_used=model_used, dimension=dimension, bucket=bucket,
+                     stories=stories, words=words, chars=chars, updated_at=now)
+        for (arm, model_used, dimension, bucket), (stories, words, chars) in totals.items()
+    ])
+    db.session.commit()
+    return count
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else None
+
+
+def study_summary():
+    """Dashboard numbers, from the StudySummary rows only."""
+    rows = StudySummary.query.all()
+
+    arms = {}
+    models = {}
+    breakdowns = {dimension: {} for dimension in DIMENSIONS}
+    for row in rows:
+        if row.dimension == "all":
+            arm = arms.setdefault(row.arm, {"arm": row.arm, "stories": 0, "fell_back": 0})
+            arm["stories"] += row.stories
+            if row.arm == "b" and row.model_used == "a":
+                arm["fell_back"] += row.stories
+
+            model = models.setdefault(row.model_used, {"model_used": row.model_used, "stories": 0, "words": 0, "chars": 0})
+            model["stories"] += row.stories
+            model["words"] += row.words
+            model["chars"] += row.chars
+        else:
+            bucket = breakdowns[row.dimension].setdefault(
+                row.bucket, {"bucket": row.bucket, "a": 0, "b": 0, "words_a": 0, "words_b": 0}
+            )
+            bucket[row.model_used] += row.stories
+            bucket[f"words_{row.model_used}"] += row.words
+
+    for arm in arms.values():
+        arm["fallback_rate"] = _average(100 * arm["fell_back"], arm["stories"])
+    for model in models.values():
+        model["avg_words"] = _average(model.pop("words"), model["stories"])
+        model["avg_chars"] = _average(model.pop("chars"), model["stories"])
+    for buckets in breakdowns.values():
+        for bucket in buckets.values():
+            bucket["avg_words_a"] = _average(bucket.pop("words_a"), bucket["a"])
+            bucket["avg_words_b"] = _average(bucket.pop("words_b"), bucket["b"])
+
+    return {
+        "arms": [arms[key] for key in sorted(arms)],
+        "models": [models[key] for key in sorted(models)],
+        **{
+            dimension: sorted(buckets.values(), key=lambda b: (-(b["a"] + b["b"]), b["bucket"]))
+            for dimension, buckets in breakdowns.items()
+        },
+    }
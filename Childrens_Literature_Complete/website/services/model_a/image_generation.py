@@ -1,41 +1,74 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from website.services.shared.openai_gateway import create_image
+from website.services.shared.image_store import persist_remote_image
+from website.services.shared.deadline import in_current_context
+from website.services.shared.metrics import stage_timer
 
-load_dotenv()
-## client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+FALLBACK_IMAGE = "/static/fallback_image.png"
 
-def get_openai_client():
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=api_key)
+# Parallel mode sends all beat images at once, at most IMAGE_CONCURRENCY at a time
+PARALLEL_IMAGES = os.getenv("MODEL_A_PARALLEL_IMAGES", "1") == "1"
+IMAGE_CONCURRENCY = int(os.getenv("MODEL_A_IMAGE_CONCURRENCY", "3"))
 
-def generate_images_a(plot_beats):
-    client = get_openai_client()
+def generate_beat_image(beat):
+    """
+    Generate the illustration for one story beat.
+    Returns (url, seconds_taken); the url is the fallback image on failure.
+    """
+    started = time.perf_counter()
+    try:
+        with stage_timer("a", "image"):
+            response = create_image(
+                model="dall-e-3",
+                prompt=f"Illustration for a children's story: {beat}",
+                size="1024x1024"
+            )
+            url = persist_remote_image(response.data[0].url) or FALLBACK_IMAGE
+    except Exception as e:
+        print("Image generation failed for beat:", beat, e)
+        url = FALLBACK_IMAGE
+    return url, time.perf_counter() - started
+
+def generate_images_a(plot_beats, parallel=None, max_workers=None, timings=None, on_image=None):
     """
     Generate 3 images for Model A, one for each story section.
     plot_beats: list of strings (beginning, middle, end)
+    parallel: request all beat images at once (bounded by max_workers);
+              defaults to MODEL_A_PARALLEL_IMAGES
+    timings: optional list, filled with the latency in seconds of each image
+    on_image: optional callback on_image(index, url), called as each image is ready
     Returns list of 3 image URLs
     """
     if not isinstance(plot_beats, list) or len(plot_beats) == 0:
         plot_beats = ["An illustration for a children's story"] * 3
 
-    urls = []
-    for beat in plot_beats[:3]:
-        try:
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=f"Illustration for a children's story: {beat}",
-                size="1024x1024"
-            )
-            urls.append(response.data[0].url)
-        except Exception as e:
-            print("Image generation failed for beat:", beat, e)
-            urls.append("/static/fallback_image.png")  
+    if parallel is None:
+        parallel = PARALLEL_IMAGES
+
+    def generate(indexed_beat):
+        index, beat = indexed_beat
+        url, elapsed = generate_beat_image(beat)
+        if on_image:
+            on_image(index, url)
+        return url, elapsed
+
+    beats = list(enumerate(plot_beats[:3]))
+    if parallel and len(beats) > 1:
+        workers = max(1, min(max_workers or IMAGE_CONCURRENCY, len(beats)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-a-image") as executor:
+            results = list(executor.map(in_current_context(generate), beats))
+    else:
+        results = [generate(beat) for beat in beats]
+
+    urls = [url for url, _ in results]
+    for i, (_, elapsed) in enumerate(results, start=1):
+        print(f"Model A image {i} took {elapsed:.2f}s")
+    if timings is not None:
+        timings.extend(round(elapsed, 3) for _, elapsed in results)
 
     while len(urls) < 3:
-        urls.append("/static/fallback_image.png")
+        urls.append(FALLBACK_IMAGE)
 
     return urls
-
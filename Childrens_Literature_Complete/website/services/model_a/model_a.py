@@ -1,5 +1,6 @@
 from website.services.model_a.text_generation import generate_story_a
 from website.services.model_a.image_generation import generate_images_a
+from website.services.shared.metrics import stage_timer
 
 def split_into_three_beats(story_text: str):
     lines = [l for l in story_text.splitlines() if l.strip()]
@@ -12,14 +13,26 @@ def split_into_three_beats(story_text: str):
         " ".join(lines[2*third:])
     ]
 
-def run_model_a(user_input: dict, user_metadata: dict = None, cluster_context: dict = None) -> dict:
+def run_model_a(user_input: dict, user_metadata: dict = None, cluster_context: dict = None,
+                on_token=None, on_story=None, on_image=None) -> dict:
+    """
+    Model A: one story completion, then one image per third of the story.
+
+    on_token(text): receives the story as it streams in
+    on_story(story_text): called once the text is final, before any image
+    on_image(index, url): called as each image finishes
+    """
     prompt_text = user_input.get("prompt_text", "")
     if not prompt_text:
         raise ValueError("Prompt text missing")
 
-    story_text = generate_story_a(prompt_text)
+    with stage_timer("a", "story"):
+        story_text = generate_story_a(prompt_text, on_token=on_token)
+    if on_story:
+        on_story(story_text)
     plot_beats = split_into_three_beats(story_text)
-    images = generate_images_a(plot_beats)
+    image_timings = []
+    images = generate_images_a(plot_beats, timings=image_timings, on_image=on_image)
     if not images or len(images) < 3:
         images = ["/static/fallback_image.png"] * 3
 
@@ -27,5 +40,9 @@ def run_model_a(user_input: dict, user_metadata: dict = None, cluster_context: d
         "story_text": story_text,
         "images": images[:3],
         "character_profile": {},
-        "cultural_profile": {}
+        "cultural_profile": {},
+        "metadata": {
+            "model": "A",
+            "image_timings": image_timings
+        }
     }
@@ -1,26 +1,26 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from website.services.shared.openai_gateway import create_chat_completion, stream_chat_completion
 
-load_dotenv() 
-
-## client = OpenAI(api_key=os.getenv("OPENAI_API_KEY")) 
-
-def get_openai_client():
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=api_key)
-
-def generate_story_a(prompt: str) -> str:
-    client = get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}  
-        ]
-    )
-    story = response.choices[0].message.content
+def generate_story_a(prompt: str, on_token=None) -> str:
+    """
+    Generate the Model A story in one completion.
+    on_token: optional callback; when given the completion is streamed and
+              on_token(text) is called for every delta.
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}  
+    ]
+    if on_token:
+        parts = []
+        for delta in stream_chat_completion(model="gpt-4.1", messages=messages):
+            parts.append(delta)
+            on_token(delta)
+        story = "".join(parts)
+    else:
+        response = create_chat_completion(
+            model="gpt-4.1",
+            messages=messages
+        )
+        story = response.choices[0].message.content
     print("Generated story:", story[:100])
-    return story
\ No newline at end of file
+    return story
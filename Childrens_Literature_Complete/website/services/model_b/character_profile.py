@@ -79,21 +79,8 @@ Respond with this EXACT JSON format:
 """
     
     try:
-        response = call_gpt(prompt, temperature=0.3) 
-        profile = json.loads(response)
-        visual = profile["visual_identity"]
-        profile["locked_canonical_description"] = (
-            f"{character_name}, a {age_range} year old {character_type}. "
-            f"SKIN: {visual['skin_tone']}. "
-            f"HAIR: {visual['hair_description']} in {visual['hairstyle']}. "
-            f"EYES: {visual['eye_description']}. "
-            f"FACE: {visual['facial_features']}. "
-            f"BODY: {visual['body_proportions']}. "
-            f"CLOTHING: {visual['clothing_description']} in {visual['clothing_colors']}. "
-            f"This exact appearance must be identical in every image."
-        )
-        
-        print(f"✅ Character locked: {visual['hairstyle']}, wearing {visual['clothing_description']}")
+        response = call_gpt(prompt, temperature=0.3, stage="character_profile")
+        profile = lock_character_profile(json.loads(response), character_name, age_range, character_type)
         return profile
         
     except Exception as e:
@@ -101,8 +88,29 @@ Respond with this EXACT JSON format:
         return create_fallback_profile(character_name, age_range, character_type, character_gender, traits)
 
 
+def lock_character_profile(profile, character_name, age_range, character_type):
+    """
+    Add the canonical description every image prompt repeats.
+    Raises KeyError/TypeError if the visual identity is incomplete.
+    """
+    visual = profile["visual_identity"]
+    profile["locked_canonical_description"] = (
+        f"{character_name}, a {age_range} year old {character_type}. "
+        f"SKIN: {visual['skin_tone']}. "
+        f"HAIR: {visual['hair_description']} in {visual['hairstyle']}. "
+        f"EYES: {visual['eye_description']}. "
+        f"FACE: {visual['facial_features']}. "
+        f"BODY: {visual['body_proportions']}. "
+        f"CLOTHING: {visual['clothing_description']} in {visual['clothing_colors']}. "
+        f"This exact appearance must be identical in every image."
+    )
+
+    print(f"✅ Character locked: {visual['hairstyle']}, wearing {visual['clothing_description']}")
+    return profile
+
+
 def create_fallback_profile(name, age_range, char_type, gender, traits):
-    """Simple fallback with locked details."""
+    """Simple fallback with locked details (marked so it is never saved for reuse)."""
     return {
         "name": name,
         "age_description": f"a {age_range} year old child",
@@ -118,5 +126,6 @@ def create_fallback_profile(name, age_range, char_type, gender, traits):
         },
         "locked_canonical_description": f"{name}, a {age_range} year old with consistent appearance.",
         "personality_traits": traits or ["friendly", "curious"],
-        "art_style": "soft watercolor children's book illustration"
+        "art_style": "soft watercolor children's book illustration",
+        "is_fallback": True
     }
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Fast pipeline mode for Model B.
+
+The multi-call path makes three LLM round trips before any story text is
+written (cultural analysis, story plan, character profile), all reading the
+same form inputs. Fast mode asks for all three in one structured call and
+splits the answer into the same dicts, so everything downstream is unchanged.
+Each part is checked on its own and falls back like its multi-call stage.
+"""
+from website.services.shared.llm import call_gpt
+from website.services.model_b.character_profile import (
+    get_midpoint_age,
+    lock_character_profile,
+    create_fallback_profile,
+)
+from website.services.model_b.story_plan import fallback_story_plan
+import json
+from typing import Dict, List
+
+PREWRITE_MAX_TOKENS = 1400
+
+
+def build_prewrite_prompt(user_input: Dict, cluster_context: Dict, traits: List[str]) -> str:
+    character_name = user_input.get("character_name", "Child")
+    age_descriptor = user_input["age_descriptor"]
+    traits_text = ", ".join(traits)
+
+    return f"""
+You are preparing a children's book before it is written. Produce the cultural
+guidance, a 3-part story plan and a locked visual character design in ONE answer.
+
+CHARACTER (DO NOT CHANGE):
+- Name: {character_name}
+- Age guidance: {age_descriptor} (specifically {get_midpoint_age(age_descriptor)} years)
+- Type: {user_input.get("character_type", "human")}
+- Gender: {user_input.get("character_gender", "unspecified")}
+- Personality traits: {traits_text}
+
+STORY CONTEXT (DO NOT CHANGE):
+- Location: {user_input.get("location", "")}
+- Theme: {user_input.get("theme", "adventure")}
+- Cultural background: {cluster_context.get("cultural_background", "")}
+- Traditions: {cluster_context.get("specific_traditions", "")}
+
+RULES:
+- Age influences language complexity and tone ONLY
+- Do not introduce new personality traits; every plot beat reflects at least one listed trait
+- Cultural elements are authentic, natural and positively represented
+- Visual details must be EXACT and never change between images
+
+Return VALID JSON ONLY in this exact format:
+{{
+  "cultural_analysis": {{
+    "cultural_themes": ["themes to highlight"],
+    "authentic_details": ["authentic cultural or daily-life details"],
+    "trait_expression": ["ways traits should appear in behavior"],
+    "age_appropriate": ["language and tone guidance for {age_descriptor} readers"]
+  }},
+  "story_plan": {{
+    "title": "Short child-friendly title",
+    "plot_beats": ["Beginning beat", "Middle beat", "End beat"],
+    "moral": "Simple lesson connected to the traits"
+  }},
+  "character_profile": {{
+    "name": "{character_name}",
+    "age_description": "a {age_descriptor} year old child",
+    "visual_identity": {{
+      "skin_tone": "exact skin description",
+      "hair_description": "exact hair color and texture",
+      "hairstyle": "exact hairstyle that won't change",
+      "eye_description": "exact eye description",
+      "facial_features": "exact facial features",
+      "body_proportions": "exact body description",
+      "clothing_description": "exact clothing that won't change",
+      "clothing_colors": "exact color names"
+    }},
+    "personality_traits": ["list", "of", "traits"],
+    "art_style": "soft watercolor children's book illustration"
+  }}
+}}
+"""
+
+
+def generate_prewrite_bundle(user_input: Dict, cluster_context: Dict, traits: List[str]) -> Dict:
+    """
+    One LLM call for the cultural analysis, story plan and character
+    profile. Returns {"cultural_analysis", "story_plan", "character_profile"}.
+    """
+    from website.services.model_b.model_b import CulturalIntelligenceEngine
+
+    character_name = user_input.get("character_name", "Child")
+    age_descriptor = user_input["age_descriptor"]
+    character_type = user_input.get("character_type", "human")
+    traits_text = ", ".join(traits)
+
+    try:
+        response = call_gpt(
+            build_prewrite_prompt(user_input, cluster_context, traits),
+            max_tokens=PREWRITE_MAX_TOKENS,
+            temperature=0.4,
+            stage="prewrite"
+        )
+        bundle = json.loads(response)
+        if not isinstance(bundle, dict):
+            raise ValueError("Expected a JSON object")
+    except Exception as e:
+        print(f"   ⚠️ Fast pre-write failed, using fallbacks: {e}")
+        bundle = {}
+
+    cultural_analysis = bundle.get("cultural_analysis")
+    if not isinstance(cultural_analysis, dict) or not cultural_analysis:
+        cultural_analysis = CulturalIntelligenceEngine.fallback_analysis()
+
+    story_plan = bundle.get("story_plan")
+    if not isinstance(story_plan, dict) or len(story_plan.get("plot_beats") or []) != 3:
+        story_plan = fallback_story_plan(
+            character_name,
+            user_input.get("theme", "adventure"),
+            user_input.get("location", "a familiar place"),
+            traits_text
+        )
+
+    try:
+        character_profile = lock_character_profile(
+            bundle["character_profile"], character_name, age_descriptor, character_type
+        )
+    except Exception:
+        character_profile = create_fallback_profile(
+            character_name,
+            age_descriptor,
+            character_type,
+            user_input.get("character_gender", "unspecified"),
+            traits
+        )
+
+    return {
+        "cultural_analysis": cultural_analysis,
+        "story_plan": story_plan,
+        "character_profile": character_profile,
+    }
@@ -1,5 +1,14 @@
 from website.services.shared.llm import generate_image, call_gpt
+from website.services.shared.metrics import stage_timer
+from website.services.shared.deadline import in_current_context
+from concurrent.futures import ThreadPoolExecutor
 import json
+import os
+
+FALLBACK_IMAGE = "/static/fallback_image.png"
+
+# Max scenes summarized/illustrated at the same time
+IMAGE_CONCURRENCY = int(os.getenv("MODEL_B_IMAGE_CONCURRENCY", "3"))
 
 
 BOOK_STYLE = """
@@ -61,7 +70,7 @@ any secondary characters or objects.",
 ]
 """
     try:
-        raw = call_gpt(prompt, temperature=0.3)
+        raw = call_gpt(prompt, temperature=0.3, stage="scene_plan")
         scenes = json.loads(raw)
         if not isinstance(scenes, list):
             raise ValueError("Expected list of scenes")
@@ -128,7 +137,7 @@ SCENE DESCRIPTION:
 Output (one paragraph):
 """
     try:
-        return call_gpt(prompt, temperature=0.3).strip()
+        return call_gpt(prompt, temperature=0.3, stage="scene_summary").strip()
     except Exception:
         return scene_description[:max_words * 6]
 
@@ -167,45 +176,35 @@ def build_character_description(character_profile):
 
 
 
-# MAIN PUBLIC FUNCTION
+# SCENE ILLUSTRATION
 
-def generate_images_from_story(story_text, character_profile):
+def illustrate_scene(scene, character_desc):
     """
-    Generate narrative-following images for a children's story.
-
-    - Uses a beat-based illustration plan rather than 1 paragraph = 1 image.
-    - Each prompt is a rich scene composition: action, setting, emotion, context.
-    - Character remains visually consistent via a stable description.
+    Summarize one planned scene and generate its illustration.
+    Returns the image URL, or the fallback image if anything fails.
     """
-
-    # 1. Plan the key illustration scenes from the whole story
-    scenes = plan_illustrations_from_story(story_text)
-
-    images = []
-    character_desc = build_character_description(character_profile)
-
-    for scene in scenes:
-        # Scene is expected to have:
-        # - full_scene_description
-        # - emotional_tone
-        # - page_role
-        full_desc = scene.get("full_scene_description", "")
-        emotional_tone = scene.get("emotional_tone", "").strip()
-        page_role = scene.get("page_role", "").strip()
-
-        # 2. Summarize to a concise but rich visual brief
+    # Scene is expected to have:
+    # - full_scene_description
+    # - emotional_tone
+    # - page_role
+    full_desc = scene.get("full_scene_description", "")
+    emotional_tone = scene.get("emotional_tone", "").strip()
+    page_role = scene.get("page_role", "").strip()
+
+    # Summarize to a concise but rich visual brief
+    with stage_timer("b", "scene_summary"):
         visual_brief = summarize_scene_for_illustration(full_desc)
 
-        # 3. Build the final image prompt
-        role_line = f"This illustration shows a key {page_role} moment in the story." if page_role else ""
-        emotion_line = (
-            f"The overall emotional tone is {emotional_tone}, "
-            f"clearly visible in the character's expression and body language."
-            if emotional_tone else
-            "Show clear emotions in the character's expression and body language."
-        )
+    # Build the final image prompt
+    role_line = f"This illustration shows a key {page_role} moment in the story." if page_role else ""
+    emotion_line = (
+        f"The overall emotional tone is {emotional_tone}, "
+        f"clearly visible in the character's expression and body language."
+        if emotional_tone else
+        "Show clear emotions in the character's expression and body language."
+    )
 
-        prompt = f"""
+    prompt = f"""
 CHILDREN'S BOOK ILLUSTRATION
 
 ROLE:
@@ -230,11 +229,55 @@ RULES:
 - No speech bubbles, no written text, no interface elements, no diagrams.
 - Composition should feel like a full-page children's book illustration, not a rough storyboard frame.
 """
-        try:
+    try:
+        with stage_timer("b", "image"):
             img_url = generate_image(prompt)
-            images.append(img_url or "/static/fallback_image.png")
-        except Exception:
-            images.append("/static/fallback_image.png")
+        return img_url or FALLBACK_IMAGE
+    except Exception:
+        return FALLBACK_IMAGE
 
-    return images
 
+def _illustrate_scene_safely(scene, character_desc):
+    try:
+        return illustrate_scene(scene, character_desc)
+    except Exception as e:
+        print(f"Scene illustration failed: {e}")
+        return FALLBACK_IMAGE
+
+
+# MAIN PUBLIC FUNCTION
+
+def generate_images_from_story(story_text, character_profile, max_workers=None, on_image=None):
+    """
+    Generate narrative-following images for a children's story.
+
+    - Uses a beat-based illustration plan rather than 1 paragraph = 1 image.
+    - Each prompt is a rich scene composition: action, setting, emotion, context.
+    - Character remains visually consistent via a stable description.
+    - Scenes are summarized and illustrated concurrently (at most
+      max_workers at a time); images come back in scene order.
+    - on_image(index, url), if given, is called as soon as each scene's
+      image is ready (in completion order).
+    """
+
+    # 1. Plan the key illustration scenes from the whole story
+    with stage_timer("b", "scene_plan"):
+        scenes = plan_illustrations_from_story(story_text)
+    if not scenes:
+        return []
+
+    character_desc = build_character_description(character_profile)
+
+    # 2. Summarize + illustrate each scene in parallel
+    workers = max(1, min(max_workers or IMAGE_CONCURRENCY, len(scenes)))
+    def illustrate(indexed_scene):
+        index, scene = indexed_scene
+        url = _illustrate_scene_safely(scene, character_desc)
+        if on_image:
+            on_image(index, url)
+        return url
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scene-image") as executor:
+        images = list(executor.map(in_current_context(illustrate), enumerate(scenes)))
+
+    return images
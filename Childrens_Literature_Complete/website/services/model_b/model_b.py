@@ -1,11 +1,22 @@
 from website.services.shared.llm import call_gpt
 from website.services.model_b.validation import validate_story
+from website.services.model_b.stage_graph import Stage, StageGraph
+from website.services.shared.metrics import stage_timer
 
 import json
+import os
 from datetime import datetime
 from typing import Dict, List, Any
 
 
+# Max Model B stages running at the same time
+STAGE_CONCURRENCY = int(os.getenv("MODEL_B_STAGE_CONCURRENCY", "4"))
+# "multi": separate cultural analysis / story plan / character profile calls
+# "fast": one structured call for all three (see fast_prewrite.py)
+PIPELINE_MODE = os.getenv("MODEL_B_PIPELINE_MODE", "multi")
+PIPELINE_MODES = ("multi", "fast")
+
+
 # ============================================================
 # UTILITIES
 # ============================================================
@@ -108,15 +119,229 @@ Return valid JSON only in this format:
 """
 
         try:
-            response = call_gpt(prompt, temperature=0.3)
+            response = call_gpt(prompt, temperature=0.3, stage="cultural_analysis")
             return json.loads(response)
         except Exception:
-            return {
-                "cultural_themes": ["friendship", "community"],
-                "authentic_details": ["family interactions", "daily routines"],
-                "trait_expression": ["show traits through choices and dialogue"],
-                "age_appropriate": ["simple language", "positive messages"]
-            }
+            return self.fallback_analysis()
+
+    @staticmethod
+    def fallback_analysis() -> Dict:
+        return {
+            "cultural_themes": ["friendship", "community"],
+            "authentic_details": ["family interactions", "daily routines"],
+            "trait_expression": ["show traits through choices and dialogue"],
+            "age_appropriate": ["simple language", "positive messages"]
+        }
+
+
+# ============================================================
+# MODEL B STAGES
+# ============================================================
+
+def stage_cultural_analysis(user_input: Dict, user_metadata: Dict) -> Dict:
+    cultural_engine = CulturalIntelligenceEngine()
+    print("🔍 Analyzing cultural + personality context...")
+
+    with stage_timer("b", "cultural_analysis"):
+        cultural_analysis = cultural_engine.analyze_cultural_context(
+            user_input=user_input,
+            user_metadata=user_metadata
+        )
+
+    print("   ✓ Cultural analysis completed")
+    return cultural_analysis
+
+
+def stage_cultural_profile(
+    user_input: Dict,
+    user_metadata: Dict,
+    cluster_context: Dict,
+    traits: List[str],
+    cultural_analysis: Dict
+) -> Dict:
+    """Build cultural profile (TEXT-ONLY AGE)."""
+    print("📝 Building cultural profile...")
+
+    return {
+        "user_context": {
+            "background": user_metadata.get("cultural_background", ""),
+            "region": user_metadata.get("region", "")
+        },
+        "story_context": {
+            "location": user_input.get("location", ""),
+            "theme": user_input.get("theme", "adventure"),
+            "character_name": user_input.get("character_name", "Child"),
+            "age_descriptor": user_input["age_descriptor"],
+            "character_gender": user_input.get("character_gender", "unspecified"),
+            "traits": traits
+        },
+        "cluster_context": cluster_context,
+        "cultural_analysis": cultural_analysis,
+        "principles": CulturalIntelligenceEngine().cultural_principles
+    }
+
+
+def stage_story_plan(user_input: Dict, cultural_profile: Dict) -> Dict:
+    print("📖 Generating story plan...")
+    from website.services.model_b.story_plan import generate_story_plan
+
+    with stage_timer("b", "story_plan"):
+        story_plan = generate_story_plan(
+            user_input=user_input,
+            cultural_profile=cultural_profile
+        )
+
+    print(f"   ✓ Story plan created: {story_plan.get('title', 'Untitled')}")
+    return story_plan
+
+
+def stage_character_profile(user_input: Dict, traits: List[str], cultural_profile: Dict) -> Dict:
+    """Character profile (age as descriptive text only)."""
+    print("👤 Creating character profile...")
+    from website.services.model_b.character_profile import generate_character_profile
+
+    with stage_timer("b", "character_profile"):
+        character_profile = generate_character_profile(
+            character_name=user_input.get("character_name", "Child"),
+            age_range=user_input["age_descriptor"],  # TEXT ONLY
+            character_type=user_input.get("character_type", "human"),
+            character_gender=user_input.get("character_gender", "unspecified"),
+            traits=traits,
+            cultural_profile=cultural_profile
+        )
+
+    print("   ✓ Character profile created")
+    return character_profile
+
+
+def stage_fast_prewrite(user_input: Dict, cluster_context: Dict, traits: List[str]) -> Dict:
+    """Fast mode: cultural analysis, story plan and character profile in one call."""
+    print("⚡ Pre-writing in one call (fast mode)...")
+    from website.services.model_b.fast_prewrite import generate_prewrite_bundle
+
+    with stage_timer("b", "prewrite"):
+        bundle = generate_prewrite_bundle(user_input, cluster_context, traits)
+
+    print(f"   ✓ Pre-write done: {bundle['story_plan'].get('title', 'Untitled')}")
+    return bundle
+
+
+def _from_prewrite(name: str):
+    def pick(prewrite: Dict) -> Dict:
+        return prewrite[name]
+    return pick
+
+
+def stage_story_cultural_profile(cultural_profile: Dict, character_profile: Dict) -> Dict:
+    """Cultural profile as seen by the writer and validator (with the character)."""
+    story_cultural_profile = dict(cultural_profile)
+    story_cultural_profile["character_profile"] = character_profile
+    return story_cultural_profile
+
+
+def stage_story(story_plan: Dict, story_cultural_profile: Dict, on_token=None) -> str:
+    print("✍️ Writing story...")
+    from website.services.model_b.story_generation import generate_story
+
+    with stage_timer("b", "story"):
+        story_text = generate_story(
+            story_plan=story_plan,
+            cultural_profile=story_cultural_profile,
+            on_token=on_token
+        )
+
+    print(f"   ✓ Story written ({len(story_text)} chars)")
+    return story_text
+
+
+def stage_validation(story_text: str, story_cultural_profile: Dict) -> str:
+    print("🛡️ Validating story...")
+
+    try:
+        with stage_timer("b", "validation"):
+            story_text = validate_story(
+                story_text=story_text,
+                cultural_profile=story_cultural_profile
+            )
+        print("   ✓ Story validated and polished")
+    except Exception as e:
+        print(f"   ⚠️ Validation skipped: {e}")
+
+    if not story_text.strip().endswith("The End."):
+        story_text = story_text.rstrip() + "\n\nThe End."
+
+    return story_text
+
+
+def stage_published_story(
+    validated_story: str,
+    character_profile: Dict,
+    story_cultural_profile: Dict,
+    on_story=None
+) -> bool:
+    """Hand the finished text to the caller before illustration starts."""
+    if on_story is None:
+        return False
+    on_story(validated_story, character_profile, story_cultural_profile)
+    return True
+
+
+def stage_images(
+    validated_story: str,
+    character_profile: Dict,
+    published_story: bool,
+    on_image=None
+) -> List[str]:
+    """Image generation (no age semantics beyond text)."""
+    print("🎨 Generating images...")
+    from website.services.model_b.image_generation import generate_images_from_story
+
+    return generate_images_from_story(
+        story_text=validated_story,
+        character_profile=character_profile,
+        on_image=on_image
+    )
+
+
+def build_model_b_graph(pipeline_mode: str = "multi", character_known: bool = False) -> StageGraph:
+    """
+    character_known: the character_profile is passed in as an initial value
+    (a stored identity), so no stage designs it.
+    """
+    if pipeline_mode == "fast":
+        prewrite_stages = [
+            Stage("prewrite", stage_fast_prewrite,
+                  ["user_input", "cluster_context", "traits"]),
+            Stage("cultural_analysis", _from_prewrite("cultural_analysis"), ["prewrite"]),
+            Stage("story_plan", _from_prewrite("story_plan"), ["prewrite"]),
+            Stage("character_profile", _from_prewrite("character_profile"), ["prewrite"]),
+        ]
+    else:
+        prewrite_stages = [
+            Stage("cultural_analysis", stage_cultural_analysis,
+                  ["user_input", "user_metadata"]),
+            Stage("story_plan", stage_story_plan,
+                  ["user_input", "cultural_profile"]),
+            Stage("character_profile", stage_character_profile,
+                  ["user_input", "traits", "cultural_profile"]),
+        ]
+    if character_known:
+        prewrite_stages = [s for s in prewrite_stages if s.name != "character_profile"]
+
+    return StageGraph(prewrite_stages + [
+        Stage("cultural_profile", stage_cultural_profile,
+              ["user_input", "user_metadata", "cluster_context", "traits", "cultural_analysis"]),
+        Stage("story_cultural_profile", stage_story_cultural_profile,
+              ["cultural_profile", "character_profile"]),
+        Stage("story_text", stage_story,
+              ["story_plan", "story_cultural_profile", "on_token"]),
+        Stage("validated_story", stage_validation,
+              ["story_text", "story_cultural_profile"]),
+        Stage("published_story", stage_published_story,
+              ["validated_story", "character_profile", "story_cultural_profile", "on_story"]),
+        Stage("images", stage_images,
+              ["validated_story", "character_profile", "published_story", "on_image"]),
+    ], max_workers=STAGE_CONCURRENCY)
 
 
 # ============================================================
@@ -126,14 +351,31 @@ Return valid JSON only in this format:
 def run_model_b(
     user_input: Dict,
     user_metadata: Dict,
-    cluster_context: Dict
+    cluster_context: Dict,
+    on_token=None,
+    on_story=None,
+    on_image=None,
+    pipeline_mode=None,
+    character_profile=None
 ) -> Dict:
     """
     Model B pipeline with:
     - Text-only age semantics
     - Narrative-first generation
     - No structural interpretation of age
+
+    on_token: optional callback receiving the story draft as it streams;
+    the returned story_text is the validated version.
+    on_story(story_text, character_profile, cultural_profile): called with
+    the validated story before illustration starts.
+    on_image(index, url): called as each illustration finishes.
+    pipeline_mode: "multi" or "fast" (defaults to MODEL_B_PIPELINE_MODE).
+    character_profile: a stored character design to reuse (see
+    jobs/character_registry.py) instead of designing the character again.
     """
+    pipeline_mode = pipeline_mode or PIPELINE_MODE
+    if pipeline_mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown Model B pipeline mode: {pipeline_mode}")
 
     print("\n" + "=" * 60)
     print("🚀 MODEL B: Cultural + Trait-Aware Generation")
@@ -166,116 +408,39 @@ def run_model_b(
         )
 
         print(f"🧒 Age guidance: {user_input['age_descriptor']}")
+        print(f"🧩 Pipeline mode: {pipeline_mode}")
+        if character_profile:
+            print(f"👤 Reusing stored character: {character_profile.get('name')}")
 
         # ----------------------------------------------------
-        # 3. Cultural analysis
-        # ----------------------------------------------------
-        cultural_engine = CulturalIntelligenceEngine()
-        print("🔍 Analyzing cultural + personality context...")
-
-        cultural_analysis = cultural_engine.analyze_cultural_context(
-            user_input=user_input,
-            user_metadata=user_metadata
-        )
-
-        print("   ✓ Cultural analysis completed")
-
-        # ----------------------------------------------------
-        # 4. Build cultural profile (TEXT-ONLY AGE)
+        # 3-9. Run the stage graph
         # ----------------------------------------------------
-        print("📝 Building cultural profile...")
-
-        cultural_profile = {
-            "user_context": {
-                "background": user_metadata.get("cultural_background", ""),
-                "region": user_metadata.get("region", "")
-            },
-            "story_context": {
-                "location": user_input.get("location", ""),
-                "theme": user_input.get("theme", "adventure"),
-                "character_name": user_input.get("character_name", "Child"),
-                "age_descriptor": user_input["age_descriptor"],
-                "character_gender": user_input.get("character_gender", "unspecified"),
-                "traits": traits
-            },
+        # Story plan and character profile only need the cultural
+        # profile, so they run side by side (or come from the single
+        # pre-write call in fast mode); everything else follows its inputs.
+        character_reused = bool(character_profile)
+        graph = build_model_b_graph(pipeline_mode, character_known=character_reused)
+        initial = {
+            "user_input": user_input,
+            "user_metadata": user_metadata,
             "cluster_context": cluster_context,
-            "cultural_analysis": cultural_analysis,
-            "principles": cultural_engine.cultural_principles
+            "traits": traits,
+            "on_token": on_token,
+            "on_story": on_story,
+            "on_image": on_image,
         }
+        if character_profile:
+            initial["character_profile"] = character_profile
+        values = graph.run(initial)
 
-        # ----------------------------------------------------
-        # 5. Story plan
-        # ----------------------------------------------------
-        print("📖 Generating story plan...")
-        from website.services.model_b.story_plan import generate_story_plan
-
-        story_plan = generate_story_plan(
-            user_input=user_input,
-            cultural_profile=cultural_profile
-        )
-
-        print(f"   ✓ Story plan created: {story_plan.get('title', 'Untitled')}")
-
-        # ----------------------------------------------------
-        # 6. Character profile (age as descriptive text only)
-        # ----------------------------------------------------
-        print("👤 Creating character profile...")
-        from website.services.model_b.character_profile import generate_character_profile
-
-        character_profile = generate_character_profile(
-            character_name=user_input.get("character_name", "Child"),
-            age_range=user_input["age_descriptor"],  # TEXT ONLY
-            character_type=user_input.get("character_type", "human"),
-            character_gender=user_input.get("character_gender", "unspecified"),
-            traits=traits,
-            cultural_profile=cultural_profile
-        )
-
-        cultural_profile["character_profile"] = character_profile
-        print("   ✓ Character profile created")
-
-        # ----------------------------------------------------
-        # 7. Story generation
-        # ----------------------------------------------------
-        print("✍️ Writing story...")
-        from website.services.model_b.story_generation import generate_story
-
-        story_text = generate_story(
-            story_plan=story_plan,
-            cultural_profile=cultural_profile
-        )
-
-        print(f"   ✓ Story written ({len(story_text)} chars)")
-
-        # ----------------------------------------------------
-        # 8. Validation
-        # ----------------------------------------------------
-        print("🛡️ Validating story...")
-
-        try:
-            story_text = validate_story(
-                story_text=story_text,
-                cultural_profile=cultural_profile
-            )
-            print("   ✓ Story validated and polished")
-        except Exception as e:
-            print(f"   ⚠️ Validation skipped: {e}")
-
-        if not story_text.strip().endswith("The End."):
-            story_text = story_text.rstrip() + "\n\nThe End."
-
-        # ----------------------------------------------------
-        # 9. Image generation (no age semantics beyond text)
-        # ----------------------------------------------------
-        print("🎨 Generating images...")
-        from website.services.model_b.image_generation import generate_images_from_story
-
-        images = generate_images_from_story(
-                story_text=story_text,
-          character_profile=character_profile
-        )
+        story_text = values["validated_story"]
+        images = values["images"]
+        character_profile = values["character_profile"]
+        cultural_profile = values["story_cultural_profile"]
+        story_plan = values["story_plan"]
 
         print(f"   ✓ Images generated: {len(images)}")
+        print(f"⏱️ Stage timings: {graph.timings}")
         print("\n✨ MODEL B: Completed successfully!\n")
 
         return {
@@ -286,8 +451,11 @@ def run_model_b(
             "story_plan": story_plan,
             "metadata": {
                 "model": "B",
+                "pipeline_mode": pipeline_mode,
+                "character_reused": character_reused,
                 "traits": traits,
                 "age_descriptor": user_input["age_descriptor"],
+                "stage_timings": graph.timings,
                 "timestamp": datetime.now().isoformat()
             }
         }
@@ -0,0 +1,79 @@
+"""
+Fast local pre-screen for Model B stories.
+
+Runs before the LLM review in validation.py. Stories that pass every check
+skip the review rewrite (a whole extra generation); stories that are
+flagged go to the reviewer together with the list of flags.
+"""
+import re
+import time
+from typing import Dict
+
+from website.services.model_b.readability import analyze_story
+
+# Words that have no place in a story for young children
+AGE_INAPPROPRIATE_TERMS = {
+    "kill", "killed", "killing", "murder", "blood", "bloody", "gun", "guns", "knife",
+    "stab", "corpse", "dead body", "suicide", "drunk", "beer", "wine", "cigarette",
+    "drugs", "sexy", "kiss passionately", "damn", "hell", "stupid", "idiot", "shut up",
+    "hate you", "torture", "gore", "terrifying", "nightmare",
+}
+
+# Framing that tends to stereotype or exoticise a culture
+SENSITIVITY_TERMS = {
+    "savage", "savages", "primitive", "uncivilized", "uncivilised", "exotic", "tribal",
+    "third world", "backward", "weird food", "strange people", "funny clothes",
+    "poor village", "natives", "oriental", "gypsy", "eskimo",
+}
+
+
+def _lexicon_pattern(terms):
+    alternatives = sorted((re.escape(t) for t in terms), key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+AGE_INAPPROPRIATE_RE = _lexicon_pattern(AGE_INAPPROPRIATE_TERMS)
+SENSITIVITY_RE = _lexicon_pattern(SENSITIVITY_TERMS)
+
+
+def _mentions_trait(text_lower: str, trait: str) -> bool:
+    # Stem match so "curious" also counts "curiosity"
+    stem = trait.lower().strip()[:5]
+    return bool(stem) and stem in text_lower
+
+
+def prescreen_story(story_text: str, cultural_profile: Dict) -> Dict:
+    """
+    Run the local checks. Returns {"passed": bool, "flags": [str], "seconds": float};
+    each flag is "<check>: <detail>".
+    """
+    started = time.perf_counter()
+    story_context = (cultural_profile or {}).get("story_context", {})
+    flags = []
+
+    for term in sorted({m.lower() for m in AGE_INAPPROPRIATE_RE.findall(story_text)}):
+        flags.append(f"age_appropriateness: uses '{term}'")
+    for term in sorted({m.lower() for m in SENSITIVITY_RE.findall(story_text)}):
+        flags.append(f"sensitivity: uses '{term}'")
+
+    # Sentence length, grade level and vocabulary against the reading-level
+    # preset for the reader's age
+    flags.extend(analyze_story(story_text, story_context.get("age_descriptor"))["flags"])
+
+    text_lower = story_text.lower()
+    name = story_context.get("character_name")
+    if name and name.lower() not in text_lower:
+        flags.append(f"character: '{name}' is never named")
+
+    traits = story_context.get("traits") or []
+    if traits and not any(_mentions_trait(text_lower, trait) for trait in traits):
+        flags.append(f"traits: none of {', '.join(traits)} shows up in the text")
+
+    if not story_text.strip().endswith("The End."):
+        flags.append("ending: does not end with 'The End.'")
+
+    return {
+        "passed": not flags,
+        "flags": flags,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
@@ -0,0 +1,106 @@
+"""
+Compact cultural context for the Model B story and validation prompts.
+
+The story cultural profile is a nested dict (story_context, cluster_context,
+cultural_analysis, the static principles, the whole character_profile) and
+several fields repeat each other. Putting its repr into a prompt costs input
+tokens for keys, quotes and braces that the model doesn't need. This module
+projects the fields each stage actually uses into short "Label: value"
+lines, in a fixed order, with repeated values dropped.
+"""
+import os
+import re
+from typing import Dict, List
+
+from website.services.shared import metrics
+
+# Set to 0 to send the raw profile dict again (for A/B comparisons)
+COMPACT_CONTEXT_ENABLED = os.getenv("MODEL_B_COMPACT_CONTEXT", "1") == "1"
+
+# Per stage: (label, dotted paths into the story cultural profile), in
+# prompt order. Values from all paths of a field are merged.
+STAGE_FIELDS = {
+    "story": [
+        ("Main character", ["story_context.character_name"]),
+        ("Age guidance", ["story_context.age_descriptor"]),
+        ("Gender", ["story_context.character_gender"]),
+        ("Traits", ["story_context.traits", "character_profile.personality_traits"]),
+        ("Location", ["story_context.location"]),
+        ("Theme", ["story_context.theme"]),
+        ("Cultural background", ["cluster_context.cultural_background", "user_context.background"]),
+        ("Traditions", ["cluster_context.specific_traditions"]),
+        ("Region", ["user_context.region"]),
+        ("Cultural themes", ["cultural_analysis.cultural_themes"]),
+        ("Authentic details", ["cultural_analysis.authentic_details"]),
+        ("Show traits through", ["cultural_analysis.trait_expression"]),
+        ("Language and tone", ["cultural_analysis.age_appropriate"]),
+    ],
+    "validation": [
+        ("Main character", ["story_context.character_name"]),
+        ("Age guidance", ["story_context.age_descriptor"]),
+        ("Traits", ["story_context.traits", "character_profile.personality_traits"]),
+        ("Cultural background", ["cluster_context.cultural_background", "user_context.background"]),
+        ("Traditions", ["cluster_context.specific_traditions"]),
+        ("Cultural themes", ["cultural_analysis.cultural_themes"]),
+        ("Language and tone", ["cultural_analysis.age_appropriate"]),
+    ],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _lookup(profile: Dict, path: str):
+    value = profile
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _flatten(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple, set)):
+        return [item for v in value for item in _flatten(v)]
+    text = re.sub(r"\s+", " ", str(value)).strip()
+    return [text] if text else []
+
+
+def _normalize(text: str) -> str:
+    return text.lower().rstrip(".")
+
+
+def build_prompt_context(cultural_profile: Dict, stage: str) -> str:
+    """The STAGE_FIELDS of one stage as "Label: value" lines."""
+    seen = set()
+    lines = []
+    for label, paths in STAGE_FIELDS[stage]:
+        values = []
+        for path in paths:
+            for text in _flatten(_lookup(cultural_profile or {}, path)):
+                key = _normalize(text)
+                if key not in seen:
+                    seen.add(key)
+                    values.append(text)
+        if values:
+            separator = "; " if any("," in v for v in values) else ", "
+            lines.append(f"- {label}: {separator.join(values)}")
+    return "\n".join(lines)
+
+
+def prompt_context(cultural_profile: Dict, stage: str) -> str:
+    """
+    Context text for a stage's prompt. Records the estimated tokens of the
+    raw dict and of what is sent (context_tokens_raw / _compact counters).
+    """
+    raw = str(cultural_profile)
+    context = build_prompt_context(cultural_profile, stage) if COMPACT_CONTEXT_ENABLED else raw
+    metrics.increment("context_tokens_raw", estimate_tokens(raw), model="b", stage=stage)
+    metrics.increment("context_tokens_compact", estimate_tokens(context), model="b", stage=stage)
+    return context
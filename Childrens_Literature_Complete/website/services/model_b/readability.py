@@ -0,0 +1,202 @@
+"""
+Local readability analysis against READING_LEVEL_PRESETS / STORY_LENGTH_PRESETS.
+
+For each story: type-token ratio, sentence-length distribution, syllable
+based Flesch-Kincaid grade and length in word tokens, scored against the
+reading-level preset for the prompt's age_range. score_texts() does the
+numeric work for many stories at once with NumPy, so the whole Story table
+can be scored in one pass (see score_story_table and the
+`flask readability-report` command). No LLM calls; cheap enough to gate the
+LLM review in prescreen.py.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from website.services.model_b.story_presets import READING_LEVEL_PRESETS, STORY_LENGTH_PRESETS
+
+# Sentences end at . ! ? or a line break (titles, "The End.")
+SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+WORD_RE = re.compile(r"[A-Za-z']+")
+
+# TTR is only comparable on equal-sized chunks (standardised TTR). The
+# preset target_ttr is for whole stories; on 100-word chunks ordinary
+# children's prose sits around 0.6-0.7, so the gate is max_standardised_ttr
+TTR_CHUNK_WORDS = 100
+# A sentence this many times the preset maximum counts as "very long"
+VERY_LONG_FACTOR = 1.5
+MAX_VERY_LONG_SHARE = 0.1
+# Flesch-Kincaid swings wildly on a sentence or two; only gate longer texts
+MIN_GRADE_WORDS = 30
+
+
+def preset_for_age_range(age_range: Optional[str]) -> str:
+    """Name of the READING_LEVEL_PRESETS entry for an age range like "7-9"."""
+    ages = [int(n) for n in re.findall(r"\d+", age_range or "")]
+    midpoint = sum(ages[:2]) / len(ages[:2]) if ages else 8
+    if midpoint <= 6:
+        return "Early Reader (4–6)"
+    if midpoint <= 8:
+        return "Developing Reader (6–8)"
+    return "Confident Reader (8–10)"
+
+
+@lru_cache(maxsize=20000)
+def count_syllables(word: str) -> int:
+    word = word.lower().strip("'")
+    if not word:
+        return 0
+    count = len(re.findall(r"[aeiouy]+", word))
+    # Silent endings: "make", "loved", "boxes" (but not "table", "wanted")
+    if count > 1 and (
+        (word.endswith("e") and not word.endswith(("le", "ee")))
+        or (word.endswith("ed") and not word.endswith(("ted", "ded")))
+        or (word.endswith("es") and not word.endswith(("ses", "zes", "ces", "ches", "shes", "ges", "xes")))
+    ):
+        count -= 1
+    return max(1, count)
+
+
+def tokenize(text: str) -> List[List[str]]:
+    """Sentences as lists of words (sentences without words are dropped)."""
+    sentences = []
+    for sentence in SENTENCE_RE.findall(text or ""):
+        words = WORD_RE.findall(sentence)
+        if words:
+            sentences.append(words)
+    return sentences
+
+
+def standardised_ttr(words: Sequence[str]) -> float:
+    """Mean TTR over full TTR_CHUNK_WORDS chunks; NaN for shorter texts."""
+    lowered = [w.lower() for w in words]
+    chunks = [lowered[i:i + TTR_CHUNK_WORDS] for i in range(0, len(lowered) - TTR_CHUNK_WORDS + 1, TTR_CHUNK_WORDS)]
+    if not chunks:
+        return float("nan")
+    return float(np.mean([len(set(chunk)) / TTR_CHUNK_WORDS for chunk in chunks]))
+
+
+def score_texts(texts: Sequence[str], age_ranges: Sequence[Optional[str]],
+                length_preset: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Score many stories at once. Returns a dict of equal-length arrays
+    (one entry per story) plus "flags", a list of flag lists.
+    """
+    n = len(texts)
+    tokenized = [tokenize(text) for text in texts]
+
+    # Flatten every sentence of every story into one array, keeping the
+    # story index, so per-story statistics are bincounts instead of loops
+    sentence_story = np.array([i for i, sentences in enumerate(tokenized) for _ in sentences], dtype=np.int64)
+    sentence_words = np.array([len(s) for sentences in tokenized for s in sentences], dtype=np.float64)
+    sentence_syllables = np.array(
+        [sum(count_syllables(w) for w in s) for sentences in tokenized for s in sentences], dtype=np.float64
+    )
+
+    sentences = np.bincount(sentence_story, minlength=n).astype(np.float64)
+    words = np.bincount(sentence_story, weights=sentence_words, minlength=n)
+    syllables = np.bincount(sentence_story, weights=sentence_syllables, minlength=n)
+    unique_words = np.array(
+        [len({w.lower() for s in story for w in s}) for story in tokenized], dtype=np.float64
+    )
+    sttr = np.array([standardised_ttr([w for s in story for w in s]) for story in tokenized])
+
+    presets = [preset_for_age_range(age_range) for age_range in age_ranges]
+    max_sentence = np.array([READING_LEVEL_PRESETS[p]["max_sentence_length"] for p in presets], dtype=np.float64)
+    max_sttr = np.array([READING_LEVEL_PRESETS[p]["max_standardised_ttr"] for p in presets])
+    max_grade = np.array([READING_LEVEL_PRESETS[p]["max_grade_level"] for p in presets], dtype=np.float64)
+
+    very_long = sentence_words > max_sentence[sentence_story] * VERY_LONG_FACTOR
+    very_long_count = np.bincount(sentence_story, weights=very_long.astype(np.float64), minlength=n)
+    longest = np.zeros(n)
+    if sentence_words.size:
+        np.maximum.at(longest, sentence_story, sentence_words)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_sentence = np.where(sentences > 0, words / sentences, 0.0)
+        syllables_per_word = np.where(words > 0, syllables / words, 0.0)
+        ttr = np.where(words > 0, unique_words / words, 0.0)
+        very_long_share = np.where(sentences > 0, very_long_count / sentences, 0.0)
+    grade = np.where(words > 0, 0.39 * mean_sentence + 11.8 * syllables_per_word - 15.59, 0.0)
+
+    too_long_sentences = (mean_sentence > max_sentence) | (very_long_share > MAX_VERY_LONG_SHARE)
+    too_hard = (words >= MIN_GRADE_WORDS) & (grade > max_grade)
+    too_varied = ~np.isnan(sttr) & (sttr > max_sttr)
+    if length_preset:
+        bounds = STORY_LENGTH_PRESETS[length_preset]
+        wrong_length = (words < bounds["min_tokens"]) | (words > bounds["max_tokens"])
+    else:
+        wrong_length = np.zeros(n, dtype=bool)
+
+    flags = []
+    for i in range(n):
+        story_flags = []
+        if too_long_sentences[i]:
+            story_flags.append(
+                f"sentence_length: mean {mean_sentence[i]:.1f} words, longest {longest[i]:.0f} "
+                f"(limit {max_sentence[i]:.0f} for {presets[i]})"
+            )
+        if too_hard[i]:
+            story_flags.append(f"grade_level: {grade[i]:.1f} (limit {max_grade[i]:.0f} for {presets[i]})")
+        if too_varied[i]:
+            story_flags.append(
+                f"vocabulary: standardised TTR {sttr[i]:.2f} (limit {max_sttr[i]:.2f} for {presets[i]})"
+            )
+        if wrong_length[i]:
+            story_flags.append(f"length: {words[i]:.0f} tokens (preset {length_preset})")
+        flags.append(story_flags)
+
+    return {
+        "preset": np.array(presets, dtype=object),
+        "tokens": words.astype(np.int64),
+        "sentences": sentences.astype(np.int64),
+        "mean_sentence_length": mean_sentence,
+        "longest_sentence": longest,
+        "very_long_share": very_long_share,
+        "ttr": ttr,
+        "standardised_ttr": sttr,
+        "syllables_per_word": syllables_per_word,
+        "grade_level": grade,
+        "passed": np.array([not f for f in flags], dtype=bool),
+        "flags": flags,
+    }
+
+
+def analyze_story(story_text: str, age_range: Optional[str] = None,
+                  length_preset: Optional[str] = None) -> Dict:
+    """Score one story; plain Python values, plus the sentence lengths."""
+    scores = score_texts([story_text], [age_range], length_preset=length_preset)
+    result = {
+        key: value[0].item() if isinstance(value[0], np.generic) else value[0]
+        for key, value in scores.items()
+    }
+    result["sentence_lengths"] = [len(s) for s in tokenize(story_text)]
+    return result
+
+
+def score_story_table(length_preset: Optional[str] = None):
+    """
+    Score every saved story against the preset for its prompt's age range.
+    Needs an app context; returns a pandas DataFrame (one row per story).
+    """
+    import pandas as pd
+    from website import db
+    from website.models.database import Story, Prompt
+
+    rows = (
+        db.session.query(Story.id, Story.model_used, Story.content, Prompt.age_range)
+        .outerjoin(Prompt, Story.prompt_id == Prompt.id)
+        .order_by(Story.id)
+        .all()
+    )
+    scores = score_texts([r.content for r in rows], [r.age_range for r in rows], length_preset=length_preset)
+    flags = scores.pop("flags")
+
+    frame = pd.DataFrame(scores)
+    frame.insert(0, "story_id", [r.id for r in rows])
+    frame.insert(1, "model_used", [r.model_used for r in rows])
+    frame.insert(2, "age_range", [r.age_range for r in rows])
+    frame["flags"] = ["; ".join(f) for f in flags]
+    return frame
@@ -1,9 +1,11 @@
 from website.services.shared.llm import call_gpt
+from website.services.model_b.prompt_context import prompt_context
 
-def generate_story(story_plan, cultural_profile):
+def generate_story(story_plan, cultural_profile, on_token=None):
     """
     Generates a children's story from a structured plan
     and explicit cultural context.
+    on_token: optional callback that receives the text as it streams in.
     """
 
     prompt = f"""
@@ -15,7 +17,7 @@ def generate_story(story_plan, cultural_profile):
     {story_plan}
 
     CULTURAL CONTEXT:
-    {cultural_profile}
+{prompt_context(cultural_profile, "story")}
 
     Requirements:
     - Follow the plot beats in order
@@ -31,4 +33,4 @@ def generate_story(story_plan, cultural_profile):
     - Do not place any text after this line.
     """
 
-    return call_gpt(prompt, temperature=0.7)
+    return call_gpt(prompt, temperature=0.7, stage="story", on_token=on_token)
@@ -70,7 +70,7 @@ Return VALID JSON ONLY in this exact format:
 """
 
     try:
-        response = call_gpt(prompt, temperature=0.4)
+        response = call_gpt(prompt, temperature=0.4, stage="story_plan")
         plan = json.loads(response)
 
         if "plot_beats" not in plan or len(plan["plot_beats"]) != 3:
@@ -80,12 +80,17 @@ Return VALID JSON ONLY in this exact format:
 
     except Exception:
 
-        return {
-            "title": f"{character_name}'s {theme.capitalize()} Adventure",
-            "plot_beats": [
-                f"Beginning: {character_name} shows their {traits_text} nature in {location}.",
-                f"Middle: A challenge helps {character_name} use their {traits_text} traits.",
-                f"End: {character_name} succeeds by being {traits_text}."
-            ],
-            "moral": f"Being {traits_text} helps us overcome challenges."
-        }
+        return fallback_story_plan(character_name, theme, location, traits_text)
+
+
+def fallback_story_plan(character_name, theme, location, traits_text):
+    """Template plan used when the LLM plan is missing or malformed."""
+    return {
+        "title": f"{character_name}'s {theme.capitalize()} Adventure",
+        "plot_beats": [
+            f"Beginning: {character_name} shows their {traits_text} nature in {location}.",
+            f"Middle: A challenge helps {character_name} use their {traits_text} traits.",
+            f"End: {character_name} succeeds by being {traits_text}."
+        ],
+        "moral": f"Being {traits_text} helps us overcome challenges."
+    }
@@ -17,17 +17,23 @@ READING_LEVEL_PRESETS = {
     "Early Reader (4–6)": {
         "vocab_level": "simple",
         "target_ttr": 0.25,
-        "max_sentence_length": 10
+        "max_standardised_ttr": 0.75,
+        "max_sentence_length": 10,
+        "max_grade_level": 4
     },
     "Developing Reader (6–8)": {
         "vocab_level": "moderate",
         "target_ttr": 0.35,
-        "max_sentence_length": 14
+        "max_standardised_ttr": 0.8,
+        "max_sentence_length": 14,
+        "max_grade_level": 6
     },
     "Confident Reader (8–10)": {
         "vocab_level": "rich",
         "target_ttr": 0.45,
-        "max_sentence_length": 18
+        "max_standardised_ttr": 0.85,
+        "max_sentence_length": 18,
+        "max_grade_level": 8
     }
 }
 
@@ -1,7 +1,44 @@
 from website.services.shared.llm import call_gpt
+from website.services.shared import metrics
+from website.services.shared.metrics import stage_timer
+from website.services.model_b.prescreen import prescreen_story
+from website.services.model_b.prompt_context import prompt_context
+import os
+
+# Run the local pre-screen first and only ask the LLM reviewer about
+# stories it flags
+PRESCREEN_ENABLED = os.getenv("MODEL_B_PRESCREEN", "1") == "1"
 
 
 def validate_story(story_text, cultural_profile):
+    flags = []
+    if PRESCREEN_ENABLED:
+        with stage_timer("b", "prescreen"):
+            result = prescreen_story(story_text, cultural_profile)
+        record_prescreen(result)
+        if result["passed"]:
+            print("   ✓ Pre-screen passed, skipping LLM review")
+            return clean_story(story_text)
+        flags = result["flags"]
+        print(f"   ⚠️ Pre-screen flagged: {flags}")
+
+    return review_story(story_text, cultural_profile, flags)
+
+
+def record_prescreen(result):
+    metrics.increment("prescreen_passed" if result["passed"] else "prescreen_flagged",
+                      model="b", stage="prescreen")
+    for flag in result["flags"]:
+        check = flag.split(":", 1)[0]
+        metrics.increment(f"prescreen_flag_{check}", model="b", stage="prescreen")
+
+
+def review_story(story_text, cultural_profile, flags=None):
+    """LLM review rewrite; flags from the pre-screen tell it where to look."""
+    flagged = ""
+    if flags:
+        flagged = "ISSUES FOUND BY THE AUTOMATIC CHECK (fix these):\n" + "\n".join(f"- {f}" for f in flags) + "\n"
+
     prompt = f"""
 You are a quality reviewer for a children's story system.
 
@@ -17,8 +54,9 @@ Your task:
 - Preserve the original voice and events.
 
 CULTURAL + TRAIT CONTEXT (DO NOT CHANGE):
-{cultural_profile}
+{prompt_context(cultural_profile, "validation")}
 
+{flagged}
 STORY:
 {story_text}
 
@@ -26,7 +64,7 @@ Return ONLY the final corrected story text.
 Do not include headings, explanations, or commentary.
 """
 
-    reviewed_story = call_gpt(prompt, temperature=0.1)
+    reviewed_story = call_gpt(prompt, temperature=0.1, stage="validation")
     return clean_story(reviewed_story)
 
 def clean_story(text):
@@ -0,0 +1,141 @@
+"""
+Record/replay of OpenAI traffic for repeatable benchmarks.
+
+In record mode every chat completion (plain or streamed) and image
+generation that goes through the OpenAI gateway is saved to a versioned
+JSON cassette together with its observed latency. In replay mode the
+gateway answers from the cassette instead of calling OpenAI, optionally
+sleeping for the recorded latency, so run_model_a / run_model_b can be
+profiled offline and pipeline overhead compared across commits.
+
+Requests are matched on their exact parameters; identical requests are
+replayed in the order they were recorded.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from website.services.shared.sqlite_store import DATA_DIR
+
+CASSETTE_VERSION = 1
+
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")  # off, record, replay
+CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", os.path.join(DATA_DIR, "cassettes", "llm.json"))
+# Replay with the recorded latencies (1) or as fast as possible (0)
+CASSETTE_TIMING = os.getenv("LLM_CASSETTE_TIMING", "0") == "1"
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode got a request that is not on the cassette."""
+
+
+def request_key(kind, request):
+    canonical = json.dumps({"kind": kind, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path, mode="replay", timing=False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._cursors = {}
+
+        if mode == "replay" or os.path.exists(path):
+            self._load()
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(
+                f"Cassette {self.path} has version {data.get('version')}, expected {CASSETTE_VERSION}"
+            )
+        self.interactions = data.get("interactions", [])
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": CASSETTE_VERSION,
+                "saved_at": datetime.utcnow().isoformat(),
+                "interactions": self.interactions,
+            }, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def record(self, kind, request, response, latency, **extra):
+        interaction = {
+            "kind": kind,
+            "key": request_key(kind, request),
+            "request": request,
+            "response": response,
+            "latency": round(latency, 4),
+        }
+        interaction.update(extra)
+        with self._lock:
+            self.interactions.append(interaction)
+            self.save()
+
+    def lookup(self, kind, request):
+        """Next recorded interaction for this request (the last one repeats)."""
+        key = request_key(kind, request)
+        with self._lock:
+            matches = [i for i in self.interactions if i["key"] == key]
+            if not matches:
+                raise CassetteMiss(f"No recorded {kind} request matches (key {key[:12]})")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+        return matches[min(cursor, len(matches) - 1)]
+
+    def wait(self, seconds):
+        if self.timing and seconds:
+            time.sleep(seconds)
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+_configured = False
+
+
+def use_cassette(path=None, mode="replay", timing=None):
+    """
+    Switch the process to a cassette (mode "record" or "replay"), or turn
+    cassettes off with mode "off". Returns the active Cassette or None.
+    """
+    global _cassette, _configured
+    with _cassette_lock:
+        _configured = True
+        if mode == "off":
+            _cassette = None
+        else:
+            _cassette = Cassette(
+                path or CASSETTE_PATH,
+                mode=mode,
+                timing=CASSETTE_TIMING if timing is None else timing,
+            )
+        return _cassette
+
+
+def get_cassette():
+    """The active cassette (configured from LLM_CASSETTE_* on first use)."""
+    if not _configured:
+        use_cassette(mode=CASSETTE_MODE)
+    return _cassette
@@ -0,0 +1,121 @@
+"""
+Per-request deadlines for OpenAI calls.
+
+generate_story_for_prompt opens a deadline for the whole request (and a
+shorter one around Model B, so the Model A fallback still has time). The
+deadline lives in a context variable: every OpenAI call below it gets the
+remaining budget as its timeout and retries retryable errors with jittered
+backoff only while budget is left. Once the budget is spent calls raise
+DeadlineExceeded straight away, which the stages' existing `except
+Exception` fallbacks handle like any other failure.
+
+Thread pools don't inherit context variables, so work submitted to them is
+wrapped with in_current_context().
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from website.services.shared import metrics
+
+STORY_DEADLINE_SECONDS = float(os.getenv("STORY_DEADLINE_SECONDS", "300"))
+MODEL_B_DEADLINE_SECONDS = float(os.getenv("MODEL_B_DEADLINE_SECONDS", "200"))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "3"))
+OPENAI_RETRY_WAIT = float(os.getenv("OPENAI_RETRY_WAIT", "1"))
+OPENAI_RETRY_MAX_WAIT = float(os.getenv("OPENAI_RETRY_MAX_WAIT", "10"))
+
+# Calls aren't started with less than this left; they couldn't finish anyway
+MIN_CALL_SECONDS = 1.0
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Run the block with at most `seconds` of budget. Nested deadlines
+    can only shorten the enclosing one.
+    """
+    ends = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        ends = min(ends, outer)
+    token = _deadline.set(ends)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one."""
+    ends = _deadline.get()
+    if ends is None:
+        return None
+    return ends - time.monotonic()
+
+
+def call_timeout(default):
+    """
+    Timeout for the next call: the remaining budget, capped at `default`.
+    Raises DeadlineExceeded when too little is left to start a call.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_CALL_SECONDS:
+        raise DeadlineExceeded(f"deadline exceeded ({left:.1f}s left)")
+    return min(default, left)
+
+
+def check():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+
+
+def _out_of_budget(retry_state):
+    left = remaining()
+    return left is not None and left - retry_state.upcoming_sleep < MIN_CALL_SECONDS
+
+
+def _before_sleep(retry_state):
+    metrics.record_retry()
+    print(
+        f"OpenAI call failed ({retry_state.outcome.exception()!r}), "
+        f"retrying in {retry_state.upcoming_sleep:.1f}s"
+    )
+
+
+def retrying(is_retryable):
+    """
+    tenacity policy for one OpenAI call: jittered exponential backoff on
+    errors accepted by is_retryable, up to OPENAI_MAX_ATTEMPTS attempts and
+    never sleeping past the deadline. The last error is re-raised.
+    """
+    return Retrying(
+        retry=retry_if_exception(is_retryable),
+        stop=stop_after_attempt(OPENAI_MAX_ATTEMPTS) | _out_of_budget,
+        wait=wait_random_exponential(multiplier=OPENAI_RETRY_WAIT, max=OPENAI_RETRY_MAX_WAIT),
+        before_sleep=_before_sleep,
+        reraise=True,
+    )
+
+
+def in_current_context(func):
+    """
+    Wrap func for a thread pool so it runs with the caller's deadline (and
+    metrics stage). Each call gets its own copy of the context.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
@@ -0,0 +1,132 @@
+"""
+Local, content-addressed storage for generated illustrations.
+
+DALL·E URLs expire after a while and every page view would otherwise pull a
+full 1024x1024 PNG from a third party. Right after generation the image is
+downloaded, stored under its sha256 digest and resized into WebP/JPEG
+derivatives, which the /images/<digest> route serves with long-lived caching.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+import requests
+from PIL import Image
+
+from website.services.shared.cassette import get_cassette
+from website.services.shared.deadline import call_timeout
+from website.services.shared.sqlite_store import DATA_DIR
+
+IMAGE_STORE_ENABLED = os.getenv("IMAGE_STORE_ENABLED", "1") == "1"
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", os.path.join(DATA_DIR, "images"))
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT", "30"))
+
+IMAGE_WIDTHS = (256, 512, 1024)
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+}
+DEFAULT_WIDTH = 1024
+DEFAULT_FORMAT = "webp"
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_valid_digest(digest):
+    return bool(DIGEST_RE.match(digest or ""))
+
+
+def local_url(digest):
+    return f"/images/{digest}"
+
+
+def _image_dir(digest):
+    return os.path.join(IMAGE_STORE_DIR, digest[:2], digest)
+
+
+def _write_atomic(path, data):
+    # A unique temp file per call: threads storing the same image must not
+    # write (and then rename) the same file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _render_derivative(image, width, fmt):
+    pil_format, _ = IMAGE_FORMATS[fmt]
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    if pil_format == "JPEG":
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, quality=85)
+    return buffer.getvalue()
+
+
+def store_image_bytes(data):
+    """
+    Store the original image and all derivatives; returns the sha256 digest.
+    Storing the same bytes twice is a no-op; bytes that aren't an image
+    raise before anything is written.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    directory = _image_dir(digest)
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        os.makedirs(directory, exist_ok=True)
+        original_path = os.path.join(directory, "original")
+        if not os.path.exists(original_path):
+            _write_atomic(original_path, data)
+
+        for width in IMAGE_WIDTHS:
+            for fmt in IMAGE_FORMATS:
+                path = os.path.join(directory, f"{width}.{fmt}")
+                if not os.path.exists(path):
+                    _write_atomic(path, _render_derivative(image, width, fmt))
+
+    return digest
+
+
+def persist_remote_image(url):
+    """
+    Download a freshly generated image and return its local URL.
+    Local/static URLs pass through; on any failure the remote URL is kept.
+    Replayed (cassette) URLs are kept too, since they have usually expired.
+    """
+    if not IMAGE_STORE_ENABLED or not url or not url.startswith(("http://", "https://")):
+        return url
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        return url
+
+    try:
+        response = requests.get(url, timeout=call_timeout(IMAGE_DOWNLOAD_TIMEOUT))
+        response.raise_for_status()
+        return local_url(store_image_bytes(response.content))
+    except Exception as e:
+        print("Could not store image locally, keeping remote URL:", e)
+        return url
+
+
+def derivative_path(digest, width=DEFAULT_WIDTH, fmt=DEFAULT_FORMAT):
+    """
+    Path of the stored derivative closest to (not smaller than) the requested
+    width, or None if the image is unknown.
+    """
+    if not is_valid_digest(digest) or fmt not in IMAGE_FORMATS:
+        return None
+
+    width = next((w for w in IMAGE_WIDTHS if w >= width), IMAGE_WIDTHS[-1])
+    path = os.path.join(_image_dir(digest), f"{width}.{fmt}")
+    return path if os.path.exists(path) else None
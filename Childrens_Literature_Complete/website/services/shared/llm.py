@@ -1,40 +1,68 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+from website.services.shared.openai_gateway import (
+    create_chat_completion,
+    stream_chat_completion,
+    create_image,
+)
+from website.services.shared.llm_cache import cache_enabled_for, cache_key, cached_response, store_response
+from website.services.shared.image_store import persist_remote_image
 
-load_dotenv()
-
-def get_openai_client():
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=api_key)
-
-def call_gpt(prompt, model="gpt-4.1", max_tokens=500, temperature=0.7):
+def call_gpt(prompt, model="gpt-4.1", max_tokens=500, temperature=0.7, stage=None, on_token=None):
     """
     Generic GPT text call
+    stage: pipeline stage name; responses are cached when the LLM cache is
+           enabled for that stage
+    on_token: optional callback; when given the completion is streamed and
+              on_token(text) is called for every delta. The full text is
+              still returned.
     """
-    client = get_openai_client()
+    use_cache = cache_enabled_for(stage)
+    if use_cache:
+        key = cache_key(model, prompt, temperature, max_tokens)
+        cached = cached_response(key, stage=stage)
+        if cached is not None:
+            if on_token:
+                on_token(cached)
+            return cached
+
+    messages = [{"role": "user", "content": prompt}]
+    if on_token:
+        content = stream_gpt(messages, model, max_tokens, temperature, on_token)
+    else:
+        response = create_chat_completion(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content
+
+    if use_cache and content:
+        store_response(key, content, stage=stage)
 
-    response = client.chat.completions.create(
+    return content
+
+def stream_gpt(messages, model, max_tokens, temperature, on_token):
+    """Stream a completion into on_token and return the joined text."""
+    parts = []
+    for delta in stream_chat_completion(
         model=model,
-        messages=[{"role": "user", "content": prompt}],
+        messages=messages,
         max_tokens=max_tokens,
         temperature=temperature
-    )
-
-    return response.choices[0].message.content
+    ):
+        parts.append(delta)
+        on_token(delta)
+    return "".join(parts)
 
 def generate_image(prompt, size="1024x1024"):
     """
     Generate an image using DALL·E 3
+    Returns a local /images/... URL once the image is stored (see image_store)
     """
-    client = get_openai_client()
-
-    response = client.images.generate(
+    response = create_image(
         model="dall-e-3",
         prompt=prompt,
         size=size
     )
 
-    return response.data[0].url
+    return persist_remote_image(response.data[0].url)
@@ -0,0 +1,175 @@
+"""
+Opt-in, content-addressed cache for call_gpt responses.
+
+Entries are keyed by a hash of (model, prompt, temperature, max_tokens) and
+stored in a SQLite file that every gunicorn worker shares. Old entries expire
+after LLM_CACHE_TTL seconds and the least recently used ones are evicted once
+the cache holds more than LLM_CACHE_MAX_ENTRIES. Caching is switched on per
+pipeline stage so only low-temperature, input-driven calls are reused.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from website.services.shared.sqlite_store import DATA_DIR, SQLiteStore
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.db"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_STAGES = {
+    s.strip() for s in
+    os.getenv("LLM_CACHE_STAGES", "cultural_analysis,character_profile,story_plan").split(",")
+    if s.strip()
+}
+
+# Stages whose responses are only worth caching when they parse as JSON
+JSON_STAGES = {"cultural_analysis", "character_profile", "story_plan", "scene_plan"}
+
+# Evict at most every this many writes instead of on every put
+EVICT_EVERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    stage TEXT,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    stage TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def cache_key(model, prompt, temperature, max_tokens):
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL):
+        self.store = SQLiteStore(path, SCHEMA)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def get(self, key, stage=None):
+        now = time.time()
+        row = self.store.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row and now - row[1] <= self.ttl:
+            self.store.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count(stage, hit=True)
+            return row[0]
+
+        if row:
+            self.store.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._count(stage, hit=False)
+        return None
+
+    def put(self, key, value, stage=None):
+        if stage in JSON_STAGES:
+            try:
+                json.loads(value)
+            except (TypeError, ValueError):
+                return
+
+        now = time.time()
+        self.store.execute(
+            "INSERT OR REPLACE INTO responses (key, stage, value, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, stage, value, now, now)
+        )
+        with self._writes_lock:
+            self._writes += 1
+            should_evict = self._writes % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond the size bound."""
+        self.store.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self.store.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def _count(self, stage, hit):
+        column = "hits" if hit else "misses"
+        self.store.execute(
+            f"INSERT INTO stats (stage, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(stage) DO UPDATE SET {column} = {column} + 1",
+            (stage or "",)
+        )
+
+    def stats(self):
+        rows = self.store.execute("SELECT stage, hits, misses FROM stats").fetchall()
+        entries = self.store.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "stages": {stage: {"hits": hits, "misses": misses} for stage, hits, misses in rows},
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(LLM_CACHE_PATH)
+        return _cache
+
+
+def cache_enabled_for(stage):
+    return LLM_CACHE_ENABLED and stage in LLM_CACHE_STAGES
+
+
+def cached_response(key, stage=None):
+    """
+    The cached response, or None. The cache must never break story
+    generation, so a missing, read-only or locked file counts as a miss.
+    """
+    try:
+        return get_cache().get(key, stage=stage)
+    except Exception as e:
+        print("LLM cache read failed:", e)
+        return None
+
+
+def store_response(key, value, stage=None):
+    """Cache a response; failures are logged and ignored."""
+    try:
+        get_cache().put(key, value, stage=stage)
+    except Exception as e:
+        print("LLM cache write failed:", e)
+
+
+def cache_stats():
+    """Hit/miss counters per stage (empty when the cache is disabled)."""
+    if not LLM_CACHE_ENABLED:
+        return {"enabled": False}
+    try:
+        stats = get_cache().stats()
+    except Exception as e:
+        print("LLM cache stats failed:", e)
+        return {"enabled": True, "error": str(e)}
+    stats["enabled"] = True
+    stats["cached_stages"] = sorted(LLM_CACHE_STAGES)
+    return stats
@@ -0,0 +1,266 @@
+"""
+Per-stage latency, error, retry and token metrics for both pipelines.
+
+Pipelines wrap each stage in stage_timer(model, stage). Lower layers (the
+OpenAI gateway, retry loops) attribute token usage, errors and retries to
+whatever stage is running in the current thread. Everything is written to a
+SQLite file under DATA_DIR so /metrics shows the totals of all gunicorn
+workers, in Prometheus text format.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from website.services.shared.sqlite_store import DATA_DIR, SQLiteStore
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PATH = os.getenv("METRICS_PATH", os.path.join(DATA_DIR, "metrics.db"))
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_latency (
+    model TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, stage, bucket)
+);
+CREATE TABLE IF NOT EXISTS stage_counters (
+    model TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, stage, name)
+);
+"""
+
+# Counters exported as story_stage_<name>_total
+COUNTERS = {
+    "errors": "Failed OpenAI calls or stages",
+    "retries": "Retried OpenAI calls",
+    "rate_limited": "OpenAI calls answered with a 429",
+    "throttle_waits": "OpenAI calls held back by the rate limiter",
+    "throttle_wait_seconds": "Time OpenAI calls spent waiting on the rate limiter",
+    "prompt_tokens": "Prompt tokens reported by OpenAI",
+    "completion_tokens": "Completion tokens reported by OpenAI",
+}
+
+_current_stage = contextvars.ContextVar("current_stage", default=("", "other"))
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteStore(METRICS_PATH, SCHEMA)
+        return _store
+
+
+def _safely(write):
+    """Metrics must never break story generation."""
+    if not METRICS_ENABLED:
+        return
+    try:
+        write(get_store())
+    except Exception as e:
+        print("Metrics write failed:", e)
+
+
+def current_stage():
+    return _current_stage.get()
+
+
+def bucket_index(seconds):
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+
+def observe_latency(model, stage, seconds):
+    def write(store):
+        store.execute(
+            "INSERT INTO stage_latency (model, stage, bucket, count) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT(model, stage, bucket) DO UPDATE SET count = count + 1",
+            (model, stage, bucket_index(seconds))
+        )
+        _add(store, model, stage, "latency_seconds_sum", seconds)
+    _safely(write)
+
+
+def _add(store, model, stage, name, value):
+    store.execute(
+        "INSERT INTO stage_counters (model, stage, name, value) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(model, stage, name) DO UPDATE SET value = value + excluded.value",
+        (model, stage, name, value)
+    )
+
+
+def increment(name, value=1, model=None, stage=None):
+    """Add to a counter for the given (or the currently running) stage."""
+    if model is None or stage is None:
+        model, stage = current_stage()
+    _safely(lambda store: _add(store, model, stage, name, value))
+
+
+def record_error(error=None):
+    """
+    Count an error against the current stage. Passing the exception marks
+    it so an enclosing stage_timer doesn't count it a second time.
+    """
+    if error is not None:
+        if getattr(error, "_metrics_recorded", False):
+            return
+        try:
+            error._metrics_recorded = True
+        except Exception:
+            pass
+    increment("errors")
+
+
+def record_retry():
+    increment("retries")
+
+
+def record_usage(usage):
+    """Record an OpenAI `usage` object against the current stage."""
+    if usage is None:
+        return
+    model, stage = current_stage()
+
+    def write(store):
+        _add(store, model, stage, "prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        _add(store, model, stage, "completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+    _safely(write)
+
+
+@contextmanager
+def stage_timer(model, stage):
+    """
+    Time a pipeline stage and make it the current stage for this thread.
+    An exception escaping the stage counts as an error and is re-raised.
+    """
+    token = _current_stage.set((model, stage))
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(e)
+        raise
+    finally:
+        observe_latency(model, stage, time.perf_counter() - started)
+        _current_stage.reset(token)
+
+
+# ------------------------------------------------------------
+# Prometheus exposition
+# ------------------------------------------------------------
+
+def _labels(model, stage, **extra):
+    pairs = [("model", model), ("stage", stage)] + list(extra.items())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def estimate_quantile(q, bucket_counts):
+    """
+    Quantile from non-cumulative bucket counts, interpolating linearly
+    inside the bucket (same approach as Prometheus' histogram_quantile).
+    """
+    total = sum(bucket_counts)
+    if total == 0:
+        return math.nan
+
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(bucket_counts):
+        if count and seen + count >= rank:
+            if i >= len(LATENCY_BUCKETS):
+                return LATENCY_BUCKETS[-1]
+            lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+            upper = LATENCY_BUCKETS[i]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return LATENCY_BUCKETS[-1]
+
+
+def snapshot():
+    """{(model, stage): {"buckets": [...], "<counter>": value, ...}}"""
+    store = get_store()
+    stages = {}
+    for model, stage, bucket, count in store.execute(
+        "SELECT model, stage, bucket, count FROM stage_latency"
+    ):
+        entry = stages.setdefault((model, stage), {"buckets": [0] * (len(LATENCY_BUCKETS) + 1)})
+        entry["buckets"][bucket] = count
+    for model, stage, name, value in store.execute(
+        "SELECT model, stage, name, value FROM stage_counters"
+    ):
+        entry = stages.setdefault((model, stage), {"buckets": [0] * (len(LATENCY_BUCKETS) + 1)})
+        entry[name] = value
+    return stages
+
+
+def _number(value):
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return f"{value:.6g}"
+
+
+def render_prometheus():
+    if not METRICS_ENABLED:
+        return "# metrics disabled\n"
+
+    stages = snapshot()
+    keys = sorted(stages)
+    lines = [
+        "# HELP story_stage_latency_seconds Wall time of each pipeline stage",
+        "# TYPE story_stage_latency_seconds histogram",
+    ]
+    for model, stage in keys:
+        buckets = stages[(model, stage)]["buckets"]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(
+                f"story_stage_latency_seconds_bucket{_labels(model, stage, le=_number(bound))} {cumulative}"
+            )
+        cumulative += buckets[-1]
+        lines.append(f"story_stage_latency_seconds_bucket{_labels(model, stage, le='+Inf')} {cumulative}")
+        lines.append(
+            f"story_stage_latency_seconds_sum{_labels(model, stage)} "
+            f"{_number(stages[(model, stage)].get('latency_seconds_sum', 0))}"
+        )
+        lines.append(f"story_stage_latency_seconds_count{_labels(model, stage)} {cumulative}")
+
+    for quantile in (0.5, 0.95):
+        name = f"story_stage_latency_p{int(quantile * 100)}_seconds"
+        lines.append(f"# HELP {name} Estimated p{int(quantile * 100)} stage latency from the histogram")
+        lines.append(f"# TYPE {name} gauge")
+        for model, stage in keys:
+            value = estimate_quantile(quantile, stages[(model, stage)]["buckets"])
+            lines.append(f"{name}{_labels(model, stage)} {_number(value)}")
+
+    counter_names = dict(COUNTERS)
+    for entry in stages.values():
+        for name in entry:
+            if name not in ("buckets", "latency_seconds_sum"):
+                counter_names.setdefault(name, name.replace("_", " ").capitalize())
+
+    for name, help_text in counter_names.items():
+        lines.append(f"# HELP story_stage_{name}_total {help_text}")
+        lines.append(f"# TYPE story_stage_{name}_total counter")
+        for model, stage in keys:
+            value = stages[(model, stage)].get(name, 0)
+            lines.append(f"story_stage_{name}_total{_labels(model, stage)} {_number(value)}")
+
+    return "\n".join(lines) + "\n"
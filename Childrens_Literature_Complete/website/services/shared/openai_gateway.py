@@ -0,0 +1,266 @@
+"""
+Process-wide OpenAI gateway.
+
+Every text and image call goes through here so that the whole worker process
+shares one long-lived OpenAI client (and its keep-alive HTTP connection pool)
+instead of paying connection + TLS setup on every stage. A semaphore caps how
+many OpenAI requests one process has in flight at once. With a cassette
+active (see cassette.py) calls are recorded or replayed here as well.
+
+Each request gets the remaining budget of the current deadline (see
+deadline.py) as its timeout and is retried here, with jittered backoff, on
+timeouts, connection errors, rate limits and 5xx responses. The SDK's own
+retries are off so they can't run past the deadline. Before each attempt
+the shared rate limiter (rate_limiter.py) has to grant the request.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from dotenv import load_dotenv
+from openai import APIConnectionError, APIStatusError, OpenAI
+from openai.types import CompletionUsage, ImagesResponse
+from openai.types.chat import ChatCompletion
+
+from website.services.shared import metrics, rate_limiter
+from website.services.shared.cassette import get_cassette
+from website.services.shared.deadline import DeadlineExceeded, call_timeout, check, remaining, retrying
+
+load_dotenv()
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "90"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+
+_client = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+
+
+def _build_http_client():
+    return httpx.Client(
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_openai_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            _client = OpenAI(
+                api_key=api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                timeout=OPENAI_TIMEOUT,
+                max_retries=0,
+                http_client=_build_http_client(),
+            )
+        return _client
+
+
+def reset_client():
+    """Drop the shared client (e.g. after fork or when settings change)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def is_retryable(error):
+    """Timeouts, dropped connections, 408/409/429 and 5xx are worth retrying."""
+    if isinstance(error, APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _acquire_slot():
+    """Wait for a concurrency slot, but not past the deadline."""
+    left = remaining()
+    if not _slots.acquire(timeout=max(left, 0) if left is not None else None):
+        raise DeadlineExceeded("deadline exceeded waiting for an OpenAI slot")
+
+
+@contextmanager
+def _slot():
+    _acquire_slot()
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+def _request(create, endpoint, tokens=0, **kwargs):
+    """
+    One OpenAI request with the deadline as timeout, retried; every attempt
+    waits for the rate limiter and holds a slot.
+    """
+    for attempt in retrying(is_retryable):
+        with attempt:
+            permit = rate_limiter.acquire(endpoint, tokens)
+            try:
+                with _slot():
+                    response = create(timeout=call_timeout(OPENAI_TIMEOUT), **kwargs)
+            except Exception as e:
+                permit.release(error=e)
+                metrics.record_error(e)
+                raise
+            permit.release(usage=getattr(response, "usage", None))
+            return response
+
+
+def create_chat_completion(**kwargs):
+    """chat.completions.create through the shared client and concurrency cap."""
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        interaction = cassette.lookup("chat", kwargs)
+        cassette.wait(interaction["latency"])
+        response = ChatCompletion.model_validate(interaction["response"])
+        metrics.record_usage(response.usage)
+        return response
+
+    client = get_openai_client()
+    started = time.perf_counter()
+    response = _request(
+        client.chat.completions.create, "chat", rate_limiter.estimate_chat_tokens(kwargs), **kwargs
+    )
+    if cassette and cassette.recording:
+        cassette.record("chat", kwargs, response.model_dump(mode="json"), time.perf_counter() - started)
+    metrics.record_usage(getattr(response, "usage", None))
+    return response
+
+
+def stream_chat_completion(**kwargs):
+    """
+    Streaming chat completion; yields text deltas as they arrive.
+    The concurrency slot is held until the stream is exhausted or closed.
+    Only opening the stream is retried: once deltas have been yielded a
+    failure (or the deadline passing) is raised to the caller.
+    """
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        yield from _replay_stream(cassette, kwargs)
+        return
+
+    client = get_openai_client()
+    started = time.perf_counter()
+    deltas = []
+    usage = None
+    stream, permit = _open_stream(client, kwargs)
+    error = None
+    try:
+        for chunk in stream:
+            check()
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+                metrics.record_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                deltas.append([round(time.perf_counter() - started, 4), delta])
+                yield delta
+    except Exception as e:
+        error = e
+        metrics.record_error(e)
+        raise
+    finally:
+        stream.close()
+        _slots.release()
+        permit.release(error=error, usage=usage)
+
+    if cassette and cassette.recording:
+        cassette.record(
+            "chat_stream", kwargs,
+            {"deltas": deltas, "usage": usage.model_dump(mode="json") if usage else None},
+            time.perf_counter() - started
+        )
+
+
+def _open_stream(client, kwargs):
+    """
+    Open a completion stream (retried). Returns (stream, permit); the caller
+    releases the slot and the permit once the stream is done.
+    """
+    tokens = rate_limiter.estimate_chat_tokens(kwargs)
+    for attempt in retrying(is_retryable):
+        with attempt:
+            permit = rate_limiter.acquire("chat", tokens)
+            try:
+                _acquire_slot()
+            except Exception as e:
+                permit.release(error=e)
+                raise
+            try:
+                stream = client.chat.completions.create(
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=call_timeout(OPENAI_TIMEOUT),
+                    **kwargs
+                )
+            except Exception as e:
+                _slots.release()
+                permit.release(error=e)
+                metrics.record_error(e)
+                raise
+            return stream, permit
+
+
+def _replay_stream(cassette, kwargs):
+    interaction = cassette.lookup("chat_stream", kwargs)
+    response = interaction["response"]
+    elapsed = 0.0
+    for offset, delta in response["deltas"]:
+        cassette.wait(offset - elapsed)
+        elapsed = offset
+        yield delta
+    cassette.wait(interaction["latency"] - elapsed)
+    if response.get("usage"):
+        metrics.record_usage(CompletionUsage.model_validate(response["usage"]))
+
+
+def create_image(**kwargs):
+    """images.generate through the shared client and concurrency cap."""
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        interaction = cassette.lookup("image", kwargs)
+        cassette.wait(interaction["latency"])
+        return ImagesResponse.model_validate(interaction["response"])
+
+    client = get_openai_client()
+    started = time.perf_counter()
+    response = _request(client.images.generate, "image", **kwargs)
+    if cassette and cassette.recording:
+        cassette.record("image", kwargs, response.model_dump(mode="json"), time.perf_counter() - started)
+    return response
+
+
+def warm_up():
+    """
+    Open a pooled connection ahead of the first real request so the first
+    story of a fresh worker doesn't pay DNS + TCP + TLS setup.
+    """
+    try:
+        client = get_openai_client()
+        client.with_options(timeout=OPENAI_CONNECT_TIMEOUT, max_retries=0).models.list()
+        print("OpenAI connection pre-warmed")
+    except Exception as e:
+        print("OpenAI warm-up skipped:", e)
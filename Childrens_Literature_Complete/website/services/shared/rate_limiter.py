@@ -0,0 +1,251 @@
+"""
+Rate limiting for OpenAI traffic, shared by all gunicorn workers.
+
+Two layers, checked before every OpenAI request in the gateway:
+
+- Token buckets in a SQLite file under DATA_DIR, so every worker on the
+  machine draws from the same requests-per-minute (chat and images) and
+  tokens-per-minute (chat) budgets. Chat requests take an estimate of their
+  tokens up front and settle it against the usage OpenAI reports. A 429
+  blocks the endpoint's bucket for its Retry-After, for every worker.
+- An AIMD concurrency limit per endpoint in each process: +1 in-flight
+  request per limit's worth of fast successes, halved on a 429 and cut by
+  10% when a request is slower than the latency target.
+
+Time spent waiting on either is counted as throttle_waits /
+throttle_wait_seconds at /metrics, 429s as rate_limited. Waits never run
+past the request's deadline (see deadline.py).
+"""
+import os
+import threading
+import time
+
+from website.services.shared import metrics
+from website.services.shared.deadline import DeadlineExceeded, remaining
+from website.services.shared.sqlite_store import DATA_DIR, SQLiteStore
+
+RATE_LIMIT_ENABLED = os.getenv("OPENAI_RATE_LIMIT", "1") == "1"
+RATE_LIMIT_PATH = os.getenv("OPENAI_RATE_LIMIT_PATH", os.path.join(DATA_DIR, "rate_limit.db"))
+CHAT_RPM = int(os.getenv("OPENAI_CHAT_RPM", "500"))
+CHAT_TPM = int(os.getenv("OPENAI_CHAT_TPM", "200000"))
+IMAGE_RPM = int(os.getenv("OPENAI_IMAGE_RPM", "50"))
+CHAT_CONCURRENCY = int(os.getenv("OPENAI_CHAT_CONCURRENCY", "8"))
+IMAGE_CONCURRENCY = int(os.getenv("OPENAI_IMAGE_CONCURRENCY", "4"))
+CHAT_LATENCY_TARGET = float(os.getenv("OPENAI_CHAT_LATENCY_TARGET", "60"))
+IMAGE_LATENCY_TARGET = float(os.getenv("OPENAI_IMAGE_LATENCY_TARGET", "40"))
+
+# Completion tokens assumed for requests without max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+# How long a 429 without a Retry-After header blocks the endpoint
+DEFAULT_RETRY_AFTER = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def bucket_capacities():
+    """{endpoint: {bucket name: per-minute capacity}}"""
+    return {
+        "chat": {"chat_requests": CHAT_RPM, "chat_tokens": CHAT_TPM},
+        "image": {"image_requests": IMAGE_RPM},
+    }
+
+
+def estimate_chat_tokens(kwargs):
+    """Rough prompt tokens (4 characters each) plus the completion budget."""
+    chars = sum(len(str(m.get("content") or "")) for m in kwargs.get("messages", []))
+    return chars // 4 + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBuckets:
+    """Per-minute token buckets in a SQLite file, refilled continuously."""
+
+    def __init__(self, path):
+        self.store = SQLiteStore(path, SCHEMA)
+
+    def take(self, costs, capacities):
+        """
+        Take costs ({bucket: amount}) from every bucket at once if they all
+        have enough; returns 0, or the seconds to wait before trying again.
+        """
+        conn = self.store.connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            wait = 0.0
+            for name, amount in costs.items():
+                capacity = capacities[name]
+                row = conn.execute(
+                    "SELECT level, updated_at, blocked_until FROM buckets WHERE name = ?", (name,)
+                ).fetchone()
+                level, updated_at, blocked_until = row or (capacity, now, 0)
+                level = min(capacity, level + max(now - updated_at, 0) * capacity / 60)
+                levels[name] = level
+                # A request bigger than the whole bucket waits for a full one
+                amount = min(amount, capacity)
+                if blocked_until > now:
+                    wait = max(wait, blocked_until - now)
+                if level < amount:
+                    wait = max(wait, (amount - level) * 60 / capacity)
+
+            for name, level in levels.items():
+                if not wait:
+                    level -= min(costs[name], capacities[name])
+                conn.execute(
+                    "INSERT INTO buckets (name, level, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated_at = excluded.updated_at",
+                    (name, level, now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def refund(self, name, amount, capacity):
+        """Give back (or, negative, take more of) an estimate after the fact."""
+        self.store.execute(
+            "UPDATE buckets SET level = MIN(?, level + ?) WHERE name = ?", (capacity, amount, name)
+        )
+
+    def block(self, names, seconds):
+        until = time.time() + seconds
+        for name in names:
+            self.store.execute(
+                "UPDATE buckets SET blocked_until = MAX(blocked_until, ?) WHERE name = ?", (until, name)
+            )
+
+    def reset(self):
+        self.store.execute("DELETE FROM buckets")
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight requests to one endpoint in this process."""
+
+    def __init__(self, initial, maximum, latency_target, minimum=1):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, rate_limited=False):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif latency is not None and latency > self.latency_target:
+                self.limit = max(self.minimum, self.limit * 0.9)
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class Permit:
+    """One granted request; release() it when the request is over."""
+
+    def __init__(self, endpoint, concurrency=None, estimated_tokens=0):
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.estimated_tokens = estimated_tokens
+        self.started = time.perf_counter()
+
+    def release(self, error=None, usage=None):
+        if self.concurrency is None:
+            return
+        rate_limited = getattr(error, "status_code", None) == 429
+        if rate_limited:
+            metrics.increment("rate_limited")
+            get_buckets().block(bucket_capacities()[self.endpoint], _retry_after(error))
+        elif usage is not None and self.estimated_tokens:
+            get_buckets().refund(
+                "chat_tokens", self.estimated_tokens - (getattr(usage, "total_tokens", 0) or 0), CHAT_TPM
+            )
+        self.concurrency.release(
+            latency=None if error is not None and not rate_limited else time.perf_counter() - self.started,
+            rate_limited=rate_limited,
+        )
+        self.concurrency = None
+
+
+def _retry_after(error):
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+_buckets = None
+_concurrency = {}
+_lock = threading.Lock()
+
+
+def get_buckets():
+    global _buckets
+    with _lock:
+        if _buckets is None:
+            _buckets = TokenBuckets(RATE_LIMIT_PATH)
+        return _buckets
+
+
+def get_concurrency(endpoint):
+    with _lock:
+        if endpoint not in _concurrency:
+            if endpoint == "image":
+                _concurrency[endpoint] = AdaptiveConcurrency(IMAGE_CONCURRENCY, IMAGE_CONCURRENCY * 2, IMAGE_LATENCY_TARGET)
+            else:
+                _concurrency[endpoint] = AdaptiveConcurrency(CHAT_CONCURRENCY, CHAT_CONCURRENCY * 2, CHAT_LATENCY_TARGET)
+        return _concurrency[endpoint]
+
+
+def _wait(seconds):
+    left = remaining()
+    if left is not None and seconds > left:
+        raise DeadlineExceeded(f"rate limit wait of {seconds:.1f}s exceeds the deadline")
+    time.sleep(seconds)
+
+
+def acquire(endpoint, tokens=0):
+    """
+    Wait until the shared buckets and this process' concurrency limit allow
+    one more request to endpoint ("chat" or "image"); returns its Permit.
+    tokens: estimated tokens of a chat request (see estimate_chat_tokens).
+    """
+    if not RATE_LIMIT_ENABLED:
+        return Permit(endpoint)
+
+    started = time.perf_counter()
+    capacities = bucket_capacities()[endpoint]
+    costs = {name: tokens if name == "chat_tokens" else 1 for name in capacities}
+    while True:
+        wait = get_buckets().take(costs, capacities)
+        if not wait:
+            break
+        _wait(wait)
+
+    concurrency = get_concurrency(endpoint)
+    left = remaining()
+    if not concurrency.acquire(timeout=max(left, 0) if left is not None else None):
+        raise DeadlineExceeded(f"deadline exceeded waiting for an {endpoint} request slot")
+
+    waited = time.perf_counter() - started
+    if waited > 0.01:
+        metrics.increment("throttle_waits")
+        metrics.increment("throttle_wait_seconds", waited)
+    return Permit(endpoint, concurrency, costs.get("chat_tokens", 0))
+
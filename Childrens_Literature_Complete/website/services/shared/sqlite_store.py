@@ -0,0 +1,47 @@
+"""
+Helpers for the small SQLite side stores (LLM cache, metrics, ...) that are
+shared between gunicorn workers on the same machine.
+"""
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.getenv("DATA_DIR", "/data")
+
+
+class SQLiteStore:
+    """
+    One SQLite file, one connection per thread, WAL mode so readers never
+    block the writer and several worker processes can share the file.
+    """
+
+    def __init__(self, path, schema=""):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+
+        with self._init_lock:
+            if not self._initialized and self.schema:
+                conn.executescript(self.schema)
+                self._initialized = True
+
+        self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connect().execute(sql, params)